@@ -3,15 +3,20 @@ This module defines the API endpoints for caregivers.
 
 Responsibilities:
 - Manage endpoints related to caregiver profiles and settings.
+- Let caregivers write the family memories of a care receiver and search them.
+- Search what was said in the patient's conversations (ranked snippets, optional time range).
 - Delegate data handling to the JSON store service.
 """
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
 import uuid
 from datetime import datetime
 
-from app.models.schemas import Caregiver, CareReceiver, CareReceiverCreate, CareReceiverUpdate
-from app.services import json_store_service
+from app.models.schemas import (
+    Caregiver, CareReceiver, CareReceiverCreate, CareReceiverUpdate,
+    FamilyMemory, FamilyMemoryCreate, FamilyMemoryHit, TranscriptHit
+)
+from app.services import archive_service, family_memory_service, json_store_service, transcript_search_service
 
 router = APIRouter(prefix="/caregivers", tags=["caregivers"])
 
@@ -30,10 +35,9 @@ def get_care_receivers_list():
 
 @router.get("/receivers/{receiver_id}", response_model=CareReceiver)
 def get_care_receiver(receiver_id: str):
-    receivers_data = json_store_service.get_care_receivers()
-    for r in receivers_data:
-        if r.get("id") == receiver_id:
-            return CareReceiver(**r)
+    receiver = json_store_service.get_by_id("care_receivers", receiver_id)
+    if receiver:
+        return CareReceiver(**receiver)
     raise HTTPException(status_code=404, detail="Care receiver not found")
 
 @router.post("/receivers", response_model=CareReceiver)
@@ -48,21 +52,59 @@ def create_care_receiver(payload: CareReceiverCreate):
         created_at=datetime.utcnow().isoformat() + "Z"
     )
 
-    with json_store_service.lock:
-        receivers_data = json_store_service.get_care_receivers()
-        receivers_data.append(new_receiver.model_dump())
-        json_store_service.save_care_receivers(receivers_data)
+    json_store_service.append_care_receiver(new_receiver.model_dump())
     return new_receiver
 
 @router.patch("/receivers/{receiver_id}", response_model=CareReceiver)
 def update_care_receiver(receiver_id: str, payload: CareReceiverUpdate):
-    with json_store_service.lock:
-        receivers_data = json_store_service.get_care_receivers()
-        for i, r in enumerate(receivers_data):
-            if r.get("id") == receiver_id:
-                update_data = payload.model_dump(exclude_unset=True)
-                updated_r = {**r, **update_data}
-                receivers_data[i] = updated_r
-                json_store_service.save_care_receivers(receivers_data)
-                return CareReceiver(**updated_r)
+    update_data = payload.model_dump(exclude_unset=True)
+    updated_r = json_store_service.update_by_id("care_receivers", receiver_id, update_data)
+    if updated_r is not None:
+        return CareReceiver(**updated_r)
     raise HTTPException(status_code=404, detail="Care receiver not found")
+
+# --- FAMILY MEMORIES ---
+
+@router.get("/receivers/{receiver_id}/memories", response_model=List[FamilyMemory])
+def get_family_memories(receiver_id: str):
+    return [FamilyMemory(**m) for m in family_memory_service.list_memories(receiver_id)]
+
+@router.post("/receivers/{receiver_id}/memories", response_model=FamilyMemory)
+def create_family_memory(receiver_id: str, payload: FamilyMemoryCreate):
+    """
+    Adds an anecdote the agent can recall for the patient (indexed immediately).
+    """
+    memory = family_memory_service.add_memory(receiver_id, payload.text, title=payload.title, tags=payload.tags)
+    return FamilyMemory(**memory)
+
+@router.get("/receivers/{receiver_id}/memories/search", response_model=List[FamilyMemoryHit])
+def search_family_memories(receiver_id: str, q: str = Query(...), limit: int = Query(5, ge=1, le=50)):
+    return [FamilyMemoryHit(**m) for m in family_memory_service.search_memories(receiver_id, q, limit=limit)]
+
+@router.delete("/receivers/{receiver_id}/memories/{memory_id}")
+def delete_family_memory(receiver_id: str, memory_id: str):
+    if not family_memory_service.delete_memory(receiver_id, memory_id):
+        raise HTTPException(status_code=404, detail="Memory not found")
+    return {"message": "Deleted"}
+
+# --- CONVERSATION SEARCH ---
+
+@router.get("/conversations/search", response_model=List[TranscriptHit])
+def search_conversations(
+    q: str = Query(...),
+    since: Optional[str] = Query(None),
+    until: Optional[str] = Query(None),
+    limit: int = Query(10, ge=1, le=100)
+):
+    """
+    Searches the patient's conversations by keywords; returns the best matching messages
+    as snippets, optionally restricted to [since, until).
+    """
+    bounds = {}
+    for name, value in (("since", since), ("until", until)):
+        if value:
+            bounds[name] = archive_service.parse_timestamp(value)
+            if bounds[name] is None:
+                raise HTTPException(status_code=400, detail=f"Invalid '{name}' timestamp")
+    hits = transcript_search_service.search(q, limit=limit, **bounds)
+    return [TranscriptHit(**h) for h in hits]
@@ -4,9 +4,13 @@ This module defines the API endpoints for chat interactions.
 Responsibilities:
 - Provide routes to handle voice or text chat from the patient interface.
 - Delegate chat processing to the agent service and return appropriate responses.
+- Stream replies as Server-Sent Events: text deltas, then per-sentence audio chunks in order.
 """
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
+import asyncio
+import json
 import uuid
 from datetime import datetime
 from pydantic import BaseModel
@@ -20,10 +24,15 @@ from app.services import json_store_service
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
-from app.services import agent_service
+from app.services import agent_service, metrics_service, speech_pipeline
 from app.services.tts_service import generate_tts_audio
 from app.core.config import BASE_DIR
 
+def _write_audio_file(filepath, audio_bytes: bytes):
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    with open(filepath, "wb") as f:
+        f.write(audio_bytes)
+
 @router.post("/message", response_model=ChatResponse)
 async def send_chat_message(payload: ChatMessage):
     """
@@ -33,20 +42,18 @@ async def send_chat_message(payload: ChatMessage):
     SESSION_ID = "default_patient_session"
     
     # The agent calculates the response (with dynamic tooling if necessary)
-    final_response = agent_service.process_user_message(SESSION_ID, payload.message)
+    final_response = await agent_service.process_user_message(SESSION_ID, payload.message)
     
     audio_url = None
     try:
         # Generate audio via ElevenLabs
-        audio_bytes = await generate_tts_audio(final_response)
+        with metrics_service.timed("tts_synthesis"):
+            audio_bytes = await generate_tts_audio(final_response)
         
         # Save locally
         filename = f"resp_{str(uuid.uuid4().hex)[:8]}.mp3"
         filepath = BASE_DIR / "app" / "static" / "audio" / filename
-        filepath.parent.mkdir(parents=True, exist_ok=True)
-        
-        with open(filepath, "wb") as f:
-            f.write(audio_bytes)
+        await asyncio.to_thread(_write_audio_file, filepath, audio_bytes)
             
         audio_url = f"/audio/{filename}"
     except Exception as e:
@@ -57,6 +64,30 @@ async def send_chat_message(payload: ChatMessage):
         audio_url=audio_url
     )
 
+@router.post("/message/stream")
+async def stream_chat_message(payload: ChatMessage):
+    """
+    Streaming variant of /message, as Server-Sent Events:
+    - `text`: {"delta"} as Gemini produces the reply,
+    - `audio`: {"index", "url", "text"} for each sentence, in order, as soon as it is synthesized,
+    - `done`: {"response"} with the full cleaned reply.
+    The first sentence can play while the rest of the reply is still being generated.
+    """
+    SESSION_ID = "default_patient_session"
+
+    async def events():
+        agent_events = agent_service.stream_user_message(SESSION_ID, payload.message)
+        async for event in speech_pipeline.speak_stream(
+            agent_events, generate_tts_audio, clean=agent_service.clean_for_speech
+        ):
+            kind = event.pop("type")
+            yield f"event: {kind}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.get("/history", response_model=List[HistoryItem])
 def get_chat_history():
     """
@@ -73,9 +104,10 @@ def get_chat_history():
 
 @router.get("/audio", response_model=List[AudioContent])
 def get_audio_contents(care_receiver_id: Optional[str] = Query(None)):
-    contents = json_store_service.get_audio_contents()
     if care_receiver_id:
-        contents = [c for c in contents if c.get("care_receiver_id") == care_receiver_id]
+        contents = json_store_service.find("audio_contents", care_receiver_id=care_receiver_id)
+    else:
+        contents = json_store_service.get_audio_contents()
     return [AudioContent(**c) for c in contents]
 
 @router.post("/audio", response_model=AudioContent)
@@ -89,29 +121,23 @@ def create_audio_content(payload: CreateAudioContentPayload):
         recommendable=payload.recommendable,
         created_at=datetime.utcnow().isoformat() + "Z"
     )
-    with json_store_service.lock:
-        contents = json_store_service.get_audio_contents()
-        contents.append(new_item.model_dump())
-        json_store_service.save_audio_contents(contents)
+    json_store_service.append_audio_content(new_item.model_dump())
     return new_item
 
 @router.post("/audio/{item_id}/send-now")
 def send_audio_now(item_id: str):
-    with json_store_service.lock:
-        contents = json_store_service.get_audio_contents()
-        item = next((c for c in contents if c.get("id") == item_id), None)
+    with json_store_service.transaction(read=["audio_contents"], write=["device_actions"]):
+        item = json_store_service.get_by_id("audio_contents", item_id)
         if not item:
             raise HTTPException(status_code=404, detail="Audio content not found")
 
-        actions = json_store_service.get_device_actions()
-        actions.append({
+        json_store_service.append_device_action({
             "id": f"act-{str(uuid.uuid4().hex)[:8]}",
             "kind": "propose_audio",
             "text_to_speak": f"I have an audio message for you: {item['title']}. Do you want to listen to it?",
             "audio_url": item["url"],
             "audio_content_id": item["id"]
         })
-        json_store_service.save_device_actions(actions)
     return {"status": "sent"}
 
 class ScheduleAudioPayload(BaseModel):
@@ -119,14 +145,12 @@ class ScheduleAudioPayload(BaseModel):
 
 @router.post("/audio/{item_id}/schedule")
 def schedule_audio(item_id: str, payload: ScheduleAudioPayload):
-    with json_store_service.lock:
-        contents = json_store_service.get_audio_contents()
-        item = next((c for c in contents if c.get("id") == item_id), None)
+    with json_store_service.transaction(read=["audio_contents"], write=["calendar_items"]):
+        item = json_store_service.get_by_id("audio_contents", item_id)
         if not item:
             raise HTTPException(status_code=404, detail="Audio content not found")
 
-        items = json_store_service.get_calendar_items()
-        items.append({
+        json_store_service.append_calendar_item({
             "id": f"ci-{str(uuid.uuid4().hex)[:8]}",
             "care_receiver_id": item["care_receiver_id"],
             "type": "audio_push",
@@ -136,7 +160,6 @@ def schedule_audio(item_id: str, payload: ScheduleAudioPayload):
             "audio_content_id": item["id"],
             "created_at": datetime.utcnow().isoformat() + "Z"
         })
-        json_store_service.save_calendar_items(items)
     return {"status": "scheduled"}
 
 class ToggleRecommendablePayload(BaseModel):
@@ -144,24 +167,15 @@ class ToggleRecommendablePayload(BaseModel):
 
 @router.patch("/audio/{item_id}", response_model=AudioContent)
 def toggle_recommendable(item_id: str, payload: ToggleRecommendablePayload):
-    with json_store_service.lock:
-        contents = json_store_service.get_audio_contents()
-        for i, c in enumerate(contents):
-            if c.get("id") == item_id:
-                c["recommendable"] = payload.recommendable
-                json_store_service.save_audio_contents(contents)
-                return AudioContent(**c)
-    raise HTTPException(status_code=404, detail="Audio content not found")
+    updated = json_store_service.update_by_id("audio_contents", item_id, {"recommendable": payload.recommendable})
+    if updated is None:
+        raise HTTPException(status_code=404, detail="Audio content not found")
+    return AudioContent(**updated)
 
 @router.delete("/audio/{item_id}")
 def delete_audio_content(item_id: str):
-    with json_store_service.lock:
-        contents = json_store_service.get_audio_contents()
-        initial_len = len(contents)
-        contents = [c for c in contents if c.get("id") != item_id]
-        if len(contents) == initial_len:
-            raise HTTPException(status_code=404, detail="Audio content not found")
-        json_store_service.save_audio_contents(contents)
+    if not json_store_service.delete_by_id("audio_contents", item_id):
+        raise HTTPException(status_code=404, detail="Audio content not found")
     return {"message": "Deleted"}
 
 # --- DEVICE & DEMO ENDPOINTS ---
@@ -172,21 +186,18 @@ class DemoSuggestionPayload(BaseModel):
 
 @router.post("/demo/trigger-suggestion")
 def trigger_suggestion(payload: DemoSuggestionPayload):
-    with json_store_service.lock:
-        actions = json_store_service.get_device_actions()
-        if payload.kind == "exercise":
-            actions.append({
-                "id": f"act-{str(uuid.uuid4().hex)[:8]}",
-                "kind": "propose_exercise",
-                "text_to_speak": "I have a quick brain exercise for you. Would you like to try it now?"
-            })
-        elif payload.kind == "message":
-            actions.append({
-                "id": f"act-{str(uuid.uuid4().hex)[:8]}",
-                "kind": "propose_audio",
-                "text_to_speak": "I found a nice family message for you to listen to. Shall I play it?"
-            })
-        json_store_service.save_device_actions(actions)
+    if payload.kind == "exercise":
+        json_store_service.append_device_action({
+            "id": f"act-{str(uuid.uuid4().hex)[:8]}",
+            "kind": "propose_exercise",
+            "text_to_speak": "I have a quick brain exercise for you. Would you like to try it now?"
+        })
+    elif payload.kind == "message":
+        json_store_service.append_device_action({
+            "id": f"act-{str(uuid.uuid4().hex)[:8]}",
+            "kind": "propose_audio",
+            "text_to_speak": "I found a nice family message for you to listen to. Shall I play it?"
+        })
     return {"status": "triggered"}
 
 @router.get("/device/next-actions", response_model=List[DeviceAction])
@@ -198,33 +209,26 @@ def get_next_actions(care_receiver_id: Optional[str] = Query(None)):
 
 @router.post("/device/response")
 def submit_device_response(payload: DeviceResponsePayload):
-    with json_store_service.lock:
-        actions = json_store_service.get_device_actions()
-        actions = [a for a in actions if a.get("id") != payload.action_id]
-        json_store_service.save_device_actions(actions)
+    with json_store_service.transaction(write=["device_actions", "events"]):
+        json_store_service.delete_by_id("device_actions", payload.action_id)
 
-        events = json_store_service.get_events()
-        events.append({
+        json_store_service.append_event({
             "id": f"ev-{str(uuid.uuid4().hex)[:8]}",
             "care_receiver_id": "default", # Should fetch proper ID
             "type": "reminder_confirmed" if payload.response == "yes" else "reminder_postponed",
             "payload": {"response": payload.response, "action_id": payload.action_id},
             "created_at": datetime.utcnow().isoformat() + "Z"
         })
-        json_store_service.save_events(events)
 
     return {"status": "recorded"}
 
 @router.post("/device/help-request")
 def submit_help_request(payload: HelpRequestPayload):
-    with json_store_service.lock:
-        events = json_store_service.get_events()
-        events.append({
-            "id": f"ev-{str(uuid.uuid4().hex)[:8]}",
-            "care_receiver_id": "default", # Should fetch proper ID
-            "type": "help_requested",
-            "payload": {"type": payload.type, "message": payload.message},
-            "created_at": datetime.utcnow().isoformat() + "Z"
-        })
-        json_store_service.save_events(events)
+    json_store_service.append_event({
+        "id": f"ev-{str(uuid.uuid4().hex)[:8]}",
+        "care_receiver_id": "default", # Should fetch proper ID
+        "type": "help_requested",
+        "payload": {"type": payload.type, "message": payload.message},
+        "created_at": datetime.utcnow().isoformat() + "Z"
+    })
     return {"status": "help_requested"}
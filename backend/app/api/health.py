@@ -5,13 +5,13 @@ Responsibilities:
 - Fetch daily mood and task completion (like medication) logs.
 - Provide endpoints for the UI to monitor the patient's basic health metrics over time.
 """
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query
 from typing import List, Optional
 import uuid
 from datetime import datetime
 
 from app.models.schemas import HealthLog, HealthLogCreate, CareLoopEvent
-from app.services import json_store_service
+from app.services import archive_service, json_store_service
 
 router = APIRouter(prefix="/health", tags=["health"])
 
@@ -19,6 +19,45 @@ router = APIRouter(prefix="/health", tags=["health"])
 async def health_check():
     return {"status": "ok", "message": "Healthcare assistant backend is running"}
 
+@router.get("/store-locks")
+def get_store_lock_stats():
+    """
+    Statistiques d'attente sur les verrous du store, par collection (diagnostic de contention).
+    """
+    return json_store_service.lock_wait_stats()
+
+@router.get("/agent-sessions")
+def get_agent_session_stats():
+    """
+    Occupation et évictions du cache des sessions de chat de l'agent (nombre, mémoire estimée).
+    """
+    from app.services import agent_service
+    return agent_service.session_cache_stats()
+
+@router.get("/agent-queues")
+def get_agent_queue_stats():
+    """
+    File d'attente des tours de chaque session (profondeur, temps d'attente et d'exécution).
+    """
+    from app.services import agent_service
+    return agent_service.session_queue_stats()
+
+@router.get("/tool-cache")
+def get_tool_cache_stats():
+    """
+    Succès/échecs du cache des outils mémoïsés de l'agent (par outil).
+    """
+    from app.tools import memo_stats
+    return memo_stats()
+
+@router.get("/reminder-phrases")
+def get_reminder_phrase_stats():
+    """
+    Cache des phrases de rappel préparées à l'avance (entrées, succès, générations, échecs).
+    """
+    from app.services import reminder_phrases
+    return reminder_phrases.cache_stats()
+
 @router.get("/logs", response_model=List[HealthLog])
 def get_health_logs():
     """
@@ -40,26 +79,27 @@ def add_health_log(log_in: HealthLogCreate):
         notes=log_in.notes
     )
 
-    with json_store_service.lock:
-        logs = json_store_service.get_health_logs()
-        logs.append(new_log.model_dump())
-        json_store_service.save_health_logs(logs)
+    json_store_service.append_health_log(new_log.model_dump())
 
     return new_log
 
 @router.get("/events", response_model=List[CareLoopEvent])
 def get_care_events(
     care_receiver_id: Optional[str] = Query(None),
-    limit: int = Query(50)
+    limit: int = Query(50),
+    since: Optional[str] = Query(None),
+    include_archive: bool = Query(False)
 ):
     """
     Récupère les événements de la timeline pour le dashboard.
+    Les événements archivés (plus anciens que STORE_HOT_DAYS) ne sont lus que si `include_archive`
+    est demandé ou si `since` remonte avant la fenêtre chaude.
     """
-    events_data = json_store_service.get_events()
-    
-    if care_receiver_id:
-        events_data = [e for e in events_data if e.get("care_receiver_id") == care_receiver_id]
-        
+    since_dt = archive_service.parse_timestamp(since) if since else None
+    if since and since_dt is None:
+        raise HTTPException(status_code=400, detail="Invalid 'since' timestamp")
+    events_data = archive_service.query_events(care_receiver_id, since=since_dt, include_archive=include_archive)
+
     # Sort events by created_at descending
     events_data.sort(key=lambda x: x.get("created_at", ""), reverse=True)
     
@@ -0,0 +1,21 @@
+"""
+This module exposes the backend's performance telemetry to Prometheus.
+
+Responsibilities:
+- Serve /metrics in the Prometheus text exposition format: agent stage and tool latency
+  histograms, turn outcomes, LLM token counts, session cache and queue gauges.
+"""
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.services import metrics_service
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """
+    Métriques de performance au format texte Prometheus (à scraper, ex. toutes les 15 s).
+    """
+    return PlainTextResponse(metrics_service.render(), media_type="text/plain; version=0.0.4")
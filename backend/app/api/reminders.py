@@ -11,11 +11,8 @@ import uuid
 from datetime import datetime
 from pydantic import BaseModel
 
-import re
 from app.models.schemas import CalendarItem, CreateCalendarItemPayload, UpdateCalendarItemPayload
-from app.services import json_store_service
-from app.services.llm_service import generate_reminder_phrase
-from app.services.json_store_service import get_patient_context
+from app.services import json_store_service, reminder_phrases
 
 router = APIRouter(prefix="/reminders", tags=["reminders"])
 
@@ -24,9 +21,10 @@ def get_reminders_list(care_receiver_id: Optional[str] = Query(None)):
     """
     Retourne la liste des rappels planifiés pour le patient.
     """
-    items_data = json_store_service.get_calendar_items()
     if care_receiver_id:
-        items_data = [item for item in items_data if item.get("care_receiver_id") == care_receiver_id]
+        items_data = json_store_service.find("calendar_items", care_receiver_id=care_receiver_id)
+    else:
+        items_data = json_store_service.get_calendar_items()
     return [CalendarItem(**r) for r in items_data]
 
 @router.post("", response_model=CalendarItem)
@@ -47,10 +45,7 @@ def add_new_reminder(payload: CreateCalendarItemPayload):
         created_at=datetime.utcnow().isoformat() + "Z"
     )
 
-    with json_store_service.lock:
-        items = json_store_service.get_calendar_items()
-        items.append(new_item.model_dump())
-        json_store_service.save_calendar_items(items)
+    json_store_service.append_calendar_item(new_item.model_dump())
 
     return new_item
 
@@ -59,32 +54,19 @@ def update_reminder(item_id: str, payload: UpdateCalendarItemPayload):
     """
     Modifie un rappel existant ou marque son statut comme complété/annulé.
     """
-    with json_store_service.lock:
-        items = json_store_service.get_calendar_items()
-        for i, item in enumerate(items):
-            if item.get("id") == item_id:
-                update_data = payload.model_dump(exclude_unset=True)
-                updated_item = {**item, **update_data}
-                items[i] = updated_item
-                json_store_service.save_calendar_items(items)
-                return CalendarItem(**updated_item)
-
-    raise HTTPException(status_code=404, detail="Item not found")
+    update_data = payload.model_dump(exclude_unset=True)
+    updated_item = json_store_service.update_by_id("calendar_items", item_id, update_data)
+    if updated_item is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return CalendarItem(**updated_item)
 
 @router.delete("/{item_id}")
 def delete_reminder(item_id: str):
     """
     Supprime définitivement un rappel du calendrier.
     """
-    with json_store_service.lock:
-        items = json_store_service.get_calendar_items()
-        initial_len = len(items)
-        items = [item for item in items if item.get("id") != item_id]
-
-        if len(items) == initial_len:
-            raise HTTPException(status_code=404, detail="Item not found")
-
-        json_store_service.save_calendar_items(items)
+    if not json_store_service.delete_by_id("calendar_items", item_id):
+        raise HTTPException(status_code=404, detail="Item not found")
     return {"message": "Item deleted"}
 
 class DemoTriggerPayload(BaseModel):
@@ -98,13 +80,6 @@ class VoiceMessageNowPayload(BaseModel):
     message: str
 
 
-def _parse_reminder_type(msg: str) -> str:
-    if not msg:
-        return "reminder"
-    m = re.match(r"^\[([\w_]+)\]\s*", msg)
-    return m.group(1).lower() if m else "reminder"
-
-
 @router.post("/demo/trigger-reminder-now")
 def trigger_reminder_now(payload: DemoTriggerPayload):
     """
@@ -115,15 +90,9 @@ def trigger_reminder_now(payload: DemoTriggerPayload):
     calendar_item_id = None
 
     if payload.calendar_item_id:
-        items = json_store_service.get_calendar_items()
-        item = next((i for i in items if i.get("id") == payload.calendar_item_id), None)
+        item = json_store_service.get_by_id("calendar_items", payload.calendar_item_id)
         if item:
-            title = item.get("title", "reminder")
-            msg = item.get("message_text", "")
-            reminder_type = _parse_reminder_type(msg)
-            ctx = get_patient_context()
-            resident_name = ctx.get("preferred_name") or ctx.get("name") or "Simone"
-            text_to_speak = generate_reminder_phrase(title, reminder_type, msg, resident_name)
+            text_to_speak = reminder_phrases.phrase_for(item)
             calendar_item_id = item.get("id")
 
     new_action = {
@@ -134,10 +103,7 @@ def trigger_reminder_now(payload: DemoTriggerPayload):
     if calendar_item_id:
         new_action["calendar_item_id"] = calendar_item_id
 
-    with json_store_service.lock:
-        actions = json_store_service.get_device_actions()
-        actions.append(new_action)
-        json_store_service.save_device_actions(actions)
+    json_store_service.append_device_action(new_action)
 
     return {"status": "triggered", "action_id": new_action["id"]}
 
@@ -157,20 +123,16 @@ def send_voice_message_now(payload: VoiceMessageNowPayload):
         "text_to_speak": full_text,
     }
 
-    with json_store_service.lock:
-        actions = json_store_service.get_device_actions()
-        actions.append(new_action)
-        json_store_service.save_device_actions(actions)
+    with json_store_service.transaction(write=["device_actions", "events"]):
+        json_store_service.append_device_action(new_action)
 
-        events = json_store_service.get_events()
-        events.append({
+        json_store_service.append_event({
             "id": f"ev-{uuid.uuid4().hex[:8]}",
             "care_receiver_id": payload.care_receiver_id,
             "type": "reminder_delivered",
             "payload": {"sender": payload.sender_name, "message": payload.message[:50]},
             "created_at": datetime.utcnow().isoformat() + "Z",
         })
-        json_store_service.save_events(events)
 
     return {"status": "sent", "action_id": new_action["id"]}
 
@@ -181,23 +143,25 @@ def trigger_calendar_item_now(item_id: str, care_receiver_id: Optional[str] = Qu
     Déclenche immédiatement un événement du calendrier sur l'appareil du patient.
     Crée une DeviceAction à partir de l'élément calendar_item.
     """
-    with json_store_service.lock:
-        items = json_store_service.get_calendar_items()
-        item = next((i for i in items if i.get("id") == item_id), None)
+    def load_item():
+        item = json_store_service.get_by_id("calendar_items", item_id)
         if not item:
             raise HTTPException(status_code=404, detail="Calendar item not found")
-
         if care_receiver_id and item.get("care_receiver_id") != care_receiver_id:
             raise HTTPException(status_code=403, detail="Item does not belong to this care receiver")
+        return item
 
-        title = item.get("title", "Reminder")
+    # La phrase est prise en cache (ou générée) avant de verrouiller le store : un appel LLM
+    # ne doit pas faire attendre les autres écritures
+    text_to_speak = reminder_phrases.phrase_for(load_item())
+
+    with json_store_service.transaction(
+        read=["patient_context", "audio_contents", "calendar_items"],
+        write=["device_actions"],
+    ):
+        item = load_item()
         msg = item.get("message_text", "")
         is_audio = item.get("type") == "audio_push"
-        reminder_type = _parse_reminder_type(msg)
-        ctx = get_patient_context()
-        resident_name = ctx.get("preferred_name") or ctx.get("name") or "Simone"
-        text_to_speak = generate_reminder_phrase(title, reminder_type, msg, resident_name,
-                                                 is_audio_invite=is_audio)
 
         new_action = {
             "id": f"act-{uuid.uuid4().hex[:8]}",
@@ -208,7 +172,6 @@ def trigger_calendar_item_now(item_id: str, care_receiver_id: Optional[str] = Qu
 
         if is_audio:
             # Chercher l'audio lié ou auto-sélectionner le premier disponible
-            audio_contents = json_store_service.get_audio_contents()
             care_id = item.get("care_receiver_id")
             audio_content_id = item.get("audio_content_id")
             is_book = "audiobook" in (msg or "").lower() or "book" in (msg or "").lower()
@@ -216,17 +179,18 @@ def trigger_calendar_item_now(item_id: str, care_receiver_id: Optional[str] = Qu
             ac = None
             # 1. ID explicite
             if audio_content_id:
-                ac = next((c for c in audio_contents if c.get("id") == audio_content_id), None)
+                ac = json_store_service.get_by_id("audio_contents", audio_content_id)
+            own_contents = json_store_service.find("audio_contents", care_receiver_id=care_id) if not ac and care_id else []
             # 2. Bon type pour ce patient
             if not ac:
-                ac = next((c for c in audio_contents
-                           if c.get("care_receiver_id") == care_id and c.get("kind") == target_kind), None)
+                ac = next((c for c in own_contents if c.get("kind") == target_kind), None)
+            audio_contents = json_store_service.get_audio_contents() if not ac else []
             # 3. Bon type sans filtre patient
             if not ac:
                 ac = next((c for c in audio_contents if c.get("kind") == target_kind), None)
             # 4. N'importe quel audio pour ce patient
-            if not ac:
-                ac = next((c for c in audio_contents if c.get("care_receiver_id") == care_id), None)
+            if not ac and own_contents:
+                ac = own_contents[0]
             # 5. Premier audio disponible
             if not ac and audio_contents:
                 ac = audio_contents[0]
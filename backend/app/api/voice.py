@@ -24,6 +24,9 @@ _OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 _ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY", "")
 _ELEVENLABS_VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID", "21m00Tcm4TlvDq8ikWAM")  # ElevenLabs "Rachel"
 _ELEVENLABS_MODEL_ID = os.getenv("ELEVENLABS_MODEL_ID", "eleven_turbo_v2")
+# Provider base URLs (overridden by the benchmark to point at local stand-ins)
+_OPENAI_API_URL = os.getenv("OPENAI_API_URL", "https://api.openai.com").rstrip("/")
+_ELEVENLABS_API_URL = os.getenv("ELEVENLABS_API_URL", "https://api.elevenlabs.io").rstrip("/")
 
 _OPENAI_TIMEOUT = 30.0
 _ELEVENLABS_TIMEOUT = 30.0
@@ -109,7 +112,7 @@ async def transcribe_audio(audio: UploadFile = File(...)) -> dict:
     try:
         async with httpx.AsyncClient(timeout=_OPENAI_TIMEOUT) as client:
             resp = await client.post(
-                "https://api.openai.com/v1/audio/transcriptions",
+                f"{_OPENAI_API_URL}/v1/audio/transcriptions",
                 headers={"Authorization": f"Bearer {_OPENAI_API_KEY}"},
                 files={"file": (filename, io.BytesIO(audio_bytes), content_type)},
                 data={"model": "whisper-1"},
@@ -155,7 +158,7 @@ async def _do_tts(text: str, voice_id: Optional[str], model_id: Optional[str]) -
         )
     voice_id = (voice_id or _ELEVENLABS_VOICE_ID).strip()
     model_id = (model_id or _ELEVENLABS_MODEL_ID).strip()
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
+    url = f"{_ELEVENLABS_API_URL}/v1/text-to-speech/{voice_id}"
     try:
         async with httpx.AsyncClient(timeout=_ELEVENLABS_TIMEOUT) as client:
             resp = await client.post(
@@ -23,6 +23,61 @@ else:
     load_dotenv()
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
+
+# LLM backend: "gemini" (Google API, needs GEMINI_API_KEY) or "stub" (local scripted answers, for
+# offline load tests). The stub waits LLM_STUB_LATENCY_MS per round-trip and LLM_STUB_CHUNK_MS between
+# streamed chunks, and follows the rules of LLM_STUB_SCRIPT (JSON file; built-in script if empty).
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+LLM_STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", "300"))
+LLM_STUB_CHUNK_MS = float(os.getenv("LLM_STUB_CHUNK_MS", "30"))
+LLM_STUB_SCRIPT = os.getenv("LLM_STUB_SCRIPT", "")
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY", "")
 WAPICLOUD_URL = os.getenv("WAPICLOUD_URL", "")
 WAPICLOUD_TOKEN = os.getenv("WAPICLOUD_TOKEN", "")
+
+# Storage backend of json_store_service: "json" (files in app/data) or "sqlite" (app/data/careloop.db)
+STORE_BACKEND = os.getenv("STORE_BACKEND", "json").lower()
+
+# Group commit window (ms) for store log appends: concurrent writes made within the window
+# share one fsync. 0 disables it (each append is fsynced on its own).
+STORE_GROUP_COMMIT_MS = float(os.getenv("STORE_GROUP_COMMIT_MS", "0"))
+
+# Advisory file locks (app/data/.locks) coordinating store access between processes,
+# required when several uvicorn workers share the data directory. POSIX only.
+STORE_PROCESS_LOCKS = os.getenv("STORE_PROCESS_LOCKS", "true").lower() in ("1", "true", "yes")
+
+# Archival of the append-heavy collections (events, sent calendar items): records older than
+# STORE_HOT_DAYS move to monthly archive partitions (0 disables archival). Partitions older than
+# STORE_ARCHIVE_RETENTION_MONTHS are deleted (0 keeps them forever).
+STORE_HOT_DAYS = int(os.getenv("STORE_HOT_DAYS", "30"))
+STORE_ARCHIVE_RETENTION_MONTHS = int(os.getenv("STORE_ARCHIVE_RETENTION_MONTHS", "0"))
+
+# Reminder phrases are generated by the LLM this many minutes before the reminder is due, and
+# cached, so firing a reminder needs no LLM round-trip
+REMINDER_PHRASE_LOOKAHEAD_MIN = float(os.getenv("REMINDER_PHRASE_LOOKAHEAD_MIN", "15"))
+# Reminder phrases generated together in one structured LLM request
+REMINDER_PHRASE_BATCH_SIZE = int(os.getenv("REMINDER_PHRASE_BATCH_SIZE", "25"))
+
+# Maximum number of tool calls of one agent turn executed at the same time
+AGENT_TOOL_CONCURRENCY = int(os.getenv("AGENT_TOOL_CONCURRENCY", "4"))
+
+# Budgets of one agent turn: deadline in seconds (from the request's arrival, shared by every LLM
+# round-trip and tool call), number of tool rounds, and default timeout of a tool call (0 = unbounded).
+# Past a budget the agent answers with a short fallback reply instead of keeping the patient waiting.
+AGENT_TURN_DEADLINE_S = float(os.getenv("AGENT_TURN_DEADLINE_S", "20"))
+AGENT_MAX_TOOL_ROUNDS = int(os.getenv("AGENT_MAX_TOOL_ROUNDS", "4"))
+AGENT_TOOL_TIMEOUT_S = float(os.getenv("AGENT_TOOL_TIMEOUT_S", "8"))
+
+# Turns of one session waiting behind the one being processed; further turns are refused (0 = unbounded)
+AGENT_SESSION_QUEUE_LIMIT = int(os.getenv("AGENT_SESSION_QUEUE_LIMIT", "8"))
+
+# Live agent chat sessions kept in memory (evicted sessions are rebuilt from their transcript):
+# maximum count, idle time-to-live in seconds and approximate memory budget in MB (0 = unbounded).
+AGENT_SESSION_CACHE_SIZE = int(os.getenv("AGENT_SESSION_CACHE_SIZE", "100"))
+AGENT_SESSION_IDLE_TTL_S = float(os.getenv("AGENT_SESSION_IDLE_TTL_S", "1800"))
+AGENT_SESSION_CACHE_MAX_MB = float(os.getenv("AGENT_SESSION_CACHE_MAX_MB", "64"))
+
+# History sent to the LLM: last N turns kept verbatim, older ones folded into a rolling summary,
+# and the whole history kept under this many tokens (estimated at ~4 characters per token; 0 = no budget).
+AGENT_HISTORY_TURNS = int(os.getenv("AGENT_HISTORY_TURNS", "10"))
+AGENT_HISTORY_TOKEN_BUDGET = int(os.getenv("AGENT_HISTORY_TOKEN_BUDGET", "8000"))
@@ -17,7 +17,12 @@ CARE_RECEIVERS_FILE = DATA_DIR / "care_receivers.json"
 REMINDERS_FILE = DATA_DIR / "reminders.json"
 CALENDAR_ITEMS_FILE = DATA_DIR / "calendar_items.json"
 AUDIO_CONTENTS_FILE = DATA_DIR / "audio_contents.json"
+FAMILY_MEMORIES_FILE = DATA_DIR / "family_memories.json"
 EVENTS_FILE = DATA_DIR / "events.json"
 DEVICE_ACTIONS_FILE = DATA_DIR / "device_actions.json"
-CONVERSATIONS_FILE = DATA_DIR / "conversations.json"
+CONVERSATIONS_FILE = DATA_DIR / "conversations.json"  # Legacy single-file transcripts, imported into CONVERSATIONS_DIR
+CONVERSATIONS_DIR = DATA_DIR / "conversations"
 HEALTH_LOGS_FILE = DATA_DIR / "health_logs.json"
+SQLITE_DB_FILE = DATA_DIR / "careloop.db"
+LOCKS_DIR = DATA_DIR / ".locks"  # Advisory lock files shared by the uvicorn workers
+ARCHIVE_DIR = DATA_DIR / "archive"  # Monthly partitions of archived events / calendar items
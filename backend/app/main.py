@@ -4,17 +4,16 @@ This module serves as the primary entry point for the FastAPI application.
 Responsibilities:
 - Initialize the FastAPI app instance.
 - Include all necessary API routers (chat, reminders, caregivers, health, telegram_webhook).
+- Expose the Prometheus metrics at /metrics (outside the /api prefix, where scrapers expect them).
 - Set up initial application state and configurations.
 """
 import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from app.api import chat, reminders, health, caregivers, routines, whatsapp
+from app.api import chat, reminders, health, caregivers, routines, whatsapp, metrics
 from app.api.voice import router as voice_router
 from app.services.scheduler_service import init_scheduler, scheduler
-import google.generativeai as genai
-from fastapi.applications import LifespanManager
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -43,6 +42,7 @@ app.include_router(health.router, prefix="/api")
 app.include_router(caregivers.router, prefix="/api")
 app.include_router(routines.router, prefix="/api")
 app.include_router(whatsapp.router, prefix="/api")
+app.include_router(metrics.router)
 
 # Serve static audio files
 app.mount("/audio", StaticFiles(directory="app/static/audio"), name="audio")
@@ -129,6 +129,29 @@ class AudioContent(BaseModel):
     recommendable: bool
     created_at: str
 
+class FamilyMemory(BaseModel):
+    id: str
+    care_receiver_id: str
+    title: Optional[str] = None
+    text: str
+    tags: List[str] = []
+    created_at: str
+
+class FamilyMemoryCreate(BaseModel):
+    text: str
+    title: Optional[str] = None
+    tags: List[str] = []
+
+class FamilyMemoryHit(FamilyMemory):
+    score: float
+
+class TranscriptHit(BaseModel):
+    session_id: str
+    role: Optional[str] = None
+    created_at: Optional[str] = None
+    snippet: str
+    score: float
+
 class CreateAudioContentPayload(BaseModel):
     care_receiver_id: str
     title: str
@@ -4,24 +4,46 @@ This module encapsulates the core reasoning agent.
 Responsibilities:
 - Act as the central brain orchestrating the LLM and the tools.
 - Maintain dialogue state and decide when to use specific function calls.
+- Run the whole turn without blocking the event loop: async Gemini client,
+  store reads/writes and synchronous tools moved to worker threads.
+- Run the turns of one session one after the other through its actor, while different
+  sessions are served concurrently.
+- Keep every turn within its budgets (deadline, tool rounds, per-tool timeouts) and fall back
+  to a short reply when one runs out, so the patient is never left waiting.
+- Time every stage of a turn and count LLM tokens (see metrics_service).
 """
+import asyncio
+import inspect
 import json
 import re
+import time
 from pathlib import Path
 
 from google.genai import types
 
+from app.core import config
 from app.core.constants import BASE_DIR
-from app.services.llm_service import create_chat, TOOL_MAP
+from app.services import (
+    environment_context, history_manager, metrics_service, session_actors, session_cache, turn_budget,
+)
+from app.services.metrics_service import timed
+from app.services.llm_service import create_async_chat, summarize_conversation, TOOL_MAP
+from app.tools import tool_timeout, tool_writes
 from app.services.json_store_service import (
-    get_patient_context, get_conversations, save_conversations, append_to_conversation,
-    get_reminders, get_calendar_items, get_device_actions, get_caregivers
+    get_patient_context, append_to_conversation, get_conversation,
 )
 
 from app.models.schemas import HistoryItem
 
-# Simple in-memory cache for chat SDK objects
-_active_chats = {}
+# Bounded in-memory cache for chat SDK objects (LRU + idle TTL + memory budget)
+_active_chats = session_cache.create_default()
+# Spoken when a turn runs out of time or tool rounds
+FALLBACK_REPLY = "I'm sorry, that is taking me longer than expected. Could you ask me again in a moment?"
+
+# Per-session workers: turns of one session never overlap on its chat object
+_actors = session_actors.create_default()
+# Background history compactions, awaited before the session's next turn
+_compactions: dict[str, asyncio.Task] = {}
 
 
 def _strip_markdown(text: str) -> str:
@@ -43,6 +65,10 @@ def _strip_markdown(text: str) -> str:
     text = re.sub(r'\n{3,}', '\n\n', text)
     return text.strip()
 
+def clean_for_speech(text: str) -> str:
+    """Text of a reply (or of one of its sentences) as it should be spoken: markdown removed."""
+    return _strip_markdown(text)
+
 def load_system_prompt() -> str:
     """Read the base prompt and dynamically append patient context."""
     prompt_path = BASE_DIR / "app" / "prompts" / "system_prompt.txt"
@@ -62,119 +88,340 @@ def load_system_prompt() -> str:
     dynamic_part = f"\n\n--- PATIENT CONTEXT ---\nHere is the patient's information:\n{json.dumps(context, indent=2, ensure_ascii=False)}"
     return base_prompt + dynamic_part
 
-def _get_or_create_chat(session_id: str):
-    """Get the active chat session (includes conversational history) or start a new one."""
-    if session_id not in _active_chats:
-        system_instruction = load_system_prompt()
-        _active_chats[session_id] = create_chat(system_instruction)
-    return _active_chats[session_id]
+def _persisted_history(session_id: str) -> list[types.Content]:
+    """Rebuild the LLM chat history of a session from its persisted transcript."""
+    conversation = get_conversation(session_id)
+    if not conversation:
+        return []
+    return [
+        types.Content(
+            role="model" if m.get("role") == "assistant" else "user",
+            parts=[types.Part(text=m.get("content") or "")],
+        )
+        for m in conversation["messages"]
+        if m.get("content")
+    ]
+
+async def _get_or_create_chat(session_id: str):
+    """Get the active chat session (includes conversational history), or rebuild it from its transcript."""
+    pending = _compactions.get(session_id)
+    if pending is not None:
+        await asyncio.wait([pending])
+    chat = _active_chats.get(session_id)
+    if chat is None:
+        system_instruction, history = await asyncio.gather(
+            asyncio.to_thread(load_system_prompt),
+            asyncio.to_thread(_persisted_history, session_id),
+        )
+        if history:
+            print(f"[SESSIONS] Rehydrating session {session_id} from {len(history)} persisted message(s)")
+            history, _ = await history_manager.compact(history, summarize_conversation)
+        # Another turn of the same session may have created it while the history was loading
+        chat = _active_chats.setdefault(session_id, create_async_chat(system_instruction, history))
+    return chat
+
+async def _compact_history(session_id: str, chat):
+    """
+    Strip the context block of the turn that just ended, in the chat itself. When older turns must be
+    folded into the summary, swap in a chat built on the compacted history.
+    """
+    try:
+        history = chat.get_history(curated=True)
+        history_manager.strip_last_turn(history)
+        history, changed = await history_manager.compact(history, summarize_conversation)
+        if changed:
+            system_instruction = await asyncio.to_thread(load_system_prompt)
+            _active_chats.replace(session_id, chat, create_async_chat(system_instruction, history))
+    except Exception as e:
+        print(f"[HISTORY] Compaction of session {session_id} failed: {e}")
+    finally:
+        if _compactions.get(session_id) is asyncio.current_task():
+            del _compactions[session_id]
+
+def _schedule_history_compaction(session_id: str, chat):
+    if hasattr(chat, "get_history"):
+        _compactions[session_id] = asyncio.create_task(_compact_history(session_id, chat))
 
-def process_user_message(session_id: str, message: str) -> str:
+async def run_tool(name: str, args: dict) -> dict:
     """
-    Sends a message to the agent, handles any necessary tool calls iteratively,
-    and returns the final textual response.
+    Execute one tool call: coroutine tools are awaited, blocking ones run in a worker thread.
+    The call is bounded by the tool's timeout and the turn's deadline. A blocking tool that
+    times out keeps running in its thread, but the turn no longer waits for it.
     """
+    fn = TOOL_MAP.get(name)
+    if fn is None:
+        return {"error": f"Tool {name} not found"}
+    start = time.perf_counter()
+    outcome = "ok"
     try:
-        chat = _get_or_create_chat(session_id)
-    except RuntimeError as e:
-        return f"Configuration error: {str(e)}"
+        limit = turn_budget.timeout(tool_timeout(fn) or config.AGENT_TOOL_TIMEOUT_S or None)
+        if inspect.iscoroutinefunction(fn):
+            return await asyncio.wait_for(fn(**args), limit)
+        return await asyncio.wait_for(asyncio.to_thread(fn, **args), limit)
+    except (asyncio.TimeoutError, turn_budget.BudgetExceeded):
+        outcome = "timeout"
+        print(f"\033[91m⏱️  [TOOL TIMEOUT]\033[0m {name}")
+        return {"error": f"Tool {name} did not answer in time. Do not retry it in this turn."}
+    except Exception as e:
+        outcome = "error"
+        return {"error": str(e)}
+    finally:
+        metrics_service.TOOL_SECONDS.observe(time.perf_counter() - start, tool=name, outcome=outcome)
+
+async def run_tool_calls(calls: list[tuple[str, dict]]) -> list[dict]:
+    """
+    Execute the tool calls of one turn concurrently (at most AGENT_TOOL_CONCURRENCY at a time)
+    and return their results in the original order. A call waits for the earlier calls
+    that write one of the resources it writes.
+    """
+    semaphore = asyncio.Semaphore(max(1, config.AGENT_TOOL_CONCURRENCY))
+    last_writer: dict[str, asyncio.Task] = {}
+
+    async def run_after(previous: set, name: str, args: dict) -> dict:
+        if previous:
+            await asyncio.wait(previous)
+        async with semaphore:
+            return await run_tool(name, args)
+
+    tasks = []
+    for name, args in calls:
+        writes = tool_writes(TOOL_MAP[name]) if name in TOOL_MAP else frozenset()
+        previous = {last_writer[r] for r in writes if r in last_writer}
+        task = asyncio.create_task(run_after(previous, name, args))
+        for resource in writes:
+            last_writer[resource] = task
+        tasks.append(task)
+    return list(await asyncio.gather(*tasks))
+
+async def _begin_turn(session_id: str, message: str) -> str:
+    """Build the message actually sent to the LLM and log the user's prompt."""
     # --- ENVIRONMENTAL CONTEXT INJECTION (Invisible to the user) ---
-    from datetime import datetime
-    current_time_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    # Fetch real-time data
-    reminders = get_reminders()
-    calendar = get_calendar_items()
-    devices = get_device_actions()
-    caregivers = get_caregivers()
-    patient_context = get_patient_context()
-    
-    # Mock weather data
-    location = patient_context.get("home_address", "Unknown Location")
-    mock_weather = f"Sunny, 22°C in {location}"
-
-    env_context = f"\n[REAL-TIME ENVIRONMENTAL CONTEXT]\nCurrent local time: {current_time_str}\n"
-    env_context += f"Current weather/location: {mock_weather}\n"
-
-    if caregivers:
-        env_context += "- Registered Caregivers / Contacts:\n"
-        for cg in caregivers:
-            env_context += f"  * {cg.get('name')} ({cg.get('relation')}) - {cg.get('context', '')}\n"
-
-    if reminders:
-        env_context += "- Configured recurring reminders:\n"
-        for r in reminders:
-            env_context += f"  * {r.get('title')} ({r.get('scheduled_time')} - {r.get('repeat_rule')})\n"
-
-    if calendar:
-        env_context += "- Upcoming calendar events/audio:\n"
-        for c in calendar:
-            env_context += f"  * {c.get('title')} scheduled at {c.get('scheduled_at')} (Status: {c.get('status')})\n"
-
-    if devices:
-        env_context += "- Pending notifications/actions on patient's device:\n"
-        for d in devices:
-            env_context += f"  * Pending action ({d.get('kind')}): {d.get('text_to_speak')}\n"
-
-    env_context += "[END OF ENVIRONMENTAL CONTEXT]\n\n"
-    
+    with timed("env_context"):
+        env_context = await asyncio.to_thread(environment_context.build)
     augmented_message = env_context + message
     # ---------------------------------------------------------------------------
-    
+
     # Log the user's prompt in the business JSON (excluding environment context)
-    append_to_conversation(session_id, "user", message)
+    with timed("transcript_write"):
+        await asyncio.to_thread(append_to_conversation, session_id, "user", message)
+    return augmented_message
+
+async def _resolve_tool_calls(function_calls) -> list:
+    """Run the tool calls requested by the LLM and build the function responses to send back."""
+    calls = [(fc.name, dict(fc.args or {})) for fc in function_calls]
+    for name, args in calls:
+        print(f"\n\033[95m🤖 [AGENT REASONING]\033[0m Agent decided to use a tool:")
+        print(f"\033[94m🛠️  [TOOL EXECUTION]\033[0m Name: {name}")
+        print(f"    Arguments: {args}")
+
+    # Independent calls run concurrently; results are returned in call order
+    with timed("tool_round"):
+        results = await run_tool_calls(calls)
+
+    function_responses = []
+    for (name, _), result in zip(calls, results):
+        print(f"\033[92m✅ [TOOL RESULT]\033[0m {name}: {result}")
+        function_responses.append(
+            types.Part.from_function_response(name=name, response=result)
+        )
+
+    print("\n\033[93m⏳ [AGENT THINKING]\033[0m Sending tool result to Gemini for further reasoning...")
+    return function_responses
+
+async def _finish_turn(session_id: str, chat, final_text: str) -> str:
+    """Clean and log the assistant's reply, then schedule the session's history maintenance."""
+    print(f"\n\033[96m🗣️  [FINAL RESPONSE]\033[0m {final_text}\n")
+    # Strip markdown so TTS reads clean natural speech
+    with timed("markdown_strip"):
+        final_text = _strip_markdown(final_text)
+    # Log the final response of the assistant in the business JSON
+    with timed("transcript_write"):
+        await asyncio.to_thread(append_to_conversation, session_id, "assistant", final_text)
+    _active_chats.update_size(session_id)
+    # Older turns are folded into the summary in the background, before the next turn of this session
+    _schedule_history_compaction(session_id, chat)
+    return final_text
 
+async def _send(chat, message, stage: str):
+    """One LLM round-trip, bounded by what is left of the turn's deadline."""
+    timeout = turn_budget.timeout()
+    with timed(stage):
+        response = await asyncio.wait_for(chat.send_message(message), timeout)
+    metrics_service.record_usage(stage, getattr(response, "usage_metadata", None))
+    return response
+
+async def _degrade(session_id: str, reason: str) -> str:
+    """
+    End a turn that ran out of budget with FALLBACK_REPLY.
+    The session's chat may be left mid tool exchange: drop it so the next turn rebuilds it
+    from the transcript, which ends with this reply.
+    """
+    print(f"\n\033[91m⏱️  [TURN BUDGET]\033[0m {reason}: answering with the fallback reply")
+    _active_chats.pop(session_id)
+    await asyncio.to_thread(append_to_conversation, session_id, "assistant", FALLBACK_REPLY)
+    return FALLBACK_REPLY
+
+async def process_user_message(session_id: str, message: str) -> str:
+    """
+    Sends a message to the agent, handles any necessary tool calls iteratively,
+    and returns the final textual response.
+    The turn is queued behind the session's earlier turns; its deadline runs from now.
+    """
+    budget = turn_budget.new()
     try:
-        response = chat.send_message(augmented_message)
-    except Exception as e:
-        return f"LLM Agent error: {str(e)}"
-
-    # Iteratively resolve tool calls
-    while response.function_calls:
-        function_responses = []
-        for fc in response.function_calls:
-            name = fc.name
-            args = dict(fc.args)
-            
-            print(f"\n\033[95m🤖 [AGENT REASONING]\033[0m Agent decided to use a tool:")
-            print(f"\033[94m🛠️  [TOOL EXECUTION]\033[0m Name: {name}")
-            print(f"    Arguments: {args}")
-
-            if name in TOOL_MAP:
-                try:
-                    result = TOOL_MAP[name](**args)
-                except Exception as e:
-                    result = {"error": str(e)}
+        with timed("turn"):
+            return await _actors.run(session_id, lambda: _process_turn(session_id, message, budget))
+    except session_actors.SessionQueueFull as e:
+        metrics_service.TURNS.inc(outcome="busy")
+        return f"Agent busy: {str(e)}"
+
+async def _process_turn(session_id: str, message: str, budget: turn_budget.TurnBudget) -> str:
+    with turn_budget.active(budget):
+        try:
+            chat = await _get_or_create_chat(session_id)
+        except RuntimeError as e:
+            metrics_service.TURNS.inc(outcome="error")
+            return f"Configuration error: {str(e)}"
+        augmented_message = await _begin_turn(session_id, message)
+
+        try:
+            response = await _send(chat, augmented_message, "llm_initial")
+
+            # Iteratively resolve tool calls, within the turn's round and time budgets
+            while response.function_calls:
+                budget.start_tool_round()
+                function_responses = await _resolve_tool_calls(response.function_calls)
+                response = await _send(chat, function_responses, "llm_followup")
+        except asyncio.TimeoutError:
+            metrics_service.TURNS.inc(outcome="fallback")
+            return await _degrade(session_id, "turn deadline exceeded")
+        except turn_budget.BudgetExceeded as e:
+            metrics_service.TURNS.inc(outcome="fallback")
+            return await _degrade(session_id, str(e))
+        except Exception as e:
+            metrics_service.TURNS.inc(outcome="error")
+            return f"LLM Agent error: {str(e)}"
+
+        metrics_service.TURNS.inc(outcome="ok")
+        return await _finish_turn(session_id, chat, response.text or "")
+
+async def stream_user_message(session_id: str, message: str):
+    """
+    Streaming variant of process_user_message.
+    Yields {"type": "delta", "text": ...} events as the LLM produces the reply,
+    then one {"type": "final", "text": ...} event with the cleaned full response.
+    Tool rounds are resolved between streams; only their final answer is streamed.
+    The turn runs in the session's actor and completes even if the consumer stops early.
+    """
+    budget = turn_budget.new()
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def turn():
+        with turn_budget.active(budget):
+            async for event in _stream_turn(session_id, message, budget):
+                events.put_nowait(event)
+
+    async def run_turn():
+        try:
+            await _actors.run(session_id, turn)
+        except session_actors.SessionQueueFull as e:
+            events.put_nowait({"type": "final", "text": f"Agent busy: {str(e)}"})
+        finally:
+            events.put_nowait(None)
+
+    start = time.perf_counter()
+    job = asyncio.create_task(run_turn())
+    while (event := await events.get()) is not None:
+        yield event
+    await job
+    metrics_service.STAGE_SECONDS.observe(time.perf_counter() - start, stage="turn")
+
+async def _stream_turn(session_id: str, message: str, budget: turn_budget.TurnBudget):
+    try:
+        chat = await _get_or_create_chat(session_id)
+    except RuntimeError as e:
+        metrics_service.TURNS.inc(outcome="error")
+        yield {"type": "final", "text": f"Configuration error: {str(e)}"}
+        return
+    turn_start = time.perf_counter()
+    pending_message = await _begin_turn(session_id, message)
+
+    parts = []
+    stage = "llm_initial"
+    try:
+        while pending_message is not None:
+            function_calls = []
+            usage = None
+            with timed(stage):
+                async with asyncio.timeout(turn_budget.timeout()):
+                    async for chunk in await chat.send_message_stream(pending_message):
+                        usage = getattr(chunk, "usage_metadata", None) or usage
+                        if chunk.function_calls:
+                            function_calls.extend(chunk.function_calls)
+                        text = chunk.text if not chunk.function_calls else None
+                        if text:
+                            if not parts:
+                                # What the patient waits for before the first words can be spoken
+                                metrics_service.STAGE_SECONDS.observe(time.perf_counter() - turn_start, stage="first_delta")
+                            parts.append(text)
+                            yield {"type": "delta", "text": text}
+            # The last chunk carries the usage of the whole stream
+            metrics_service.record_usage(stage, usage)
+            stage = "llm_followup"
+            if function_calls:
+                budget.start_tool_round()
+                pending_message = await _resolve_tool_calls(function_calls)
             else:
-                result = {"error": f"Tool {name} not found"}
+                pending_message = None
+    except (asyncio.TimeoutError, turn_budget.BudgetExceeded) as e:
+        metrics_service.TURNS.inc(outcome="fallback")
+        # Whatever was already said stays; the fallback closes the reply
+        yield {"type": "delta", "text": (" " if parts else "") + FALLBACK_REPLY}
+        await _degrade(session_id, str(e) or "turn deadline exceeded")
+        yield {"type": "final", "text": _strip_markdown("".join(parts) + " " + FALLBACK_REPLY)}
+        return
+    except Exception as e:
+        metrics_service.TURNS.inc(outcome="error")
+        yield {"type": "final", "text": f"LLM Agent error: {str(e)}"}
+        return
 
-            print(f"\033[92m✅ [TOOL RESULT]\033[0m {result}")
+    metrics_service.TURNS.inc(outcome="ok")
+    yield {"type": "final", "text": await _finish_turn(session_id, chat, "".join(parts))}
 
-            function_responses.append(
-                types.Part.from_function_response(name=name, response=result)
-            )
+metrics_service.gauge(
+    "careloop_agent_sessions",
+    "Live agent chat sessions held in memory.",
+    lambda: {(): len(_active_chats)},
+)
+metrics_service.gauge(
+    "careloop_agent_session_cache_bytes",
+    "Approximate memory held by the live sessions' histories.",
+    lambda: {(): _active_chats.total_bytes()},
+)
+metrics_service.gauge(
+    "careloop_agent_queue_depth",
+    "Turns running or waiting, per session with a live worker.",
+    lambda: {(session_id,): s["depth"] for session_id, s in _actors.snapshot()["sessions"].items()},
+    labels=("session_id",),
+)
 
-        print("\n\033[93m⏳ [AGENT THINKING]\033[0m Sending tool result to Gemini for further reasoning...")
-        response = chat.send_message(function_responses)
+def session_cache_stats() -> dict:
+    return _active_chats.snapshot()
 
-    final_text = response.text
-    if not final_text:
-        final_text = ""
-        
-    print(f"\n\033[96m🗣️  [FINAL RESPONSE]\033[0m {final_text}\n")
-    # Strip markdown so TTS reads clean natural speech
-    final_text = _strip_markdown(final_text)
-    # Log the final response of the assistant in the business JSON
-    append_to_conversation(session_id, "assistant", final_text)
-
-    return final_text
+def session_queue_stats() -> dict:
+    return _actors.snapshot()
 
 def get_session_history(session_id: str) -> list[HistoryItem]:
-    """Retrieve history from the active chat state."""
-    if session_id not in _active_chats:
-        return []
+    """Retrieve history from the active chat state (or the persisted transcript if the session was evicted)."""
+    chat = _active_chats.peek(session_id)
+    if chat is None:
+        conversation = get_conversation(session_id)
+        return [
+            HistoryItem(role=m["role"], content=m["content"])
+            for m in (conversation or {}).get("messages", [])
+            if m.get("content")
+        ]
 
-    chat = _active_chats[session_id]
     history = []
     for m in chat.get_history():
         # Ignore system messages / tool execution overhead in simple output
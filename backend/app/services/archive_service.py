@@ -0,0 +1,172 @@
+"""
+This module moves old records out of the hot store collections into monthly archive partitions.
+
+Responsibilities:
+- Archive events older than STORE_HOT_DAYS, and calendar items already sent (or otherwise
+  no longer scheduled) whose date is older than that, into one JSON Lines file per collection and month.
+- Delete archive partitions older than STORE_ARCHIVE_RETENTION_MONTHS.
+- Read archived records back on demand (dashboard timeline), so hot paths only load recent data.
+"""
+import re
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core import config, constants
+from app.services import json_store_service, segment_log
+
+_PARTITION = re.compile(r"^(?P<collection>[a-z_]+)-(?P<month>\d{4}-\d{2})\.jsonl$")
+
+
+def _archived_collections() -> Dict[str, Dict[str, Any]]:
+    """Archivable collections: time field, eligibility rule and store accessors."""
+    return {
+        "events": {
+            "time_field": "created_at",
+            "eligible": lambda record: True,
+            "get": json_store_service.get_events,
+            "save": json_store_service.save_events,
+        },
+        "calendar_items": {
+            "time_field": "scheduled_at",
+            "eligible": lambda record: record.get("status") != "scheduled",
+            "get": json_store_service.get_calendar_items,
+            "save": json_store_service.save_calendar_items,
+        },
+    }
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    """Parse an ISO timestamp as stored in the collections ('...Z' or naive = UTC)."""
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except (ValueError, TypeError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def hot_cutoff(now: Optional[datetime] = None) -> Optional[datetime]:
+    """Records older than this are archived (None when archival is disabled)."""
+    if config.STORE_HOT_DAYS <= 0:
+        return None
+    return (now or datetime.now(timezone.utc)) - timedelta(days=config.STORE_HOT_DAYS)
+
+
+def partition_path(collection: str, month: str) -> Path:
+    return constants.ARCHIVE_DIR / f"{collection}-{month}.jsonl"
+
+
+def _partitions(collection: str) -> Dict[str, Path]:
+    """month (YYYY-MM) -> partition file, oldest first."""
+    found = {}
+    if constants.ARCHIVE_DIR.exists():
+        for path in constants.ARCHIVE_DIR.glob(f"{collection}-*.jsonl"):
+            match = _PARTITION.match(path.name)
+            if match and match.group("collection") == collection:
+                found[match.group("month")] = path
+    return dict(sorted(found.items()))
+
+
+def archive_collection(collection: str, now: Optional[datetime] = None) -> int:
+    """
+    Move the archivable records of one collection to their monthly partitions.
+    Partitions are appended (and fsynced) before the records leave the hot collection:
+    a crash in between only duplicates records in the archive, and readers drop duplicates.
+    Returns the number of records archived.
+    """
+    cutoff = hot_cutoff(now)
+    if cutoff is None:
+        return 0
+    spec = _archived_collections()[collection]
+    with json_store_service.transaction(write=[collection]):
+        records = spec["get"]()
+        by_month: Dict[str, List[Dict[str, Any]]] = {}
+        kept = []
+        for record in records:
+            when = parse_timestamp(record.get(spec["time_field"]))
+            if when is not None and when < cutoff and spec["eligible"](record):
+                by_month.setdefault(when.strftime("%Y-%m"), []).append(record)
+            else:
+                kept.append(record)
+        if not by_month:
+            return 0
+        for month, archived in by_month.items():
+            segment_log.append_now(partition_path(collection, month), segment_log.encode_lines(archived))
+        spec["save"](kept)
+    count = sum(len(archived) for archived in by_month.values())
+    print(f"[ARCHIVE] {count} {collection} record(s) moved to {', '.join(sorted(by_month))} partition(s)")
+    return count
+
+
+def purge_partitions(now: Optional[datetime] = None) -> List[str]:
+    """Delete partitions older than the archive retention. Returns the deleted file names."""
+    months = config.STORE_ARCHIVE_RETENTION_MONTHS
+    if months <= 0:
+        return []
+    now = now or datetime.now(timezone.utc)
+    index = now.year * 12 + now.month - 1 - months
+    oldest_kept = f"{index // 12:04d}-{index % 12 + 1:02d}"
+    deleted = []
+    for collection in _archived_collections():
+        for month, path in _partitions(collection).items():
+            if month < oldest_kept:
+                path.unlink()
+                deleted.append(path.name)
+    if deleted:
+        print(f"[ARCHIVE] Deleted expired partitions: {', '.join(deleted)}")
+    return deleted
+
+
+def run_archival():
+    """Background job: archive old records, apply retention, then fold the resulting logs into snapshots."""
+    for collection in _archived_collections():
+        archive_collection(collection)
+    purge_partitions()
+    json_store_service.compact_all()
+
+
+def read_archive(
+    collection: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    where: Optional[Callable[[Dict[str, Any]], bool]] = None,
+) -> List[Dict[str, Any]]:
+    """Archived records of a collection, optionally restricted to [since, until), oldest partition first."""
+    time_field = _archived_collections()[collection]["time_field"]
+    first = since.strftime("%Y-%m") if since else None
+    last = until.strftime("%Y-%m") if until else None
+    records: Dict[Any, Dict[str, Any]] = {}
+    for month, path in _partitions(collection).items():
+        if (first and month < first) or (last and month > last):
+            continue
+        for i, record in enumerate(segment_log.read_json_lines(path)):
+            if not isinstance(record, dict) or (where and not where(record)):
+                continue
+            when = parse_timestamp(record.get(time_field))
+            if when is not None and ((since and when < since) or (until and when >= until)):
+                continue
+            records[record.get("id") or (path.name, i)] = record
+    return list(records.values())
+
+
+def query_events(
+    care_receiver_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    include_archive: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Events for the dashboard. Only the hot collection is read unless the archive is requested
+    or `since` reaches back before the hot window.
+    """
+    if care_receiver_id:
+        events = json_store_service.find("events", care_receiver_id=care_receiver_id)
+    else:
+        events = json_store_service.get_events()
+    if since:
+        events = [e for e in events if (parse_timestamp(e.get("created_at")) or since) >= since]
+    cutoff = hot_cutoff()
+    if include_archive or (since and cutoff and since < cutoff):
+        where = (lambda e: e.get("care_receiver_id") == care_receiver_id) if care_receiver_id else None
+        hot_ids = {e.get("id") for e in events}
+        events = [e for e in read_archive("events", since=since, where=where) if e.get("id") not in hot_ids] + events
+    return events
@@ -0,0 +1,93 @@
+"""
+This module builds the real-time environmental context injected before each patient message.
+
+Responsibilities:
+- Render reminders, calendar items, pending device actions, caregivers and location into the
+  [REAL-TIME ENVIRONMENTAL CONTEXT] block sent to the LLM (invisible to the patient).
+- Keep the rendered block between turns and rebuild it only when one of its source
+  collections changes; only the current time is refreshed on each turn.
+"""
+import threading
+from datetime import datetime
+from typing import Optional, Tuple
+
+from app.core import config, constants
+from app.services import json_store_service
+
+# Store collections the context is built from
+SOURCES = ("reminders", "calendar_items", "device_actions", "caregivers", "patient_context")
+
+_snapshot: Optional[Tuple[tuple, str]] = None  # (store location + source versions, rendered body)
+_lock = threading.Lock()
+stats = {"rebuilds": 0, "reuses": 0}
+
+
+def _render_body() -> str:
+    """Everything after the time line (blocking store reads)."""
+    reminders = json_store_service.get_reminders()
+    calendar = json_store_service.get_calendar_items()
+    devices = json_store_service.get_device_actions()
+    caregivers = json_store_service.get_caregivers()
+    patient_context = json_store_service.get_patient_context()
+
+    # Mock weather data
+    location = patient_context.get("home_address", "Unknown Location")
+    lines = [f"Current weather/location: Sunny, 22°C in {location}"]
+
+    if caregivers:
+        lines.append("- Registered Caregivers / Contacts:")
+        lines.extend(f"  * {cg.get('name')} ({cg.get('relation')}) - {cg.get('context', '')}" for cg in caregivers)
+
+    if reminders:
+        lines.append("- Configured recurring reminders:")
+        lines.extend(f"  * {r.get('title')} ({r.get('scheduled_time')} - {r.get('repeat_rule')})" for r in reminders)
+
+    if calendar:
+        lines.append("- Upcoming calendar events/audio:")
+        lines.extend(
+            f"  * {c.get('title')} scheduled at {c.get('scheduled_at')} (Status: {c.get('status')})" for c in calendar
+        )
+
+    if devices:
+        lines.append("- Pending notifications/actions on patient's device:")
+        lines.extend(f"  * Pending action ({d.get('kind')}): {d.get('text_to_speak')}" for d in devices)
+
+    lines.append("[END OF ENVIRONMENTAL CONTEXT]\n\n")
+    return "\n".join(lines)
+
+
+def _versions() -> tuple:
+    return (config.STORE_BACKEND, str(constants.DATA_DIR)) + tuple(
+        json_store_service.collection_version(name) for name in SOURCES
+    )
+
+
+def _body() -> str:
+    global _snapshot
+    versions = _versions()
+    snapshot = _snapshot
+    if snapshot is not None and None not in versions and snapshot[0] == versions:
+        stats["reuses"] += 1
+        return snapshot[1]
+    with _lock:
+        # Versions are captured before reading, so a write made during the render forces the next
+        # rebuild. Render again once if the sources changed meanwhile (e.g. files created on first read).
+        for _ in range(2):
+            versions = _versions()
+            body = _render_body()
+            if _versions() == versions:
+                break
+        _snapshot = (versions, body)
+        stats["rebuilds"] += 1
+    return body
+
+
+def build() -> str:
+    """The environmental context block for a turn happening now."""
+    current_time_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return f"\n[REAL-TIME ENVIRONMENTAL CONTEXT]\nCurrent local time: {current_time_str}\n{_body()}"
+
+
+def invalidate():
+    global _snapshot
+    _snapshot = None
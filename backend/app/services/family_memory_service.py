@@ -0,0 +1,123 @@
+"""
+This module manages the family memories of each care receiver and their retrieval.
+
+Responsibilities:
+- Store the anecdotes written by caregivers in the family_memories collection.
+- Keep one ranked full-text index (see text_index) per care receiver in memory, updated
+  incrementally when memories are added or deleted through this module.
+- Rebuild the indexes when the collection changed elsewhere (another worker, a manual edit),
+  detected through the collection's version.
+"""
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.services import json_store_service, store_cache, text_index
+
+COLLECTION = "family_memories"
+
+_lock = threading.Lock()
+_indexes: Dict[str, text_index.InvertedIndex] = {}
+_records: Dict[str, Dict[str, Any]] = {}
+_UNBUILT = object()
+_indexed_version: Any = _UNBUILT
+
+
+def _searchable_text(memory: Dict[str, Any]) -> str:
+    return " ".join([memory.get("title") or "", memory.get("text") or "", *(memory.get("tags") or [])])
+
+
+def _rebuild():
+    global _indexed_version
+    # Version first: a write landing during the rebuild only makes the next lookup rebuild again
+    version = json_store_service.collection_version(COLLECTION)
+    memories = json_store_service.get_family_memories()
+    _records.clear()
+    _indexes.clear()
+    for memory in memories:
+        _records[memory["id"]] = memory
+        index = _indexes.setdefault(memory.get("care_receiver_id"), text_index.InvertedIndex())
+        index.add(memory["id"], _searchable_text(memory))
+    _indexed_version = version
+    print(f"[MEMORIES] Indexed {len(memories)} memories for {len(_indexes)} care receiver(s)")
+
+
+def _sync():
+    """Rebuild the indexes unless they reflect the current version of the collection. Call with _lock held."""
+    version = json_store_service.collection_version(COLLECTION)
+    if version is None or version != _indexed_version:
+        _rebuild()
+
+
+def _write(apply):
+    """
+    Run a single-record write and patch the indexes with `apply` if they were up to date
+    before it; otherwise the next lookup rebuilds them. The collection is locked throughout,
+    so no other writer can slip in between the two versions.
+    """
+    global _indexed_version
+    with _lock, json_store_service.transaction(write=[COLLECTION]):
+        before = json_store_service.collection_version(COLLECTION)
+        result = apply()
+        if before is not None and before == _indexed_version:
+            _indexed_version = json_store_service.collection_version(COLLECTION)
+        else:
+            _indexed_version = _UNBUILT
+    return result
+
+
+def add_memory(care_receiver_id: str, text: str, title: Optional[str] = None, tags: Iterable[str] = ()) -> Dict[str, Any]:
+    memory = {
+        "id": f"mem-{uuid.uuid4().hex[:8]}",
+        "care_receiver_id": care_receiver_id,
+        "title": title,
+        "text": text,
+        "tags": list(tags),
+        "created_at": datetime.utcnow().isoformat() + "Z",
+    }
+
+    def apply():
+        json_store_service.append_family_memory(memory)
+        _records[memory["id"]] = memory
+        _indexes.setdefault(care_receiver_id, text_index.InvertedIndex()).add(memory["id"], _searchable_text(memory))
+
+    _write(apply)
+    return dict(memory)
+
+
+def delete_memory(care_receiver_id: str, memory_id: str) -> bool:
+    def apply():
+        memory = json_store_service.get_by_id(COLLECTION, memory_id)
+        if memory is None or memory.get("care_receiver_id") != care_receiver_id:
+            return False
+        json_store_service.delete_by_id(COLLECTION, memory_id)
+        _records.pop(memory_id, None)
+        if care_receiver_id in _indexes:
+            _indexes[care_receiver_id].remove(memory_id)
+        return True
+
+    return _write(apply)
+
+
+def list_memories(care_receiver_id: str) -> List[Dict[str, Any]]:
+    return json_store_service.find(COLLECTION, care_receiver_id=care_receiver_id)
+
+
+def has_memories(care_receiver_id: str) -> bool:
+    with _lock:
+        _sync()
+        return len(_indexes.get(care_receiver_id, ())) > 0
+
+
+def search_memories(care_receiver_id: str, query: str, limit: int = 3) -> List[Dict[str, Any]]:
+    """Best matching memories of a care receiver (BM25 ranking), each with its `score`."""
+    with _lock:
+        _sync()
+        index = _indexes.get(care_receiver_id)
+        if index is None:
+            return []
+        return [
+            {**store_cache.clone(_records[doc_id]), "score": round(score, 4)}
+            for doc_id, score in index.search(query, limit)
+        ]
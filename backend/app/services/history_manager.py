@@ -0,0 +1,155 @@
+"""
+This module keeps the LLM history of agent sessions small and bounded.
+
+Responsibilities:
+- Keep the last AGENT_HISTORY_TURNS turns verbatim.
+- Fold older turns into a rolling summary (written by the LLM, extractive fallback).
+- Strip the [REAL-TIME ENVIRONMENTAL CONTEXT] blocks from past messages: only the current turn needs one.
+- Keep the history sent with each request under AGENT_HISTORY_TOKEN_BUDGET
+  (estimated at ~4 characters per token).
+"""
+import json
+import re
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from google.genai import types
+
+from app.core import config
+
+SUMMARY_MARKER = "[CONVERSATION SUMMARY]"
+SUMMARY_ACK = "Understood, I will keep this earlier conversation in mind."
+SUMMARY_MAX_CHARS = 2000
+
+_CONTEXT_BLOCK = re.compile(
+    r"\n?\[REAL-TIME ENVIRONMENTAL CONTEXT\].*?\[END OF ENVIRONMENTAL CONTEXT\]\n*", re.DOTALL
+)
+
+Summarizer = Callable[[str, str], Awaitable[str]]
+
+
+def estimate_tokens(history: List[types.Content]) -> int:
+    chars = 0
+    for content in history:
+        for part in content.parts or []:
+            if part.text:
+                chars += len(part.text)
+            if part.function_call:
+                chars += len(json.dumps(part.function_call.args or {}, default=str)) + len(part.function_call.name or "")
+            if part.function_response:
+                chars += len(json.dumps(part.function_response.response or {}, default=str))
+    return chars // 4
+
+
+def strip_context(text: str) -> str:
+    """Remove environmental context blocks from a message."""
+    return _CONTEXT_BLOCK.sub("", text)
+
+
+def _strip_content(content: types.Content) -> types.Content:
+    if content.role != "user" or not any(p.text and "[REAL-TIME ENVIRONMENTAL CONTEXT]" in p.text for p in content.parts or []):
+        return content
+    parts = [types.Part(text=strip_context(p.text)) if p.text else p for p in content.parts]
+    return types.Content(role=content.role, parts=parts)
+
+
+def _starts_turn(content: types.Content) -> bool:
+    """A turn starts with a user message (not with the function responses sent back to the model)."""
+    return content.role == "user" and any(p.text for p in content.parts or [])
+
+
+def strip_last_turn(history: List[types.Content]):
+    """
+    Strip in place the context blocks of the most recent turn, the only one still carrying one
+    once every turn went through this: the chat keeps its history, nothing is rebuilt.
+    """
+    for content in reversed(history):
+        if content.role == "user":
+            for part in content.parts or []:
+                if part.text and "[REAL-TIME ENVIRONMENTAL CONTEXT]" in part.text:
+                    part.text = strip_context(part.text)
+        if _starts_turn(content):
+            return
+
+
+def _split_summary(history: List[types.Content]) -> Tuple[str, List[types.Content]]:
+    if history and history[0].role == "user" and history[0].parts and (history[0].parts[0].text or "").startswith(SUMMARY_MARKER):
+        rest = history[1:]
+        if rest and rest[0].role == "model" and rest[0].parts and rest[0].parts[0].text == SUMMARY_ACK:
+            rest = rest[1:]
+        return history[0].parts[0].text[len(SUMMARY_MARKER):].strip(), rest
+    return "", history
+
+
+def _split_turns(history: List[types.Content]) -> List[List[types.Content]]:
+    turns: List[List[types.Content]] = []
+    for content in history:
+        if _starts_turn(content) or not turns:
+            turns.append([content])
+        else:
+            turns[-1].append(content)
+    return turns
+
+
+def transcript(turns: List[List[types.Content]]) -> str:
+    """Plain-text dialogue of some turns (tool calls and results left out)."""
+    lines = []
+    for turn in turns:
+        for content in turn:
+            speaker = "Patient" if content.role == "user" else "Assistant"
+            text = " ".join(p.text.strip() for p in content.parts or [] if p.text and p.text.strip())
+            if text:
+                lines.append(f"{speaker}: {text}")
+    return "\n".join(lines)
+
+
+async def extractive_summary(previous: str, dialogue: str) -> str:
+    """Fallback summary: previous summary plus the folded dialogue, truncated from the oldest side."""
+    summary = f"{previous}\n{dialogue}".strip()
+    return summary[-SUMMARY_MAX_CHARS:]
+
+
+def summary_contents(summary: str) -> List[types.Content]:
+    return [
+        types.Content(role="user", parts=[types.Part(text=f"{SUMMARY_MARKER}\n{summary}")]),
+        types.Content(role="model", parts=[types.Part(text=SUMMARY_ACK)]),
+    ]
+
+
+async def compact(
+    history: List[types.Content],
+    summarize: Optional[Summarizer] = None,
+) -> Tuple[List[types.Content], bool]:
+    """
+    Return (history to keep, whether it differs from `history`).
+    Context blocks are stripped; turns beyond the last AGENT_HISTORY_TURNS, and the oldest
+    turns while over the token budget, are folded into the rolling summary.
+    The most recent turn is always kept.
+    """
+    summarize = summarize or extractive_summary
+    summary, rest = _split_summary(history)
+    stripped = [_strip_content(c) for c in rest]
+    changed = any(a is not b for a, b in zip(stripped, rest))
+
+    turns = _split_turns(stripped)
+    keep = max(1, config.AGENT_HISTORY_TURNS)
+    folded, kept = turns[:-keep], turns[-keep:]
+
+    def size(kept_turns):
+        flat = [c for turn in kept_turns for c in turn]
+        return estimate_tokens(flat) + len(summary) // 4
+
+    budget = config.AGENT_HISTORY_TOKEN_BUDGET
+    while budget > 0 and len(kept) > 1 and size(kept) > budget:
+        folded.append(kept.pop(0))
+
+    if not folded:
+        if not changed:
+            return history, False
+        return (summary_contents(summary) if summary else []) + stripped, True
+
+    try:
+        summary = (await summarize(summary, transcript(folded))).strip()[-SUMMARY_MAX_CHARS:]
+    except Exception as e:
+        print(f"[HISTORY] Summarization failed, using extractive summary: {e}")
+        summary = await extractive_summary(summary, transcript(folded))
+    return summary_contents(summary) + [c for turn in kept for c in turn], True
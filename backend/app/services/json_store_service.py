@@ -4,16 +4,64 @@ This module acts as the pseudo-database layer by handling file I/O operations di
 Responsibilities:
 - Ensure safe file readings and writings (concurrency handling).
 - Provide abstract CRUD operations for all JSON files (reminders, logs, contexts, etc).
+- Store list collections as a JSON snapshot plus an append-only log (see segment_log),
+  so that a write costs the size of the records written, not the size of the collection.
+- Serve reads from an in-memory cache (see store_cache) that stays valid until the files
+  change on disk or this process writes them.
+- Lock each collection separately (see lock_manager): reads share a collection,
+  writes and multi-collection transactions take exclusive locks in a fixed order.
+- Write files crash-safely: snapshots through temp file + fsync + rename, log appends fsynced
+  (optionally group-committed across concurrent requests, see segment_log).
+- Delegate storage to SQLite (see sqlite_store) instead of files when STORE_BACKEND=sqlite,
+  behind the same function surface.
+- Serve single-record reads, updates and deletes (get_by_id, update_by_id, delete_by_id)
+  from the id-keyed collection state, and care_receiver_id filters from a secondary index.
+- Shard conversation transcripts by session (one append-only file per session plus a small index),
+  so a chat turn only touches the current session's data.
 """
+import hashlib
 import json
+import os
+import re
+import tempfile
 import threading
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
-from typing import Any, List, Dict
+from typing import Any, Iterable, List, Dict, Optional
 
-from app.core import constants
+from app.core import config, constants
+from app.services import lock_manager, segment_log, sqlite_store, store_cache
 
-# Global lock for all JSON read-modify-write operations
-lock = threading.Lock()
+# Field identifying a record in each list collection (keyed by file name).
+# These collections are stored as snapshot + append-only log.
+_RECORD_KEYS = {
+    "caregivers": "id",
+    "care_receivers": "id",
+    "reminders": "id",
+    "calendar_items": "id",
+    "audio_contents": "id",
+    "family_memories": "id",
+    "events": "id",
+    "device_actions": "id",
+    "health_logs": "log_id",
+}
+
+@contextmanager
+def transaction(read: Iterable[str] = (), write: Iterable[str] = ()):
+    """
+    Lock collections (by name, e.g. "calendar_items") for a read-modify-write sequence.
+    Every collection read or written inside the block must be listed here.
+    With group commit, the wait for durability happens after the in-process locks are released;
+    the cross-process locks of written collections are held until then, so other workers
+    never read a collection before it is on disk.
+    """
+    with lock_manager.deferred_file_release(), segment_log.deferred_commit():
+        with lock_manager.locked(read=read, write=write):
+            yield
+
+def _use_sqlite() -> bool:
+    return config.STORE_BACKEND == "sqlite"
 
 def _read_json(file_path: Path, default_is_dict: bool = False) -> Any:
     if not file_path.exists():
@@ -24,100 +72,634 @@ def _read_json(file_path: Path, default_is_dict: bool = False) -> Any:
     try:
         with open(file_path, "r", encoding="utf-8") as f:
             return json.load(f)
-    except json.JSONDecodeError:
+    except json.JSONDecodeError as e:
+        # Never overwrite unreadable data: keep it aside for manual recovery
+        quarantine = file_path.with_name(f"{file_path.name}.corrupt-{datetime.now().strftime('%Y%m%d%H%M%S')}")
+        os.replace(file_path, quarantine)
+        print(f"[STORE] {file_path.name} is corrupt ({e}), moved to {quarantine.name}")
         default_data = {} if default_is_dict else []
         _write_json(file_path, default_data)
         return default_data
 
+def _fsync_dir(directory: Path):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # Not supported on this platform (e.g. Windows)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
 def _write_json(file_path: Path, data: Any):
+    """
+    Atomically replace a JSON file: the data is written and fsynced to a temp file
+    in the same directory, then renamed over the target. A crash leaves either
+    the old or the new file, never a truncated one.
+    """
+    _replace_file(file_path, lambda f: json.dump(data, f, indent=4, ensure_ascii=False))
+
+def _replace_file(file_path: Path, write):
+    """Atomically replace `file_path` with what `write(f)` writes to a text file object."""
     # Ensure directory exists
     file_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+    fd, tmp_name = tempfile.mkstemp(dir=file_path.parent, prefix=f".{file_path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, file_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+    _fsync_dir(file_path.parent)
+
+# --- Snapshot + log collections ---
+
+def _key_field(file_path: Path) -> str:
+    return _RECORD_KEYS[file_path.stem]
+
+def _collection_paths(file_path: Path):
+    return (file_path, segment_log.log_path(file_path))
+
+def _remember(file_path: Path, state: Dict[Any, Dict[str, Any]]):
+    """Cache the state this process just wrote, tagged with the resulting file version."""
+    store_cache.put(file_path, store_cache.file_version(*_collection_paths(file_path)), state)
+
+def _materialize(file_path: Path) -> Dict[Any, Dict[str, Any]]:
+    """
+    Return the key -> record state of a collection: last snapshot with its log replayed on top.
+    The returned dict is the cached one, which writers patch in place: callers must hold
+    the collection's read lock while they use it, and copy records before handing them out.
+    """
+    with lock_manager.locked(read=[file_path.stem]):
+        if _use_sqlite():
+            version = (sqlite_store.version(file_path.stem),)
+            state = store_cache.get(file_path, version)
+            if state is None:
+                current, records = sqlite_store.load(file_path.stem)
+                state = segment_log.replay(records, [], _key_field(file_path))
+                store_cache.put(file_path, (current,), state)
+            return state
+
+        if segment_log.has_pending(file_path):
+            # Our own appends are not on disk yet: the cached state is the most recent one
+            state = store_cache.peek(file_path)
+            if state is not None:
+                return state
+        version = store_cache.file_version(*_collection_paths(file_path))
+        state = store_cache.get(file_path, version)
+        if state is None:
+            records = _read_json(file_path)
+            if not isinstance(records, list):
+                records = []
+            state = segment_log.replay(records, segment_log.read_ops(file_path), _key_field(file_path))
+            store_cache.put(file_path, version, state)
+        return state
+
+def _load_collection(file_path: Path) -> List[Dict[str, Any]]:
+    with lock_manager.locked(read=[file_path.stem]):
+        return [store_cache.clone(record) for record in _materialize(file_path).values()]
+
+def _state_from_records(file_path: Path, records: List[Dict[str, Any]]) -> Dict[Any, Dict[str, Any]]:
+    return segment_log.replay(store_cache.clone(records), [], _key_field(file_path))
+
+def _compact(file_path: Path, records: List[Dict[str, Any]] | None = None):
+    """Fold the log into a fresh snapshot. The snapshot is written before the log is dropped."""
+    if _use_sqlite():
+        return
+    with lock_manager.locked(write=[file_path.stem]):
+        if records is None:
+            records = list(_materialize(file_path).values())
+        _write_json(file_path, records)
+        segment_log.reset(file_path)
+        _remember(file_path, _state_from_records(file_path, records))
+
+def _save_collection(file_path: Path, records: List[Dict[str, Any]]):
+    """
+    Persist a full collection by logging only the records that changed.
+    Falls back to a snapshot rewrite when the change cannot be expressed as keyed ops.
+    """
+    with transaction(write=[file_path.stem]):
+        if _use_sqlite():
+            _, after = sqlite_store.save(file_path.stem, records, _key_field(file_path))
+            store_cache.put(file_path, (after,), _state_from_records(file_path, records))
+            return
+        current = list(_materialize(file_path).values())
+        ops = segment_log.diff(current, records, _key_field(file_path))
+        if ops is None or (ops and segment_log.needs_compaction(file_path)):
+            _compact(file_path, records)
+            return
+        segment_log.append_ops(file_path, ops)
+        _remember(file_path, _state_from_records(file_path, records))
+
+def _append_record(file_path: Path, record: Dict[str, Any]):
+    """Append (or replace by key) a single record without reading the collection."""
+    key = record.get(_key_field(file_path))
+    if key is not None:
+        _write_record(file_path, str(key), record)
+        return
+    with transaction(write=[file_path.stem]):
+        records = list(_materialize(file_path).values())
+        records.append(record)
+        if _use_sqlite():
+            _save_collection(file_path, records)
+        else:
+            _compact(file_path, records)
+
+def _write_record(file_path: Path, key: str, record: Optional[Dict[str, Any]]):
+    """Put `record` under `key`, or delete the key when `record` is None, writing only that record."""
+    with transaction(write=[file_path.stem]):
+        if _use_sqlite():
+            if record is None:
+                before, after = sqlite_store.delete(file_path.stem, key)
+            else:
+                before, after = sqlite_store.append(file_path.stem, key, record)
+            version, new_version = (before,), (after,)
+        else:
+            if segment_log.group_commit_enabled():
+                # The cache must hold unflushed appends: make sure there is an entry to patch
+                _materialize(file_path)
+            version = store_cache.file_version(*_collection_paths(file_path))
+            op = segment_log.delete_op(key) if record is None else segment_log.put_op(key, record)
+            segment_log.append_ops(file_path, [op])
+            new_version = store_cache.file_version(*_collection_paths(file_path))
+        # Patch the cached state only if it was up to date before this write.
+        # It is patched in place (O(1)): readers only use it under the read lock, which this
+        # write lock excludes, and records are replaced rather than mutated, so the records a
+        # caller took from the state (e.g. to write a snapshot) keep their value.
+        state = store_cache.peek(file_path) if segment_log.has_pending(file_path) else store_cache.get(file_path, version)
+        if state is None:
+            store_cache.invalidate(file_path)
+        else:
+            previous = state.pop(key, None) if record is None else state.get(key)
+            if record is not None:
+                state[key] = store_cache.clone(record)
+            store_cache.put(file_path, new_version, state)
+            _patch_receiver_index(file_path, state, key, previous, state.get(key))
+        if not _use_sqlite() and segment_log.needs_compaction(file_path):
+            _compact(file_path)
+
+# --- Secondary index: care_receiver_id -> record keys ---
+#
+# Built once per cached collection state and patched by single-record writes,
+# so filtering a collection by care receiver does not scan it.
+
+_INDEXED_BY = "care_receiver_id"
+
+def _receiver_of(record: Any) -> Any:
+    return record.get(_INDEXED_BY) if isinstance(record, dict) else None
+
+def _receiver_index(file_path: Path, state: Dict[Any, Dict[str, Any]]) -> Dict[Any, Dict[Any, None]]:
+    """care_receiver_id -> keys (ordered like `state`) for the given cached state (read lock held)."""
+    cached = store_cache.peek((file_path, _INDEXED_BY))
+    if cached is not None and cached[0] is state:
+        return cached[1]
+    index: Dict[Any, Dict[Any, None]] = {}
+    for key, record in state.items():
+        receiver = _receiver_of(record)
+        if receiver is not None:
+            index.setdefault(receiver, {})[key] = None
+    store_cache.put((file_path, _INDEXED_BY), None, (state, index))
+    return index
+
+def _patch_receiver_index(file_path: Path, state, key: str, previous, current):
+    """Update in place the index of `state` after a write to `key` (write lock held)."""
+    cached = store_cache.peek((file_path, _INDEXED_BY))
+    if cached is None or cached[0] is not state:
+        return
+    before, after = _receiver_of(previous), _receiver_of(current)
+    if previous is not None and current is not None and before != after:
+        # The record moved to another receiver: its position in the new list is unknown, rebuild lazily
+        store_cache.invalidate((file_path, _INDEXED_BY))
+        return
+    index = cached[1]
+    if current is None and before is not None:
+        index.get(before, {}).pop(key, None)
+    elif previous is None and after is not None:
+        # A new key goes last in `state`, and so in its receiver's keys
+        index.setdefault(after, {})[key] = None
+
+def _collection_files() -> List[Path]:
+    return [
+        constants.CAREGIVERS_FILE,
+        constants.CARE_RECEIVERS_FILE,
+        constants.REMINDERS_FILE,
+        constants.CALENDAR_ITEMS_FILE,
+        constants.AUDIO_CONTENTS_FILE,
+        constants.FAMILY_MEMORIES_FILE,
+        constants.EVENTS_FILE,
+        constants.DEVICE_ACTIONS_FILE,
+        constants.HEALTH_LOGS_FILE,
+    ]
+
+def _collection_file(name: str) -> Path:
+    if name not in _RECORD_KEYS:
+        raise KeyError(f"Unknown collection: {name}")
+    return getattr(constants, f"{name.upper()}_FILE")
+
+def compact_all():
+    """Fold every pending log into its snapshot. Run periodically by the scheduler."""
+    if _use_sqlite():
+        return
+    for file_path in _collection_files():
+        with lock_manager.locked(write=[file_path.stem]):
+            if segment_log.log_path(file_path).exists():
+                _compact(file_path)
+
+def collection_version(name: str) -> Optional[tuple]:
+    """
+    Cheap token (a few stat calls, or one SQLite query) that changes whenever a collection
+    or the patient context changes, in this process or another one. None while this process has
+    group-committed writes to it that are not on disk yet: callers must treat it as changed.
+    """
+    if name == constants.PATIENT_CONTEXT_FILE.stem:
+        file_path, paths = constants.PATIENT_CONTEXT_FILE, (constants.PATIENT_CONTEXT_FILE,)
+    else:
+        file_path = _collection_file(name)
+        paths = _collection_paths(file_path)
+    if _use_sqlite():
+        return ("sqlite", sqlite_store.version(name))
+    if segment_log.has_pending(file_path):
+        return None
+    return store_cache.file_version(*paths)
+
+def get_by_id(collection: str, record_id: str) -> Optional[Dict[str, Any]]:
+    """Single-record lookup by key (primary-key index with SQLite, cached map with JSON)."""
+    file_path = _collection_file(collection)
+    if _use_sqlite():
+        with lock_manager.locked(read=[collection]):
+            return sqlite_store.get(collection, record_id)
+    with lock_manager.locked(read=[collection]):
+        record = _materialize(file_path).get(record_id)
+        return store_cache.clone(record) if record is not None else None
+
+def update_by_id(collection: str, record_id: str, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Merge `changes` into one record and write only that record.
+    Returns the updated record, or None if there is no record with this key.
+    """
+    file_path = _collection_file(collection)
+    with transaction(write=[collection]):
+        current = get_by_id(collection, record_id)
+        if current is None:
+            return None
+        updated = {**current, **changes, _key_field(file_path): current[_key_field(file_path)]}
+        _write_record(file_path, record_id, updated)
+    return updated
 
-# Sync functions for easy access, in production we might use a lock or asyncio.to_thread
+def delete_by_id(collection: str, record_id: str) -> bool:
+    """Delete one record by key. Returns False if there was no such record."""
+    file_path = _collection_file(collection)
+    with transaction(write=[collection]):
+        if get_by_id(collection, record_id) is None:
+            return False
+        _write_record(file_path, record_id, None)
+    return True
+
+def find(collection: str, **filters: Any) -> List[Dict[str, Any]]:
+    """
+    Records whose fields equal the given values, in insertion order.
+    Filters must be among the SQLite indexed fields (care_receiver_id, status, scheduled_at, created_at).
+    """
+    file_path = _collection_file(collection)
+    if _use_sqlite():
+        with lock_manager.locked(read=[collection]):
+            return sqlite_store.find(collection, **filters)
+    unknown = set(filters) - set(sqlite_store.INDEXED_FIELDS)
+    if unknown:
+        raise ValueError(f"Not an indexed field: {', '.join(sorted(unknown))}")
+    with lock_manager.locked(read=[collection]):
+        state = _materialize(file_path)
+        if _INDEXED_BY in filters:
+            candidates = [state[key] for key in _receiver_index(file_path, state).get(filters[_INDEXED_BY], ())]
+        else:
+            candidates = state.values()
+        return [
+            store_cache.clone(record)
+            for record in candidates
+            if all(record.get(field) == value for field, value in filters.items())
+        ]
+
+def migrate_json_to_sqlite() -> Dict[str, int]:
+    """
+    Import every JSON collection (snapshot + pending log), the conversation shards
+    and the patient context into the SQLite database. Returns the number of records imported per collection.
+    """
+    imported = {}
+    for file_path in _collection_files():
+        name = file_path.stem
+        with lock_manager.locked(write=[name]):
+            records = _read_json(file_path)
+            if not isinstance(records, list):
+                records = []
+            state = segment_log.replay(records, segment_log.read_ops(file_path), _key_field(file_path))
+            sqlite_store.save(name, list(state.values()), _key_field(file_path))
+            store_cache.invalidate(file_path)
+        imported[name] = len(state)
+    with lock_manager.locked(write=["conversations"]):
+        conversations = _json_conversations()
+        sqlite_store.replace_sessions(conversations)
+    imported["conversations"] = len(conversations)
+    context_file = constants.PATIENT_CONTEXT_FILE
+    with lock_manager.locked(write=[context_file.stem]):
+        context = _read_json(context_file, default_is_dict=True)
+        sqlite_store.save_document(context_file.stem, context if isinstance(context, dict) else {})
+        store_cache.invalidate(context_file)
+    imported[context_file.stem] = 1
+    return imported
+
+def lock_wait_stats() -> Dict[str, Dict[str, float]]:
+    return lock_manager.wait_stats()
+
+# Sync functions for easy access, in production we might use asyncio.to_thread
 
 def get_caregivers() -> List[Dict[str, Any]]:
-    return _read_json(constants.CAREGIVERS_FILE)
+    return _load_collection(constants.CAREGIVERS_FILE)
 
 def save_caregivers(caregivers: List[Dict[str, Any]]):
-    _write_json(constants.CAREGIVERS_FILE, caregivers)
+    _save_collection(constants.CAREGIVERS_FILE, caregivers)
 
 def get_care_receivers() -> List[Dict[str, Any]]:
-    return _read_json(constants.CARE_RECEIVERS_FILE)
+    return _load_collection(constants.CARE_RECEIVERS_FILE)
 
 def save_care_receivers(receivers: List[Dict[str, Any]]):
-    _write_json(constants.CARE_RECEIVERS_FILE, receivers)
+    _save_collection(constants.CARE_RECEIVERS_FILE, receivers)
+
+def append_care_receiver(receiver: Dict[str, Any]):
+    _append_record(constants.CARE_RECEIVERS_FILE, receiver)
 
 def get_patient_context() -> Dict[str, Any]:
-    data = _read_json(constants.PATIENT_CONTEXT_FILE, default_is_dict=True)
-    return data if isinstance(data, dict) else {}
+    file_path = constants.PATIENT_CONTEXT_FILE
+    with lock_manager.locked(read=[file_path.stem]):
+        if _use_sqlite():
+            version = (sqlite_store.version(file_path.stem),)
+            data = store_cache.get(file_path, version)
+            if data is None:
+                current, data = sqlite_store.get_document(file_path.stem)
+                version = (current,)
+        else:
+            version = store_cache.file_version(file_path)
+            data = store_cache.get(file_path, version)
+            if data is None:
+                data = _read_json(file_path, default_is_dict=True)
+        if not isinstance(data, dict):
+            data = {}
+        store_cache.put(file_path, version, data)
+    return store_cache.clone(data)
 
 def save_patient_context(context: Dict[str, Any]):
-    _write_json(constants.PATIENT_CONTEXT_FILE, context)
+    file_path = constants.PATIENT_CONTEXT_FILE
+    with lock_manager.locked(write=[file_path.stem]):
+        if _use_sqlite():
+            version = (sqlite_store.save_document(file_path.stem, context),)
+        else:
+            _write_json(file_path, context)
+            version = store_cache.file_version(file_path)
+        store_cache.put(file_path, version, store_cache.clone(context))
 
 def get_reminders() -> List[Dict[str, Any]]:
-    return _read_json(constants.REMINDERS_FILE)
+    return _load_collection(constants.REMINDERS_FILE)
 
 def save_reminders(reminders: List[Dict[str, Any]]):
-    _write_json(constants.REMINDERS_FILE, reminders)
+    _save_collection(constants.REMINDERS_FILE, reminders)
 
 def get_calendar_items() -> List[Dict[str, Any]]:
-    return _read_json(constants.CALENDAR_ITEMS_FILE)
+    return _load_collection(constants.CALENDAR_ITEMS_FILE)
 
 def save_calendar_items(items: List[Dict[str, Any]]):
-    _write_json(constants.CALENDAR_ITEMS_FILE, items)
+    _save_collection(constants.CALENDAR_ITEMS_FILE, items)
+
+def append_calendar_item(item: Dict[str, Any]):
+    _append_record(constants.CALENDAR_ITEMS_FILE, item)
 
 def get_audio_contents() -> List[Dict[str, Any]]:
-    return _read_json(constants.AUDIO_CONTENTS_FILE)
+    return _load_collection(constants.AUDIO_CONTENTS_FILE)
 
 def save_audio_contents(contents: List[Dict[str, Any]]):
-    _write_json(constants.AUDIO_CONTENTS_FILE, contents)
+    _save_collection(constants.AUDIO_CONTENTS_FILE, contents)
+
+def append_audio_content(content: Dict[str, Any]):
+    _append_record(constants.AUDIO_CONTENTS_FILE, content)
+
+def get_family_memories() -> List[Dict[str, Any]]:
+    return _load_collection(constants.FAMILY_MEMORIES_FILE)
+
+def append_family_memory(memory: Dict[str, Any]):
+    _append_record(constants.FAMILY_MEMORIES_FILE, memory)
 
 def get_events() -> List[Dict[str, Any]]:
-    return _read_json(constants.EVENTS_FILE)
+    return _load_collection(constants.EVENTS_FILE)
 
 def save_events(events: List[Dict[str, Any]]):
-    _write_json(constants.EVENTS_FILE, events)
+    _save_collection(constants.EVENTS_FILE, events)
+
+def append_event(event: Dict[str, Any]):
+    _append_record(constants.EVENTS_FILE, event)
 
 def get_device_actions() -> List[Dict[str, Any]]:
-    return _read_json(constants.DEVICE_ACTIONS_FILE)
+    return _load_collection(constants.DEVICE_ACTIONS_FILE)
 
 def save_device_actions(actions: List[Dict[str, Any]]):
-    _write_json(constants.DEVICE_ACTIONS_FILE, actions)
-
-def get_conversations() -> List[Dict[str, Any]]:
-    return _read_json(constants.CONVERSATIONS_FILE)
+    _save_collection(constants.DEVICE_ACTIONS_FILE, actions)
 
-def save_conversations(conversations: List[Dict[str, Any]]):
-    _write_json(constants.CONVERSATIONS_FILE, conversations)
+def append_device_action(action: Dict[str, Any]):
+    _append_record(constants.DEVICE_ACTIONS_FILE, action)
 
 def get_health_logs() -> List[Dict[str, Any]]:
-    return _read_json(constants.HEALTH_LOGS_FILE)
+    return _load_collection(constants.HEALTH_LOGS_FILE)
 
 def save_health_logs(logs: List[Dict[str, Any]]):
-    _write_json(constants.HEALTH_LOGS_FILE, logs)
+    _save_collection(constants.HEALTH_LOGS_FILE, logs)
+
+def append_health_log(log: Dict[str, Any]):
+    _append_record(constants.HEALTH_LOGS_FILE, log)
+
+# --- Conversations (one append-only shard per session) ---
+#
+# CONVERSATIONS_DIR/index.json maps each session_id to its shard file and start timestamp.
+# A shard holds one message per line, so appending a message or reading a session
+# never touches the other sessions.
+
+_conversations_import_lock = threading.Lock()
+# Called with (session_id, message, position) after each append_to_conversation (see add_conversation_listener)
+_conversation_listeners: List[Any] = []
+
+def _conversation_index_file() -> Path:
+    return constants.CONVERSATIONS_DIR / "index.json"
+
+def _session_file_name(session_id: str) -> str:
+    safe = re.sub(r"[^A-Za-z0-9_-]", "_", session_id)[:80]
+    if safe != session_id:
+        # Keep names of distinct sessions distinct once sanitized
+        safe += "-" + hashlib.sha1(session_id.encode("utf-8")).hexdigest()[:10]
+    return f"{safe}.jsonl"
+
+def _write_sessions(conversations: List[Dict[str, Any]]):
+    """Rewrite every shard and the index from full conversation records."""
+    directory = constants.CONVERSATIONS_DIR
+    index = {}
+    for conv in conversations:
+        session_id = str(conv["session_id"])
+        name = _session_file_name(session_id)
+        encoded = segment_log.encode_lines(conv.get("messages", []))
+        _replace_file(directory / name, lambda f: f.write(encoded))
+        store_cache.invalidate(directory / name)
+        index[session_id] = {"file": name, "timestamp": conv.get("timestamp")}
+    index_file = _conversation_index_file()
+    _write_json(index_file, index)
+    store_cache.put(index_file, store_cache.file_version(index_file), index)
+    kept = {entry["file"] for entry in index.values()}
+    for shard in directory.glob("*.jsonl"):
+        if shard.name not in kept:
+            shard.unlink()
+            store_cache.invalidate(shard)
+
+def _import_legacy_conversations():
+    """One-time import of the legacy single-file transcripts (conversations.json + log) into shards."""
+    if _conversation_index_file().exists():
+        return
+    with _conversations_import_lock:
+        if _conversation_index_file().exists():
+            return
+        legacy = constants.CONVERSATIONS_FILE
+        records = _read_json(legacy) if legacy.exists() else []
+        if not isinstance(records, list):
+            records = []
+        state = segment_log.replay(records, segment_log.read_ops(legacy), "session_id")
+        conversations = [c for c in state.values() if isinstance(c, dict) and c.get("session_id")]
+        _write_sessions(conversations)
+        if conversations:
+            print(f"[STORE] Imported {len(conversations)} legacy conversation(s) into {constants.CONVERSATIONS_DIR.name}/")
+
+def _conversation_index() -> Dict[str, Dict[str, Any]]:
+    """session_id -> {"file", "timestamp"}. The returned dict is the cached one."""
+    _import_legacy_conversations()
+    index_file = _conversation_index_file()
+    version = store_cache.file_version(index_file)
+    index = store_cache.get(index_file, version)
+    if index is None:
+        index = _read_json(index_file, default_is_dict=True)
+        if not isinstance(index, dict):
+            index = {}
+        store_cache.put(index_file, version, index)
+    return index
+
+def _session_messages(shard: Path) -> List[Dict[str, Any]]:
+    """
+    Messages of one shard. The returned list is the cached one, which appends extend in place:
+    callers must hold the conversations lock while they use it, and copy what they hand out.
+    """
+    if segment_log.file_has_pending(shard):
+        messages = store_cache.peek(shard)
+        if messages is not None:
+            return messages
+    version = store_cache.file_version(shard)
+    messages = store_cache.get(shard, version)
+    if messages is None:
+        messages = segment_log.read_json_lines(shard)
+        store_cache.put(shard, version, messages)
+    return messages
+
+def _json_conversations() -> List[Dict[str, Any]]:
+    return [
+        {
+            "session_id": session_id,
+            "timestamp": entry.get("timestamp"),
+            "messages": store_cache.clone(_session_messages(constants.CONVERSATIONS_DIR / entry["file"])),
+        }
+        for session_id, entry in _conversation_index().items()
+    ]
+
+def get_conversation(session_id: str) -> Optional[Dict[str, Any]]:
+    """History of a single session, or None if it has no message yet."""
+    with lock_manager.locked(read=["conversations"]):
+        if _use_sqlite():
+            return sqlite_store.get_session(session_id)
+        entry = _conversation_index().get(session_id)
+        if entry is None:
+            return None
+        messages = _session_messages(constants.CONVERSATIONS_DIR / entry["file"])
+        return {"session_id": session_id, "timestamp": entry.get("timestamp"), "messages": store_cache.clone(messages)}
+
+def get_conversations() -> List[Dict[str, Any]]:
+    """Every session's history. Reads all shards: prefer get_conversation for a single session."""
+    with lock_manager.locked(read=["conversations"]):
+        if _use_sqlite():
+            return [sqlite_store.get_session(session_id) for session_id in sqlite_store.list_sessions()]
+        return _json_conversations()
+
+def save_conversations(conversations: List[Dict[str, Any]]):
+    """Replace all conversations (rewrites every shard)."""
+    with lock_manager.locked(write=["conversations"]):
+        if _use_sqlite():
+            sqlite_store.replace_sessions(conversations)
+            return
+        _import_legacy_conversations()
+        _write_sessions(conversations)
 
 def append_to_conversation(session_id: str, role: str, content: str):
     """
-    Ajoute de manière sûre un message à l'historique d'une conversation précise dans le JSON.
-    """
-    from datetime import datetime
-    with lock:
-        conversations = get_conversations()
-        
-        session_conv = next((c for c in conversations if c.get("session_id") == session_id), None)
-        if not session_conv:
-            session_conv = {
-                "session_id": session_id,
-                "timestamp": datetime.now().isoformat() + "Z",
-                "messages": []
-            }
-            conversations.append(session_conv)
-            
-        session_conv["messages"].append({
-            "role": role,
-            "content": content
-        })
-        
-        save_conversations(conversations)
+    Ajoute de manière sûre un message à l'historique d'une conversation précise.
+    Seul le fichier de la session est écrit (et l'index, à la création de la session).
+    """
+    now = datetime.now().isoformat() + "Z"
+    message = {"role": role, "content": content, "created_at": now}
+    with transaction(write=["conversations"]):
+        if _use_sqlite():
+            position = sqlite_store.append_message(session_id, now, message)
+        else:
+            position = _append_to_shard(session_id, now, message)
+    for listener in _conversation_listeners:
+        try:
+            listener(session_id, message, position)
+        except Exception as e:
+            print(f"[STORE] Conversation listener failed: {e}")
+
+def _append_to_shard(session_id: str, now: str, message: Dict[str, Any]) -> int:
+    """Append one message to the session's shard and return its position in the session."""
+    index = _conversation_index()
+    entry = index.get(session_id)
+    if entry is None:
+        entry = {"file": _session_file_name(session_id), "timestamp": now}
+        index = dict(index)
+        index[session_id] = entry
+        index_file = _conversation_index_file()
+        _write_json(index_file, index)
+        store_cache.put(index_file, store_cache.file_version(index_file), index)
+
+    shard = constants.CONVERSATIONS_DIR / entry["file"]
+    if segment_log.group_commit_enabled():
+        # The cache must hold unflushed appends: make sure there is an entry to patch
+        _session_messages(shard)
+    version = store_cache.file_version(shard)
+    segment_log.append_to_file(shard, segment_log.encode_lines([message]))
+    messages = store_cache.peek(shard) if segment_log.file_has_pending(shard) else store_cache.get(shard, version)
+    if messages is None:
+        store_cache.invalidate(shard)
+        return len(_session_messages(shard)) - 1
+    # Extended in place (O(1)): readers only use the cached list under the conversations read lock
+    messages.append(message)
+    store_cache.put(shard, store_cache.file_version(shard), messages)
+    return len(messages) - 1
+
+def add_conversation_listener(listener):
+    """
+    Register `listener(session_id, message, position)`, called in this process after every appended
+    message; `position` is the message's index in its session.
+    """
+    _conversation_listeners.append(listener)
+
+def conversation_message_counts() -> Dict[str, int]:
+    """session_id -> number of messages, to spot sessions that changed without reading them all."""
+    with lock_manager.locked(read=["conversations"]):
+        if _use_sqlite():
+            return sqlite_store.message_counts()
+        return {
+            session_id: len(_session_messages(constants.CONVERSATIONS_DIR / entry["file"]))
+            for session_id, entry in _conversation_index().items()
+        }
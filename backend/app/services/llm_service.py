@@ -2,13 +2,16 @@
 This module contains the logic to interact with the external LLM provider.
 
 Responsibilities:
-- Communicate directly with the Gemini API.
+- Communicate directly with the Gemini API, or with the local stub when LLM_BACKEND=stub (see llm_stub).
 - Format prompts and parse API responses.
 """
+import json
+
 from google import genai
 from google.genai import types
 
-from app.core.config import GEMINI_API_KEY, BASE_DIR
+from app.core.config import GEMINI_API_KEY, LLM_BACKEND, REMINDER_PHRASE_BATCH_SIZE, BASE_DIR
+from app.services import llm_stub, metrics_service
 
 # Import all tool modules so their @register_tool decorators fire.
 # To add a new tool to the agent: create a file in app/tools/ and decorate with @register_tool.
@@ -19,13 +22,22 @@ import app.tools.search_family_history  # noqa: F401
 import app.tools.play_audio             # noqa: F401
 import app.tools.send_whatsapp_message  # noqa: F401
 import app.tools.web_search             # noqa: F401
+import app.tools.search_conversations   # noqa: F401
 # NOTE: contact_caregiver and update_context_tool are intentionally excluded:
 #   - contact_caregiver: Telegram placeholder, superseded by send_whatsapp_message
 #   - update_context_tool: onboarding-only, registered separately in create_onboarding_chat()
 
 from app.tools import get_registered_tools
 
-client = genai.Client(api_key=GEMINI_API_KEY) if GEMINI_API_KEY else None
+def create_client():
+    """The LLM client selected by LLM_BACKEND (None when Gemini has no API key)."""
+    if LLM_BACKEND == "stub":
+        print("[LLM] Using the local stub backend (scripted answers, no network)")
+        return llm_stub.create_default()
+    return genai.Client(api_key=GEMINI_API_KEY) if GEMINI_API_KEY else None
+
+
+client = create_client()
 
 AVAILABLE_TOOLS = get_registered_tools()
 TOOL_MAP = {fn.__name__: fn for fn in AVAILABLE_TOOLS}
@@ -47,67 +59,224 @@ def create_chat(system_instruction: str):
     )
 
 
+def create_async_chat(system_instruction: str, history: list | None = None):
+    """
+    Async counterpart of create_chat (client.aio): send_message is awaited and does not block the event loop.
+    Automatic function calling is disabled so the agent runs tools itself, off the event loop.
+    `history` (list of types.Content) restores a previous conversation.
+    """
+    if not client:
+        raise RuntimeError("GEMINI_API_KEY is not configured.")
+    return client.aio.chats.create(
+        model="gemini-2.5-flash",
+        config=types.GenerateContentConfig(
+            system_instruction=system_instruction,
+            tools=AVAILABLE_TOOLS,
+            automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True),
+        ),
+        history=history,
+    )
+
+
 from app.tools.update_context_tool import update_patient_context
 
 
-def generate_reminder_phrase(
+def _clean_reminder_message(message_text: str | None) -> str:
+    msg = (message_text or "").strip()
+    if msg and msg.startswith("["):
+        import re
+        msg = re.sub(r"^\[[\w_]+\]\s*", "", msg).strip()
+    return msg
+
+
+def _prompt_item(
     title: str,
     reminder_type: str,
     message_text: str | None,
     resident_name: str = "Simone",
     is_audio_invite: bool = False,
+) -> dict:
+    """Inputs of the phrase of one reminder, shared by the single and batch prompts and the fallback."""
+    msg = _clean_reminder_message(message_text)
+    if is_audio_invite:
+        is_book = "audiobook" in msg.lower() or "book" in msg.lower()
+        return {"kind": "audio_invite", "resident": resident_name, "title": title,
+                "content": "an audiobook" if is_book else "some music"}
+    return {"kind": "reminder", "resident": resident_name, "title": title,
+            "reminder_type": reminder_type, "details": msg or "none"}
+
+
+def fallback_reminder_phrase(
+    title: str,
+    message_text: str | None,
+    resident_name: str = "Simone",
+    is_audio_invite: bool = False,
 ) -> str:
+    """Phrase simple utilisée quand le LLM n'a pas pu en générer une (quota, réseau, pas de clé)."""
+    if is_audio_invite:
+        item = _prompt_item(title, "", message_text, resident_name, is_audio_invite=True)
+        return f"Good {_time_of_day()}, {resident_name}! It's {title} time. Would you like to listen to {item['content']}?"
+    msg = _clean_reminder_message(message_text)
+    return msg if msg else f"Hi {resident_name}, don't forget: {title}."
+
+
+def generate_reminder_phrase(
+    title: str,
+    reminder_type: str,
+    message_text: str | None,
+    resident_name: str = "Simone",
+    is_audio_invite: bool = False,
+    fallback: bool = True,
+) -> str | None:
     """
     Génère une phrase chaleureuse pour un rappel vocal via le LLM.
     Si is_audio_invite=True, génère une invitation "voulez-vous écouter…?" (pour les routines audio).
-    Fallback simple si le LLM échoue (quota, réseau).
+    Fallback simple si le LLM échoue (quota, réseau), ou None si fallback=False.
     """
-    msg = (message_text or "").strip()
-    if msg and msg.startswith("["):
-        import re
-        msg = re.sub(r"^\[[\w_]+\]\s*", "", msg).strip()
-
-    if not client:
+    if client:
+        item = _prompt_item(title, reminder_type, message_text, resident_name, is_audio_invite)
         if is_audio_invite:
-            is_book = "audiobook" in msg.lower() or "book" in msg.lower()
-            content_type = "an audiobook" if is_book else "some music"
-            return f"Good {_time_of_day()}, {resident_name}! It's {title} time. Would you like to listen to {content_type}?"
-        return msg if msg else f"Hi {resident_name}, {title}."
-
-    if is_audio_invite:
-        is_book = "audiobook" in msg.lower() or "book" in msg.lower()
-        content_type = "an audiobook" if is_book else "some music"
-        prompt = f"""Generate exactly ONE warm, friendly invitation sentence in English for {resident_name}.
-Context: It's {title} time. You want to suggest they listen to {content_type}.
+            prompt = f"""Generate exactly ONE warm, friendly invitation sentence in English for {resident_name}.
+Context: It's {title} time. You want to suggest they listen to {item['content']}.
 Example: "Good morning {resident_name}! It's coffee time — would you like some music to brighten your day?"
 Be warm, personal, one sentence only. End with a question. Output ONLY the sentence, no quotes."""
-    else:
-        prompt = f"""Generate exactly ONE short, warm reminder sentence in English for {resident_name}.
+        else:
+            prompt = f"""Generate exactly ONE short, warm reminder sentence in English for {resident_name}.
 - Reminder type: {reminder_type}
 - Title: {title}
-- Extra details: {msg or 'none'}
+- Extra details: {item['details']}
 
 Examples for medication: "Don't forget to take your morning pills, Simone."
 Examples for appointment: "You have a doctor's appointment today, Simone."
 Be warm, concise, one sentence only. Output ONLY the sentence, no quotes."""
 
+        try:
+            response = client.models.generate_content(
+                model="gemini-2.5-flash",
+                contents=prompt,
+            )
+            if response and response.text:
+                text = response.text.strip().strip('"').strip("'")
+                if text:
+                    return text
+        except Exception as e:
+            print(f"[LLM] generate_reminder_phrase failed: {e}")
+
+    if not fallback:
+        return None
+    return fallback_reminder_phrase(title, message_text, resident_name, is_audio_invite)
+
+
+# Longest phrase accepted from a batch answer (a phrase is one sentence)
+_MAX_PHRASE_CHARS = 300
+
+
+def _parse_batch_phrases(text: str, count: int) -> list[str | None]:
+    """Phrases of a batch answer by index; None for every entry missing or invalid."""
+    phrases: list[str | None] = [None] * count
+    text = (text or "").strip()
+    if text.startswith("```"):
+        text = text.strip("`").removeprefix("json").strip()
+    try:
+        entries = json.loads(text)
+    except ValueError:
+        return phrases
+    if not isinstance(entries, list):
+        return phrases
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        index, phrase = entry.get("id"), entry.get("text")
+        if not isinstance(index, int) or not 0 <= index < count or not isinstance(phrase, str):
+            continue
+        phrase = phrase.strip().strip('"').strip("'")
+        if phrase and len(phrase) <= _MAX_PHRASE_CHARS and "\n" not in phrase:
+            phrases[index] = phrase
+    return phrases
+
+
+def _generate_phrase_batch(reminders: list[dict]) -> list[str | None]:
+    """
+    One structured request for several reminders. Entries the answer misses, or all of them when the
+    request fails, are retried one by one (each falls back on its own).
+    """
+    items = [{"id": i, **_prompt_item(**r)} for i, r in enumerate(reminders)]
+    prompt = f"""Generate one warm sentence in English for each item of the JSON list below.
+- kind "reminder": a short, warm reminder for the resident. Example for medication: "Don't forget to take
+  your morning pills, Simone." Example for appointment: "You have a doctor's appointment today, Simone."
+- kind "audio_invite": a friendly invitation, at the item's title time, to listen to the item's content,
+  ending with a question. Example: "Good morning Simone! It's coffee time — would you like some music?"
+Answer with a JSON list of {{"id": <item id>, "text": <the sentence>}}, one entry per item, nothing else.
+
+Items:
+{json.dumps(items, ensure_ascii=False)}"""
+
     try:
         response = client.models.generate_content(
             model="gemini-2.5-flash",
             contents=prompt,
+            config=types.GenerateContentConfig(response_mime_type="application/json"),
         )
-        if response and response.text:
-            text = response.text.strip().strip('"').strip("'")
-            if text:
-                return text
+        phrases = _parse_batch_phrases(response.text if response else "", len(reminders))
     except Exception as e:
-        print(f"[LLM] generate_reminder_phrase failed: {e}")
+        print(f"[LLM] Batch of {len(reminders)} reminder phrases failed: {e}")
+        phrases = [None] * len(reminders)
 
-    if is_audio_invite:
-        is_book = "audiobook" in msg.lower() or "book" in msg.lower()
-        content_type = "an audiobook" if is_book else "some music"
-        return f"Good {_time_of_day()}, {resident_name}! It's {title} time. Would you like to listen to {content_type}?"
-    return msg if msg else f"Hi {resident_name}, don't forget: {title}."
+    missing = [i for i, phrase in enumerate(phrases) if phrase is None]
+    if missing:
+        print(f"[LLM] Batch missed {len(missing)}/{len(reminders)} reminder phrase(s), generating them one by one")
+    for i in missing:
+        phrases[i] = generate_reminder_phrase(**reminders[i], fallback=False)
+    return phrases
+
+
+def generate_reminder_phrases(reminders: list[dict], fallback: bool = True) -> list[str | None]:
+    """
+    Batch mode of generate_reminder_phrase: `reminders` holds its keyword arguments (title,
+    reminder_type, message_text, resident_name, is_audio_invite), and the phrases come back in the
+    same order. Sends REMINDER_PHRASE_BATCH_SIZE reminders per LLM request. A phrase the LLM could
+    not produce is the fallback phrase, or None if fallback=False.
+    """
+    phrases: list[str | None] = [None] * len(reminders)
+    if client:
+        phrases = []
+        size = max(1, REMINDER_PHRASE_BATCH_SIZE)
+        for start in range(0, len(reminders), size):
+            batch = reminders[start:start + size]
+            if len(batch) == 1:
+                phrases.append(generate_reminder_phrase(**batch[0], fallback=False))
+            else:
+                phrases.extend(_generate_phrase_batch(batch))
+    if not fallback:
+        return phrases
+    return [
+        phrase or fallback_reminder_phrase(r["title"], r.get("message_text"), r["resident_name"], r.get("is_audio_invite", False))
+        for r, phrase in zip(reminders, phrases)
+    ]
+
+
+async def summarize_conversation(previous_summary: str, dialogue: str) -> str:
+    """
+    Fold older dialogue into the rolling summary of a session (async client).
+    Raises on failure: the caller falls back to an extractive summary.
+    """
+    if not client:
+        raise RuntimeError("GEMINI_API_KEY is not configured.")
+    prompt = f"""You maintain the memory of a long conversation between an elderly patient and their assistant.
+Update the summary below with the new dialogue. Keep facts about the patient, their mood, people
+mentioned, requests made and promises given. At most 150 words, plain text, no preamble.
+
+Current summary:
+{previous_summary or '(empty)'}
+
+New dialogue:
+{dialogue}"""
+    with metrics_service.timed("history_summary"):
+        response = await client.aio.models.generate_content(model="gemini-2.5-flash", contents=prompt)
+    metrics_service.record_usage("history_summary", getattr(response, "usage_metadata", None))
+    if not response or not response.text:
+        raise RuntimeError("empty summary")
+    return response.text
 
 
 def _time_of_day() -> str:
@@ -0,0 +1,259 @@
+"""
+This module provides a local, deterministic stand-in for the Gemini client (LLM_BACKEND=stub).
+
+Responsibilities:
+- Mirror the subset of google.genai.Client the backend uses: chats.create / aio.chats.create
+  (send_message, send_message_stream, get_history) and models.generate_content (sync and async),
+  answering JSON-mode requests (batched reminder phrases) with one entry per item of the prompt.
+- Answer from a script: the first rule whose pattern matches the patient's message decides the
+  tool rounds (function calls) and the final reply, so the agent's tool loop runs for real.
+- Simulate the provider's latency (LLM_STUB_LATENCY_MS per round-trip, LLM_STUB_CHUNK_MS between
+  streamed chunks) and report estimated token counts in the usage metadata.
+- Let the agent loop, the scheduler and the chat endpoints be load-tested offline, without an API key.
+"""
+import asyncio
+import json
+import re
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from google.genai import types
+
+from app.core import config
+
+# The patient's message follows the environmental context block (see environment_context.build)
+_CONTEXT_END = "[END OF ENVIRONMENTAL CONTEXT]"
+
+# Rules tried in order: "pattern" (regex, case-insensitive) on the patient's message, "tool_rounds"
+# (one list of {"name", "args"} calls per round) and "reply". The last rule matches everything.
+DEFAULT_SCRIPT: List[Dict[str, Any]] = [
+    {
+        "pattern": r"\b(time|date|day|heure|jour)\b",
+        "tool_rounds": [[{"name": "get_temporal_context", "args": {}}]],
+        "reply": "Let me check for you. It is a lovely day today. Is there anything you would like to do?",
+    },
+    {
+        "pattern": r"\b(remember|souvenir|daughter|son|dog|wedding|fille|fils|chien)\b",
+        "tool_rounds": [[{"name": "search_family_history", "args": {"keyword": "children"}}]],
+        "reply": "Your daughter Sarah comes to visit most weekends. She loves spending time with you. Would you like to call her?",
+    },
+    {
+        "pattern": r"\b(tired|sad|pain|fatigue|triste|mal)\b",
+        "tool_rounds": [
+            [{"name": "get_temporal_context", "args": {}}],
+            [{"name": "write_health_log", "args": {"mood": "low", "medication_taken": False, "notes": "Stub turn"}}],
+        ],
+        "reply": "I am sorry you feel that way. I have noted it for your family. Would a glass of water and a short rest help?",
+    },
+    {
+        "pattern": r"",
+        "tool_rounds": [],
+        "reply": "I hear you. Thank you for telling me. What would you like to talk about now?",
+    },
+]
+
+# Reply of models.generate_content (reminder phrases, history summaries)
+GENERATED_TEXT = "This is a scripted answer from the local LLM stub."
+
+
+def load_script(path: str = "") -> List[Dict[str, Any]]:
+    """The rules of LLM_STUB_SCRIPT (a JSON list shaped like DEFAULT_SCRIPT), or DEFAULT_SCRIPT."""
+    if not path:
+        return DEFAULT_SCRIPT
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _patient_text(message: str) -> str:
+    return message.rsplit(_CONTEXT_END, 1)[-1]
+
+
+def _token_estimate(text: str) -> int:
+    # ~4 characters per token, as history_manager estimates
+    return max(1, len(text) // 4)
+
+
+def _content_text(content: types.Content) -> str:
+    return " ".join(p.text for p in content.parts or [] if p.text)
+
+
+def _usage(history: List[types.Content], reply: types.Content) -> types.GenerateContentResponseUsageMetadata:
+    prompt = sum(_token_estimate(_content_text(c)) for c in history)
+    candidates = _token_estimate(_content_text(reply))
+    return types.GenerateContentResponseUsageMetadata(
+        prompt_token_count=prompt, candidates_token_count=candidates, total_token_count=prompt + candidates,
+    )
+
+
+def _response(content: types.Content, usage=None) -> types.GenerateContentResponse:
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=content, finish_reason=types.FinishReason.STOP)],
+        usage_metadata=usage,
+    )
+
+
+def _chunks(text: str) -> List[str]:
+    """Split a reply like a streamed model answer: a few words per chunk."""
+    words = text.split(" ")
+    return [" ".join(words[i:i + 4]) + (" " if i + 4 < len(words) else "") for i in range(0, len(words), 4)]
+
+
+class _Script:
+    """Decides the next model turn of one chat from its script."""
+
+    def __init__(self, rules: List[Dict[str, Any]], tool_names: set):
+        self.rules = [(re.compile(r.get("pattern") or "", re.IGNORECASE), r) for r in rules]
+        self.tool_names = tool_names
+        self._rounds: List[List[Dict[str, Any]]] = []
+        self._reply = ""
+
+    def next_turn(self, message: Any) -> types.Content:
+        if isinstance(message, str):
+            text = _patient_text(message)
+            rule = next((r for pattern, r in self.rules if pattern.search(text)), {"reply": GENERATED_TEXT})
+            # Only the tools this chat was created with can be called
+            self._rounds = [
+                calls for calls in ([c for c in round_ if c["name"] in self.tool_names] for round_ in rule.get("tool_rounds") or [])
+                if calls
+            ]
+            self._reply = rule.get("reply") or GENERATED_TEXT
+        if self._rounds:
+            calls = self._rounds.pop(0)
+            return types.Content(
+                role="model",
+                parts=[types.Part.from_function_call(name=c["name"], args=c.get("args") or {}) for c in calls],
+            )
+        return types.Content(role="model", parts=[types.Part(text=self._reply)])
+
+
+def _user_content(message: Any) -> types.Content:
+    if isinstance(message, str):
+        return types.Content(role="user", parts=[types.Part(text=message)])
+    return types.Content(role="user", parts=list(message))
+
+
+class _ChatBase:
+    def __init__(self, stub: "StubClient", config_: Optional[types.GenerateContentConfig], history: Optional[list]):
+        tools = getattr(config_, "tools", None) or []
+        self._stub = stub
+        self._script = _Script(stub.script, {getattr(t, "__name__", None) for t in tools})
+        self._history: List[types.Content] = list(history or [])
+
+    def get_history(self, curated: bool = False) -> List[types.Content]:
+        return list(self._history)
+
+    def _turn(self, message: Any):
+        self._history.append(_user_content(message))
+        reply = self._script.next_turn(message)
+        usage = _usage(self._history, reply)
+        self._history.append(reply)
+        return reply, usage
+
+
+class StubChat(_ChatBase):
+    def send_message(self, message: Any) -> types.GenerateContentResponse:
+        time.sleep(self._stub.latency_s)
+        return _response(*self._turn(message))
+
+
+class AsyncStubChat(_ChatBase):
+    async def send_message(self, message: Any) -> types.GenerateContentResponse:
+        await asyncio.sleep(self._stub.latency_s)
+        return _response(*self._turn(message))
+
+    async def send_message_stream(self, message: Any) -> AsyncIterator[types.GenerateContentResponse]:
+        reply, usage = self._turn(message)
+        return self._stream(reply, usage)
+
+    async def _stream(self, reply: types.Content, usage) -> AsyncIterator[types.GenerateContentResponse]:
+        await asyncio.sleep(self._stub.latency_s)
+        if reply.parts[0].function_call:
+            yield _response(reply, usage)
+            return
+        chunks = _chunks(reply.parts[0].text)
+        for i, chunk in enumerate(chunks):
+            if i:
+                await asyncio.sleep(self._stub.chunk_delay_s)
+            last = i == len(chunks) - 1
+            # Like Gemini, the usage of the whole answer comes with the last chunk
+            yield _response(types.Content(role="model", parts=[types.Part(text=chunk)]), usage if last else None)
+
+
+class _Chats:
+    def __init__(self, stub: "StubClient", chat_class):
+        self._stub = stub
+        self._chat_class = chat_class
+
+    def create(self, model: str = "", config: Optional[types.GenerateContentConfig] = None, history: Optional[list] = None):
+        return self._chat_class(self._stub, config, history)
+
+
+def _json_answer(contents: Any) -> str:
+    """
+    Answer of a JSON-mode request: {"id", "text"} for each item of the JSON list that ends the
+    prompt (as llm_service's batch prompts do), or an empty list.
+    """
+    items = []
+    for line in reversed(str(contents).splitlines()):
+        if line.startswith("["):
+            try:
+                items = json.loads(line)
+            except ValueError:
+                pass
+            break
+    return json.dumps([
+        {"id": item["id"], "text": GENERATED_TEXT}
+        for item in items if isinstance(item, dict) and "id" in item
+    ])
+
+
+def _generated(contents: Any, config: Any = None) -> types.GenerateContentResponse:
+    json_mode = getattr(config, "response_mime_type", None) == "application/json"
+    text = _json_answer(contents) if json_mode else GENERATED_TEXT
+    reply = types.Content(role="model", parts=[types.Part(text=text)])
+    prompt = types.Content(role="user", parts=[types.Part(text=str(contents))])
+    return _response(reply, _usage([prompt], reply))
+
+
+class _Models:
+    def __init__(self, stub: "StubClient"):
+        self._stub = stub
+
+    def generate_content(self, model: str = "", contents: Any = None, config: Any = None) -> types.GenerateContentResponse:
+        time.sleep(self._stub.latency_s)
+        return _generated(contents, config)
+
+
+class _AsyncModels:
+    def __init__(self, stub: "StubClient"):
+        self._stub = stub
+
+    async def generate_content(self, model: str = "", contents: Any = None, config: Any = None) -> types.GenerateContentResponse:
+        await asyncio.sleep(self._stub.latency_s)
+        return _generated(contents, config)
+
+
+class _AsyncClient:
+    def __init__(self, stub: "StubClient"):
+        self.chats = _Chats(stub, AsyncStubChat)
+        self.models = _AsyncModels(stub)
+
+
+class StubClient:
+    """Drop-in for genai.Client in llm_service: scripted answers after a fixed latency."""
+
+    def __init__(self, script: Optional[List[Dict[str, Any]]] = None, latency_s: float = 0.0, chunk_delay_s: float = 0.0):
+        self.script = script if script is not None else DEFAULT_SCRIPT
+        self.latency_s = latency_s
+        self.chunk_delay_s = chunk_delay_s
+        self.chats = _Chats(self, StubChat)
+        self.models = _Models(self)
+        self.aio = _AsyncClient(self)
+
+
+def create_default() -> StubClient:
+    return StubClient(
+        script=load_script(config.LLM_STUB_SCRIPT),
+        latency_s=config.LLM_STUB_LATENCY_MS / 1000,
+        chunk_delay_s=config.LLM_STUB_CHUNK_MS / 1000,
+    )
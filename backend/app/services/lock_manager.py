@@ -0,0 +1,283 @@
+"""
+This module manages the locks protecting the JSON store collections.
+
+Responsibilities:
+- Provide one reader/writer lock per collection, so unrelated collections never wait on each other.
+- Acquire the locks of multi-collection transactions in a fixed order to rule out deadlocks.
+- Record how long callers wait on each lock.
+- Extend each lock across processes with an advisory file lock (fcntl.flock) in the data
+  directory, so several uvicorn workers can share it (STORE_PROCESS_LOCKS, POSIX only).
+  A writer's file lock can outlive its in-process lock until its appends are durable.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+from app.core import config, constants
+
+# Fixed acquisition order. Reference data read by transactions comes first,
+# so a transaction can always take it alongside the collections it writes.
+COLLECTION_ORDER = [
+    "patient_context",
+    "caregivers",
+    "care_receivers",
+    "reminders",
+    "audio_contents",
+    "family_memories",
+    "calendar_items",
+    "device_actions",
+    "events",
+    "conversations",
+    "health_logs",
+]
+
+
+def process_locks_enabled() -> bool:
+    return config.STORE_PROCESS_LOCKS and fcntl is not None
+
+
+class _FileLock:
+    """
+    Advisory lock file shared by the processes using the data directory.
+    It is held once per process and reference-counted across threads: within a process,
+    threads already exclude each other through the RWLock.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._cond = threading.Condition(threading.Lock())
+        self._fds: Dict[str, int] = {}
+        self._fd: int | None = None
+        self._exclusive = False
+        self._holders = 0
+
+    def _open(self) -> int:
+        path = constants.LOCKS_DIR / f"{self.name}.lock"
+        fd = self._fds.get(str(path))
+        if fd is None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd = self._fds[str(path)] = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        return fd
+
+    def acquire(self, exclusive: bool) -> float:
+        """Hold the lock for this process; return the time spent waiting on other processes."""
+        with self._cond:
+            # A shared hold left by a finished reader cannot be upgraded in place: wait for it to go
+            while self._holders and exclusive and not self._exclusive:
+                self._cond.wait()
+            if self._holders:
+                self._holders += 1
+                return 0.0
+            fd = self._open()
+            mode = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+            waited = 0.0
+            try:
+                fcntl.flock(fd, mode | fcntl.LOCK_NB)
+            except BlockingIOError:
+                start = time.perf_counter()
+                fcntl.flock(fd, mode)
+                waited = time.perf_counter() - start
+            self._fd, self._exclusive, self._holders = fd, exclusive, 1
+            return waited
+
+    def release(self):
+        with self._cond:
+            self._holders -= 1
+            if not self._holders:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+                self._fd = None
+                self._cond.notify_all()
+
+
+_deferred = threading.local()
+
+
+@contextmanager
+def deferred_file_release() -> Iterator[None]:
+    """
+    Keep the cross-process locks of collections written in this block until the block exits,
+    even after their in-process locks are released. Used to keep other processes out of a
+    collection until its group-committed appends are on disk. Nested blocks release once.
+    """
+    outermost = getattr(_deferred, "files", None) is None
+    if outermost:
+        _deferred.files = []
+    try:
+        yield
+    finally:
+        if outermost:
+            files, _deferred.files = _deferred.files, None
+            for file_lock in reversed(files):
+                file_lock.release()
+
+
+class RWLock:
+    """
+    Writer-preferring reader/writer lock.
+    Reentrant for the owning thread: a writer may read or write again, a reader may read again.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._cond = threading.Condition(threading.Lock())
+        self._readers: Dict[int, int] = {}
+        self._writer: int | None = None
+        self._writer_depth = 0
+        self._waiting_writers = 0
+        self._file = _FileLock(name)
+        self._file_locked: Dict[int, bool] = {}
+        self.stats = {
+            "acquisitions": 0, "contended": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0,
+            "process_wait_seconds": 0.0,
+        }
+
+    def held_by_current_thread(self) -> bool:
+        me = threading.get_ident()
+        return self._writer == me or me in self._readers
+
+    def _record_wait(self, waited: float):
+        self.stats["acquisitions"] += 1
+        if waited > 0:
+            self.stats["contended"] += 1
+            self.stats["wait_seconds"] += waited
+            self.stats["max_wait_seconds"] = max(self.stats["max_wait_seconds"], waited)
+
+    def _lock_file(self, exclusive: bool, release_thread_lock):
+        """Take the cross-process lock once the in-process one is held (outermost acquisition only)."""
+        if not process_locks_enabled():
+            return
+        try:
+            waited = self._file.acquire(exclusive)
+        except BaseException:
+            release_thread_lock()
+            raise
+        self._file_locked[threading.get_ident()] = True
+        if waited:
+            with self._cond:
+                self.stats["process_wait_seconds"] += waited
+
+    def _unlock_file(self, deferrable: bool = False):
+        if self._file_locked.pop(threading.get_ident(), False):
+            pending = getattr(_deferred, "files", None)
+            if deferrable and pending is not None:
+                pending.append(self._file)
+            else:
+                self._file.release()
+
+    def acquire_read(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me or me in self._readers:
+                self._readers[me] = self._readers.get(me, 0) + 1
+                return
+            start = None
+            while self._writer is not None or self._waiting_writers:
+                start = start or time.perf_counter()
+                self._cond.wait()
+            self._readers[me] = 1
+            self._record_wait(time.perf_counter() - start if start else 0.0)
+        self._lock_file(False, self._release_read_thread_lock)
+
+    def release_read(self):
+        me = threading.get_ident()
+        if self._readers.get(me) == 1 and self._writer != me:
+            self._unlock_file()
+        self._release_read_thread_lock()
+
+    def _release_read_thread_lock(self):
+        me = threading.get_ident()
+        with self._cond:
+            count = self._readers[me] - 1
+            if count:
+                self._readers[me] = count
+            else:
+                del self._readers[me]
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._writer_depth += 1
+                return
+            if me in self._readers:
+                raise RuntimeError(f"Cannot upgrade a read lock to a write lock on '{self.name}'")
+            start = None
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    start = start or time.perf_counter()
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+            self._writer_depth = 1
+            self._record_wait(time.perf_counter() - start if start else 0.0)
+        self._lock_file(True, self._release_write_thread_lock)
+
+    def release_write(self):
+        if self._writer_depth == 1:
+            self._unlock_file(deferrable=True)
+        self._release_write_thread_lock()
+
+    def _release_write_thread_lock(self):
+        with self._cond:
+            self._writer_depth -= 1
+            if not self._writer_depth:
+                self._writer = None
+                self._cond.notify_all()
+
+
+_locks: Dict[str, RWLock] = {name: RWLock(name) for name in COLLECTION_ORDER}
+
+
+def _check_order(names: Iterable[str]):
+    """Refuse to block on a lock ordered before one this thread already holds."""
+    held = [n for n in COLLECTION_ORDER if _locks[n].held_by_current_thread()]
+    if not held:
+        return
+    last_held = COLLECTION_ORDER.index(held[-1])
+    for name in names:
+        if not _locks[name].held_by_current_thread() and COLLECTION_ORDER.index(name) < last_held:
+            raise RuntimeError(
+                f"Lock order violation: '{name}' requested while holding '{held[-1]}'. "
+                f"Declare it in the enclosing transaction."
+            )
+
+
+@contextmanager
+def locked(read: Iterable[str] = (), write: Iterable[str] = ()) -> Iterator[None]:
+    """
+    Hold shared locks on `read` and exclusive locks on `write` collections.
+    A collection listed in both is locked for writing. Locks are taken in COLLECTION_ORDER.
+    """
+    write = set(write)
+    names = sorted(set(read) | write, key=COLLECTION_ORDER.index)
+    _check_order(names)
+    acquired = []
+    try:
+        for name in names:
+            if name in write:
+                _locks[name].acquire_write()
+            else:
+                _locks[name].acquire_read()
+            acquired.append(name)
+        yield
+    finally:
+        for name in reversed(acquired):
+            if name in write:
+                _locks[name].release_write()
+            else:
+                _locks[name].release_read()
+
+
+def wait_stats() -> Dict[str, Dict[str, float]]:
+    """Per-collection lock acquisition and wait statistics."""
+    return {name: dict(lock.stats) for name, lock in _locks.items()}
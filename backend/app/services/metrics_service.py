@@ -0,0 +1,227 @@
+"""
+This module collects the performance telemetry of the backend and renders it for Prometheus.
+
+Responsibilities:
+- Provide thread-safe counters and latency histograms with labels, and gauges read on scrape.
+- Time the stages of an agent turn (environment context, LLM round-trips, tool calls,
+  markdown stripping, transcript writes, TTS) through the `timed` context manager.
+- Count the LLM tokens reported by Gemini's usage metadata, per stage.
+- Render everything in the Prometheus text exposition format (served at /metrics).
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+
+# Latency buckets (seconds): from a cached tool call to a slow multi-round LLM turn
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0)
+
+_LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> _LabelValues:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labels)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[_LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(v)}" for key, v in items
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # label values -> [bucket counts..., sum, count]
+        self._series: Dict[_LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: Any):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self, **labels: Any) -> Dict[str, float]:
+        """Count and sum of one series (zero if never observed)."""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return {"count": series[-1], "sum": series[-2]} if series else {"count": 0, "sum": 0.0}
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = self.header()
+        for key, series in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {_format_value(series[-1])}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Gauge whose samples are read from a callback at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], Dict[_LabelValues, float]], labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self._read = read
+
+    def render(self) -> List[str]:
+        try:
+            samples = self._read()
+        except Exception as e:
+            print(f"[METRICS] Gauge {self.name} failed: {e}")
+            samples = {}
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(v)}" for key, v in sorted(samples.items())
+        ]
+
+
+_registry: Dict[str, _Metric] = {}
+_registry_lock = threading.Lock()
+
+
+def _register(metric: _Metric) -> _Metric:
+    with _registry_lock:
+        existing = _registry.get(metric.name)
+        if existing is not None:
+            return existing
+        _registry[metric.name] = metric
+        return metric
+
+
+def counter(name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+    return _register(Counter(name, help_text, labels))
+
+
+def histogram(name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return _register(Histogram(name, help_text, labels, buckets))
+
+
+def gauge(name: str, help_text: str, read: Callable[[], Dict[_LabelValues, float]], labels: Sequence[str] = ()) -> Gauge:
+    return _register(Gauge(name, help_text, read, labels))
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    lines: List[str] = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Agent pipeline metrics ---
+
+STAGE_SECONDS = histogram(
+    "careloop_agent_stage_seconds",
+    "Time spent in each stage of an agent turn.",
+    labels=("stage",),
+)
+TOOL_SECONDS = histogram(
+    "careloop_agent_tool_seconds",
+    "Duration of agent tool calls, by tool and outcome (ok, error, timeout).",
+    labels=("tool", "outcome"),
+)
+TURNS = counter(
+    "careloop_agent_turns_total",
+    "Agent turns by outcome (ok, fallback, error, busy).",
+    labels=("outcome",),
+)
+LLM_TOKENS = counter(
+    "careloop_llm_tokens_total",
+    "Tokens reported by Gemini usage metadata, by stage and kind (prompt, candidates, thoughts, cached, total).",
+    labels=("stage", "kind"),
+)
+
+_TOKEN_FIELDS = {
+    "prompt": "prompt_token_count",
+    "candidates": "candidates_token_count",
+    "thoughts": "thoughts_token_count",
+    "cached": "cached_content_token_count",
+    "total": "total_token_count",
+}
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Record the duration of the block under `stage` (also when it raises)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+def record_usage(stage: str, usage: Any):
+    """Count the tokens of a Gemini response's usage_metadata (ignored when absent)."""
+    if usage is None:
+        return
+    for kind, field in _TOKEN_FIELDS.items():
+        count = getattr(usage, field, None)
+        if count:
+            LLM_TOKENS.inc(count, stage=stage, kind=kind)
@@ -0,0 +1,187 @@
+"""
+This module prepares the spoken phrase of each reminder before it is due.
+
+Responsibilities:
+- Cache the phrases generated by the LLM by what they depend on (title, reminder type, message
+  text, resident name, audio-invite flag), so a reminder firing again (daily pills) costs no LLM call.
+- Render ahead of time the phrases of the calendar items due within REMINDER_PHRASE_LOOKAHEAD_MIN
+  minutes (scheduler job), so firing a reminder is a cache lookup and a queue write.
+- Give the phrase of an item at fire time: cached, else generated on the spot (callers do this
+  before taking the store locks), else the simple fallback phrase.
+- Generate the phrases missing at the same time together, in batched LLM requests.
+"""
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core import config
+from app.services import json_store_service
+from app.services.llm_service import fallback_reminder_phrase, generate_reminder_phrases
+
+# Distinct phrases kept in memory (least recently used ones go first)
+MAX_ENTRIES = 512
+
+PhraseKey = Tuple[str, str, str, str, bool]
+
+_lock = threading.Lock()
+_phrases: "OrderedDict[PhraseKey, str]" = OrderedDict()
+# Keys being generated, so the scheduler jobs never ask the LLM twice for the same phrase
+_inflight: Dict[PhraseKey, threading.Event] = {}
+stats = {"hits": 0, "misses": 0, "generated": 0, "failed": 0, "pregenerated": 0}
+
+
+def parse_reminder_type(msg: Optional[str]) -> str:
+    """Extrait le type depuis [medication], [appointment], etc."""
+    if not msg:
+        return "reminder"
+    m = re.match(r"^\[([\w_]+)\]\s*", msg)
+    return m.group(1).lower() if m else "reminder"
+
+
+def scheduled_at(item: Dict[str, Any]) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(item["scheduled_at"].replace("Z", "+00:00"))
+    except (KeyError, AttributeError, ValueError, TypeError):
+        return None
+
+
+def resident_name() -> str:
+    ctx = json_store_service.get_patient_context()
+    return ctx.get("preferred_name") or ctx.get("name") or "Simone"
+
+
+def phrase_key(item: Dict[str, Any], resident: str) -> PhraseKey:
+    msg = item.get("message_text") or ""
+    return (
+        item.get("title") or "Reminder",
+        parse_reminder_type(msg),
+        msg.strip(),
+        resident,
+        item.get("type") == "audio_push",
+    )
+
+
+def _lookup(key: PhraseKey) -> Optional[str]:
+    with _lock:
+        phrase = _phrases.get(key)
+        if phrase is not None:
+            _phrases.move_to_end(key)
+        return phrase
+
+
+def _store(key: PhraseKey, phrase: str):
+    with _lock:
+        _phrases[key] = phrase
+        _phrases.move_to_end(key)
+        while len(_phrases) > MAX_ENTRIES:
+            _phrases.popitem(last=False)
+
+
+def _request(key: PhraseKey) -> Dict[str, Any]:
+    title, reminder_type, msg, resident, is_audio = key
+    return {"title": title, "reminder_type": reminder_type, "message_text": msg,
+            "resident_name": resident, "is_audio_invite": is_audio}
+
+
+def _generate(keys: Iterable[PhraseKey]) -> Dict[PhraseKey, Optional[str]]:
+    """
+    Ask the LLM for the phrases of `keys`, in batches; keys another thread is already generating
+    are waited for instead. Returns the phrase of each key (None when the LLM gave none: fallback
+    phrases are never cached, they depend on the time of day).
+    """
+    keys = list(dict.fromkeys(keys))
+    with _lock:
+        waiting = {key: _inflight[key] for key in keys if key in _inflight}
+        mine = [key for key in keys if key not in waiting]
+        for key in mine:
+            _inflight[key] = threading.Event()
+
+    results: Dict[PhraseKey, Optional[str]] = {}
+    try:
+        if mine:
+            for key, phrase in zip(mine, generate_reminder_phrases([_request(key) for key in mine], fallback=False)):
+                results[key] = phrase
+                if phrase:
+                    _store(key, phrase)
+                with _lock:
+                    stats["generated" if phrase else "failed"] += 1
+    finally:
+        with _lock:
+            for key in mine:
+                _inflight.pop(key).set()
+    for key, pending in waiting.items():
+        pending.wait()
+        results[key] = _lookup(key)
+    return results
+
+
+def _fallback(key: PhraseKey) -> str:
+    title, _, msg, resident, is_audio = key
+    return fallback_reminder_phrase(title, msg, resident, is_audio_invite=is_audio)
+
+
+def phrases_for(items: Iterable[Dict[str, Any]], resident: Optional[str] = None, generate: bool = True) -> Dict[str, str]:
+    """
+    Spoken phrase of each calendar item, by item id: from the cache, else from the LLM when
+    `generate` is set (all the misses together, in batches; never inside a store transaction:
+    it is a network round-trip), else the fallback phrase.
+    """
+    resident = resident if resident is not None else resident_name()
+    keys = {item.get("id"): phrase_key(item, resident) for item in items}
+    phrases: Dict[str, Optional[str]] = {}
+    missing: List[PhraseKey] = []
+    for item_id, key in keys.items():
+        phrases[item_id] = _lookup(key)
+        if phrases[item_id] is None:
+            missing.append(key)
+    with _lock:
+        stats["hits"] += len(keys) - len(missing)
+        stats["misses"] += len(missing)
+    generated = _generate(missing) if generate and missing else {}
+    return {
+        item_id: phrases[item_id] or generated.get(key) or _fallback(key)
+        for item_id, key in keys.items()
+    }
+
+
+def phrase_for(item: Dict[str, Any], resident: Optional[str] = None, generate: bool = True) -> str:
+    """Spoken phrase of one calendar item (see phrases_for)."""
+    return phrases_for([item], resident, generate)[item.get("id")]
+
+
+def pregenerate(now: Optional[datetime] = None) -> int:
+    """
+    Render the phrases of the scheduled items due within REMINDER_PHRASE_LOOKAHEAD_MIN minutes
+    (overdue ones included) that are not cached yet. Returns the number of phrases generated.
+    """
+    now = now or datetime.now(timezone.utc)
+    horizon = now + timedelta(minutes=config.REMINDER_PHRASE_LOOKAHEAD_MIN)
+    resident = resident_name()
+    missing = []
+    for item in json_store_service.get_calendar_items():
+        if item.get("status") != "scheduled":
+            continue
+        when = scheduled_at(item)
+        if when is None or when > horizon:
+            continue
+        key = phrase_key(item, resident)
+        if _lookup(key) is None:
+            missing.append(key)
+    generated = sum(1 for phrase in _generate(missing).values() if phrase) if missing else 0
+    if generated:
+        with _lock:
+            stats["pregenerated"] += generated
+        print(f"[PHRASES] Pregenerated {generated} reminder phrase(s)")
+    return generated
+
+
+def cache_stats() -> Dict[str, Any]:
+    with _lock:
+        return {"entries": len(_phrases), **stats}
+
+
+def clear():
+    with _lock:
+        _phrases.clear()
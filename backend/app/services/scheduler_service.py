@@ -1,24 +1,21 @@
 import asyncio
-import re
 import uuid
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from datetime import datetime, timezone
 from app.services.agent_service import process_user_message
 from app.services.json_store_service import (
-    get_conversations,
-    save_conversations,
+    append_to_conversation,
     get_calendar_items,
     save_calendar_items,
-    get_device_actions,
-    save_device_actions,
-    get_events,
-    save_events,
-    lock,
+    append_device_action,
+    append_event,
+    compact_all,
+    transaction,
 )
 from app.core.constants import BASE_DIR
-from app.services.llm_service import generate_reminder_phrase
-from app.services.json_store_service import get_patient_context
+from app.services import reminder_phrases
+from app.services.archive_service import run_archival
 
 scheduler = AsyncIOScheduler()
 
@@ -34,8 +31,8 @@ async def morning_routine():
     prompt = "C'est le matin ! Peux-tu utiliser ton outil de recherche web pour chercher la météo générale en France et 2 vraies actualités très positives et récentes dans le monde ? Rédige un petit briefing matinal pour le patient."
     
     try:
-        # Comme process_user_message est synchrone (et bloque), on l'exécute dans un thread séparé
-        response = await asyncio.to_thread(process_user_message, session_id, prompt)
+        # process_user_message est asynchrone de bout en bout : il ne bloque pas la boucle d'événements
+        response = await process_user_message(session_id, prompt)
         
         # Sauvegarde du briefing
         briefing_path = BASE_DIR / "app" / "data" / "daily_briefing.txt"
@@ -54,45 +51,24 @@ async def cognitive_game_routine():
     print("[SCHEDULER] Démarrage de la routine de jeu cognitif...")
     session_id = "default_patient_session"
     
-    with lock:
-        conversations = get_conversations()
-        session_conv = next((c for c in conversations if c.get("session_id") == session_id), None)
-        
-        if not session_conv:
-            session_conv = {
-                "session_id": session_id,
-                "timestamp": datetime.now().isoformat() + "Z",
-                "messages": []
-            }
-            conversations.append(session_conv)
-            
-        # On insère une notification "Push" dans la conversation
-        session_conv["messages"].append({
-            "role": "assistant",
-            "content": "Coucou ! C'est l'heure de notre petit jeu quotidien ! Est-ce que tu es prêt ?"
-        })
-        
-        save_conversations(conversations)
-        
-    print("[SCHEDULER] Invitation au jeu envoyée dans l'historique.")
-
-def _parse_reminder_type(msg: str) -> str:
-    """Extrait le type depuis [medication], [appointment], etc."""
-    if not msg:
-        return "reminder"
-    m = re.match(r"^\[([\w_]+)\]\s*", msg)
-    return m.group(1).lower() if m else "reminder"
+    # On insère une notification "Push" dans la conversation
+    await asyncio.to_thread(
+        append_to_conversation,
+        session_id,
+        "assistant",
+        "Coucou ! C'est l'heure de notre petit jeu quotidien ! Est-ce que tu es prêt ?"
+    )
 
+    print("[SCHEDULER] Invitation au jeu envoyée dans l'historique.")
 
 def _get_audio_for_item(item: dict):
     """Retourne l'audio_content associé à un calendar item, ou auto-sélectionne le premier disponible."""
-    from app.services.json_store_service import get_audio_contents
+    from app.services.json_store_service import find, get_audio_contents, get_by_id
     audio_content_id = item.get("audio_content_id")
-    contents = get_audio_contents()
     care_id = item.get("care_receiver_id")
 
     if audio_content_id:
-        return next((c for c in contents if c.get("id") == audio_content_id), None)
+        return get_by_id("audio_contents", audio_content_id)
 
     # Auto-sélection selon le type (music vs audiobook)
     msg = (item.get("message_text") or "").lower()
@@ -100,33 +76,30 @@ def _get_audio_for_item(item: dict):
     target_kind = "audiobook" if is_book else "music"
 
     # 1. Chercher le bon type pour ce patient
-    for c in contents:
-        if c.get("care_receiver_id") == care_id and c.get("kind") == target_kind:
+    own_contents = find("audio_contents", care_receiver_id=care_id) if care_id else []
+    for c in own_contents:
+        if c.get("kind") == target_kind:
             return c
     # 2. Chercher sans filtre de patient (partage global)
+    contents = get_audio_contents()
     for c in contents:
         if c.get("kind") == target_kind:
             return c
     # 3. Fallback : n'importe quel audio pour ce patient
-    for c in contents:
-        if c.get("care_receiver_id") == care_id:
-            return c
+    if own_contents:
+        return own_contents[0]
     # 4. Dernier recours : premier audio disponible
     return contents[0] if contents else None
 
 
-def _calendar_item_to_device_action(item: dict) -> dict:
+def _calendar_item_to_device_action(item: dict, text_to_speak: str | None = None) -> dict:
     """Convertit un calendar_item en DeviceAction pour l'appareil vocal.
-    Utilise le LLM pour générer une phrase chaleureuse (ex: pills -> "Don't forget to take your pills").
+    La phrase chaleureuse (ex: pills -> "Don't forget to take your pills") est celle préparée par
+    reminder_phrases ; sans elle, pas d'appel LLM ici (appelé sous verrou) : phrase en cache ou de repli.
     Pour audio_push, génère une invitation oui/non et inclut l'audio_url."""
-    title = item.get("title", "Reminder")
-    msg = item.get("message_text", "")
     is_audio = item.get("type") == "audio_push"
-    reminder_type = _parse_reminder_type(msg)
-    ctx = get_patient_context()
-    resident_name = ctx.get("preferred_name") or ctx.get("name") or "Simone"
-    text_to_speak = generate_reminder_phrase(title, reminder_type, msg, resident_name,
-                                             is_audio_invite=is_audio)
+    if text_to_speak is None:
+        text_to_speak = reminder_phrases.phrase_for(item, generate=False)
 
     action = {
         "id": f"act-{uuid.uuid4().hex[:8]}",
@@ -159,6 +132,13 @@ def _next_occurrence(scheduled: datetime, repeat_rule: str | None) -> datetime |
     return None
 
 
+def _is_due(item: dict, now: datetime) -> bool:
+    if item.get("status") != "scheduled":
+        return False
+    scheduled = reminder_phrases.scheduled_at(item)
+    return scheduled is not None and scheduled <= now
+
+
 def check_due_calendar_items():
     """
     Vérifie les événements du calendrier dont l'heure est dépassée
@@ -166,25 +146,24 @@ def check_due_calendar_items():
     Marque l'item comme 'sent'. Pour repeat_rule daily, crée la prochaine occurrence.
     """
     now = datetime.now(timezone.utc)
-    with lock:
+
+    # Phrases d'abord, hors verrous : normalement en cache (pregenerate_reminder_phrases),
+    # sinon un aller-retour LLM qui ne doit pas bloquer les écritures de l'API
+    # (les phrases manquantes sont générées ensemble, par lots : quelques appels LLM pour des centaines de rappels)
+    phrases = reminder_phrases.phrases_for(item for item in get_calendar_items() if _is_due(item, now))
+
+    with transaction(
+        read=["patient_context", "audio_contents"],
+        write=["calendar_items", "device_actions", "events"],
+    ):
         items = get_calendar_items()
-        actions = get_device_actions()
-        events = get_events()
         updated = False
 
         for item in list(items):  # copy to allow appending
-            if item.get("status") != "scheduled":
-                continue
-            try:
-                scheduled = datetime.fromisoformat(
-                    item["scheduled_at"].replace("Z", "+00:00")
-                )
-            except (ValueError, TypeError):
-                continue
-
-            if scheduled <= now:
-                action = _calendar_item_to_device_action(item)
-                actions.append(action)
+            if _is_due(item, now):
+                scheduled = reminder_phrases.scheduled_at(item)
+                action = _calendar_item_to_device_action(item, phrases.get(item.get("id")))
+                append_device_action(action)
 
                 repeat_rule = item.get("repeat_rule")
                 next_at = _next_occurrence(scheduled, repeat_rule)
@@ -201,7 +180,7 @@ def check_due_calendar_items():
                 else:
                     item["status"] = "sent"
 
-                events.append({
+                append_event({
                     "id": f"ev-{uuid.uuid4().hex[:8]}",
                     "care_receiver_id": item.get("care_receiver_id", "default"),
                     "type": "reminder_delivered",
@@ -216,14 +195,29 @@ def check_due_calendar_items():
 
         if updated:
             save_calendar_items(items)
-            save_device_actions(actions)
-            save_events(events)
+
+
+def pregenerate_reminder_phrases():
+    """Prépare les phrases des rappels des prochaines minutes (REMINDER_PHRASE_LOOKAHEAD_MIN)."""
+    try:
+        reminder_phrases.pregenerate()
+    except Exception as e:
+        print(f"[SCHEDULER] Erreur lors de la préparation des phrases de rappel : {e}")
 
 
 def init_scheduler():
     # Calendrier → Appareil: vérifie toutes les minutes les rappels dus
     scheduler.add_job(check_due_calendar_items, IntervalTrigger(minutes=1))
 
+    # Rappels: génère à l'avance les phrases des rappels à venir, pour un déclenchement sans appel LLM
+    scheduler.add_job(pregenerate_reminder_phrases, IntervalTrigger(minutes=1))
+
+    # Stockage: replie périodiquement les logs append-only dans leurs snapshots JSON
+    scheduler.add_job(compact_all, IntervalTrigger(minutes=10))
+
+    # Stockage: archive les événements et rappels envoyés anciens dans des partitions mensuelles
+    scheduler.add_job(run_archival, IntervalTrigger(hours=1))
+
     # Planification théorique (pour la prod)
     # scheduler.add_job(morning_routine, CronTrigger(hour=8, minute=0))
     # scheduler.add_job(cognitive_game_routine, CronTrigger(hour=15, minute=0))
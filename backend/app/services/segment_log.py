@@ -0,0 +1,301 @@
+"""
+This module implements the append-only segment log behind json_store_service.
+
+Responsibilities:
+- Append single-record operations (put/delete) to a per-collection JSON Lines log.
+- Rebuild a collection by replaying its log over the last JSON snapshot.
+- Compute the log operations that turn one version of a collection into another.
+- Decide when a log has grown enough to be folded back into its snapshot (compaction).
+- Make appends durable (fsync), optionally merging the appends of concurrent writers
+  into one write + fsync per file (group commit, STORE_GROUP_COMMIT_MS > 0).
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from app.core import config
+
+# A log is compacted once it is bigger than its snapshot, but never below this size,
+# so small collections are not rewritten on every few appends.
+COMPACT_MIN_BYTES = 64 * 1024
+
+
+def log_path(snapshot_path: Path) -> Path:
+    """Return the log file sitting next to a snapshot (events.json -> events.log)."""
+    return snapshot_path.with_suffix(".log")
+
+
+def put_op(key: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    return {"op": "put", "key": key, "record": record}
+
+
+def delete_op(key: str) -> Dict[str, Any]:
+    return {"op": "del", "key": key}
+
+
+def encode_ops(ops: Iterable[Dict[str, Any]]) -> str:
+    return encode_lines(ops)
+
+
+def encode_lines(entries: Iterable[Any]) -> str:
+    """Encode entries as JSON Lines, one entry per line."""
+    return "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+
+
+def _write_durably(path: Path, data: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        # After a crash mid-append the log may end with a torn line: start on a fresh one
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                data = "\n" + data
+        f.write(data.encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class _GroupCommitter:
+    """
+    Collects log appends in memory and lets a single flusher thread write them,
+    one write + fsync per file for everything submitted during the commit window.
+    Appends to the same file are written in submission order.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._pending: Dict[Path, List[str]] = {}
+        self._in_flight: Dict[Path, List[str]] = {}
+        self._formed = 0        # number of the last batch taken by the flusher
+        self._flushed = 0       # number of the last batch made durable
+        self._errors: Dict[int, Exception] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, path: Path, data: str) -> int:
+        """Queue data for `path` and return the batch number that will make it durable."""
+        with self._cond:
+            self._pending.setdefault(path, []).append(data)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="store-group-commit", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+            return self._formed + 1
+
+    def has_pending(self, path: Path) -> bool:
+        """True while data for `path` is queued or being flushed."""
+        with self._cond:
+            return path in self._pending or path in self._in_flight
+
+    def wait(self, ticket: int):
+        with self._cond:
+            while self._flushed < ticket:
+                self._cond.wait()
+            error = self._errors.get(ticket)
+        if error:
+            raise error
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            # Let concurrent writers join the batch
+            time.sleep(config.STORE_GROUP_COMMIT_MS / 1000)
+            with self._cond:
+                batch, self._pending = self._pending, {}
+                self._in_flight = batch
+                self._formed += 1
+                number = self._formed
+            error = None
+            for path, chunks in batch.items():
+                try:
+                    _write_durably(path, "".join(chunks))
+                except Exception as e:
+                    print(f"[STORE] Group commit failed for {path.name}: {e}")
+                    error = e
+            with self._cond:
+                self._in_flight = {}
+                if error:
+                    self._errors[number] = error
+                self._flushed = number
+                self._cond.notify_all()
+
+
+_committer = _GroupCommitter()
+_deferred = threading.local()
+
+
+def group_commit_enabled() -> bool:
+    return config.STORE_GROUP_COMMIT_MS > 0
+
+
+def has_pending(snapshot_path: Path) -> bool:
+    """True while appends to this collection are waiting for the group commit."""
+    return file_has_pending(log_path(snapshot_path))
+
+
+def file_has_pending(path: Path) -> bool:
+    return group_commit_enabled() and _committer.has_pending(path)
+
+
+@contextmanager
+def deferred_commit() -> Iterator[None]:
+    """
+    Postpone the durability wait of group-committed appends made in this block
+    until the block exits, so callers do not hold store locks while waiting for fsync.
+    Nested blocks wait once, at the outermost exit.
+    """
+    outermost = getattr(_deferred, "ticket", None) is None
+    if outermost:
+        _deferred.ticket = 0
+    try:
+        yield
+    finally:
+        if outermost:
+            ticket, _deferred.ticket = _deferred.ticket, None
+            if ticket:
+                _committer.wait(ticket)
+
+
+def append_ops(snapshot_path: Path, ops: List[Dict[str, Any]]):
+    """
+    Append operations to the collection log. Cost is proportional to the ops written.
+    Returns once the ops are on disk (or, inside deferred_commit, when the block exits).
+    """
+    if not ops:
+        return
+    append_to_file(log_path(snapshot_path), encode_ops(ops))
+
+
+def append_to_file(path: Path, data: str):
+    """Durably append raw JSON Lines data to any append-only file (logs, conversation shards)."""
+    if not group_commit_enabled():
+        _write_durably(path, data)
+        return
+    ticket = _committer.submit(path, data)
+    if getattr(_deferred, "ticket", None) is not None:
+        _deferred.ticket = max(_deferred.ticket, ticket)
+    else:
+        _committer.wait(ticket)
+
+
+def append_now(path: Path, data: str):
+    """Append and fsync immediately, bypassing the group commit (data that must be durable before a dependent write)."""
+    _write_durably(path, data)
+
+
+def read_ops(snapshot_path: Path) -> List[Dict[str, Any]]:
+    """Read every operation of a collection log."""
+    return read_json_lines(log_path(snapshot_path))
+
+
+def read_json_lines(path: Path) -> List[Any]:
+    """
+    Read a JSON Lines file written by append_to_file.
+    A torn line (crash in the middle of an append) is ignored.
+    """
+    if not path.exists():
+        return []
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                print(f"[STORE] Skipping torn line in {path.name}")
+    return entries
+
+
+def reset(snapshot_path: Path):
+    """Drop the log once its content has been folded into the snapshot."""
+    path = log_path(snapshot_path)
+    if path.exists():
+        path.unlink()
+
+
+def needs_compaction(snapshot_path: Path) -> bool:
+    path = log_path(snapshot_path)
+    if not path.exists():
+        return False
+    log_size = path.stat().st_size
+    snapshot_size = snapshot_path.stat().st_size if snapshot_path.exists() else 0
+    return log_size > max(COMPACT_MIN_BYTES, snapshot_size)
+
+
+def record_key(record: Any, key_field: str, position: int) -> Any:
+    """
+    Key of a record in the materialized collection.
+    Legacy records without the key field get a positional key that can never
+    collide with a real (string) key.
+    """
+    if isinstance(record, dict) and record.get(key_field) is not None:
+        return str(record[key_field])
+    return ("#", position)
+
+
+def replay(records: List[Any], ops: List[Dict[str, Any]], key_field: str) -> Dict[Any, Any]:
+    """
+    Apply log operations over snapshot records.
+    Returns an insertion-ordered dict key -> record: a put on an existing key
+    replaces the record in place, a put on a new key appends it, a delete removes it.
+    Replaying the same op twice is harmless, so a crash during compaction is safe.
+    """
+    state: Dict[Any, Any] = {}
+    for i, record in enumerate(records):
+        state[record_key(record, key_field, i)] = record
+    for op in ops:
+        kind = op.get("op")
+        if kind == "put":
+            state[op["key"]] = op["record"]
+        elif kind == "del":
+            state.pop(op["key"], None)
+    return state
+
+
+def diff(old: List[Any], new: List[Any], key_field: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Compute the put/delete operations that turn `old` into `new`.
+    Returns None when `new` cannot be expressed as keyed operations
+    (missing or duplicated keys, reordered records, new records not at the end):
+    the caller then rewrites the whole snapshot instead.
+    """
+    old_state = {}
+    for i, record in enumerate(old):
+        key = record_key(record, key_field, i)
+        if not isinstance(key, str) or key in old_state:
+            return None
+        old_state[key] = record
+
+    ops = []
+    seen = set()
+    surviving_order = []
+    appending = False
+    for i, record in enumerate(new):
+        key = record_key(record, key_field, i)
+        if not isinstance(key, str) or key in seen:
+            return None
+        seen.add(key)
+        previous = old_state.get(key)
+        if previous is None:
+            appending = True
+            ops.append(put_op(key, record))
+            continue
+        if appending:
+            # An existing record placed after a new one cannot be replayed in order
+            return None
+        surviving_order.append(key)
+        if previous != record:
+            ops.append(put_op(key, record))
+
+    if surviving_order != [k for k in old_state if k in seen]:
+        return None
+
+    ops.extend(delete_op(key) for key in old_state if key not in seen)
+    return ops
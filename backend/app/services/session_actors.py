@@ -0,0 +1,123 @@
+"""
+This module runs the agent turns of each chat session through a dedicated worker (actor).
+
+Responsibilities:
+- Give every active session a queue and a worker task that executes its turns one at a time,
+  in arrival order, so a session's chat object is never used by two turns at once.
+- Let the workers of different sessions run concurrently on the event loop.
+- Bound the number of turns waiting per session (AGENT_SESSION_QUEUE_LIMIT).
+- Stop idle workers, and report queue depth and queueing time per session.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core import config
+from app.services import metrics_service
+
+# A worker with nothing to do for this long stops; the next turn of its session starts a new one
+WORKER_IDLE_S = 60.0
+
+
+class SessionQueueFull(RuntimeError):
+    """Raised when a session already has AGENT_SESSION_QUEUE_LIMIT turns waiting."""
+
+
+class _SessionActor:
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.worker: Optional[asyncio.Task] = None
+        self.running = False
+        self.stats = {
+            "turns": 0, "failed": 0, "rejected": 0,
+            "wait_seconds": 0.0, "max_wait_seconds": 0.0, "last_wait_seconds": 0.0,
+            "run_seconds": 0.0,
+        }
+
+    @property
+    def depth(self) -> int:
+        """Turns waiting in the queue plus the one being run."""
+        return self.queue.qsize() + (1 if self.running else 0)
+
+
+class SessionActors:
+    """Registry of per-session actors. Must be used from a single event loop."""
+
+    def __init__(self, queue_limit: int = 0, idle_s: float = WORKER_IDLE_S):
+        self.queue_limit = queue_limit
+        self.idle_s = idle_s
+        self._actors: Dict[str, _SessionActor] = {}
+
+    async def run(self, session_id: str, job: Callable[[], Awaitable[Any]]) -> Any:
+        """Queue `job` behind the session's earlier turns and return its result once it has run."""
+        actor = self._actors.get(session_id)
+        if actor is None or actor.worker.done():
+            # No worker, or one left behind by a stopped event loop: start afresh
+            stats = actor.stats if actor else None
+            actor = self._actors[session_id] = _SessionActor(session_id)
+            if stats:
+                actor.stats = stats
+            actor.worker = asyncio.create_task(self._work(actor), name=f"session-actor-{session_id}")
+        # The depth counts the turn being run (or about to be picked up), which is not waiting
+        if self.queue_limit and actor.depth > self.queue_limit:
+            actor.stats["rejected"] += 1
+            raise SessionQueueFull(f"{actor.depth - 1} turn(s) already waiting for session {session_id}")
+
+        future = asyncio.get_running_loop().create_future()
+        actor.queue.put_nowait((job, future, time.perf_counter()))
+        return await future
+
+    async def _work(self, actor: _SessionActor):
+        while True:
+            try:
+                job, future, queued_at = await asyncio.wait_for(actor.queue.get(), timeout=self.idle_s)
+            except asyncio.TimeoutError:
+                if actor.queue.empty():
+                    # Forget the idle session; its statistics go with it
+                    if self._actors.get(actor.session_id) is actor:
+                        del self._actors[actor.session_id]
+                    return
+                continue
+            if future.cancelled():
+                # The caller went away while waiting: skip its turn
+                continue
+
+            started = time.perf_counter()
+            waited = started - queued_at
+            actor.stats["wait_seconds"] += waited
+            actor.stats["last_wait_seconds"] = waited
+            actor.stats["max_wait_seconds"] = max(actor.stats["max_wait_seconds"], waited)
+            metrics_service.STAGE_SECONDS.observe(waited, stage="queue_wait")
+            actor.running = True
+            try:
+                result = await job()
+            except Exception as e:
+                actor.stats["failed"] += 1
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                actor.running = False
+                actor.stats["turns"] += 1
+                actor.stats["run_seconds"] += time.perf_counter() - started
+
+    def depth(self, session_id: str) -> int:
+        actor = self._actors.get(session_id)
+        return actor.depth if actor else 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Queue depth and queueing/run times of each session with a live worker."""
+        return {
+            "queue_limit": self.queue_limit,
+            "sessions": {
+                session_id: {"depth": actor.depth, **actor.stats}
+                for session_id, actor in self._actors.items()
+            },
+        }
+
+
+def create_default() -> SessionActors:
+    return SessionActors(queue_limit=config.AGENT_SESSION_QUEUE_LIMIT)
@@ -0,0 +1,153 @@
+"""
+This module keeps the live LLM chat sessions of the agent in a bounded in-memory cache.
+
+Responsibilities:
+- Hold at most AGENT_SESSION_CACHE_SIZE sessions, evicting the least recently used one first.
+- Evict sessions idle for longer than AGENT_SESSION_IDLE_TTL_S.
+- Account for the approximate memory held by each session's history and evict
+  least recently used sessions beyond AGENT_SESSION_CACHE_MAX_MB.
+An evicted session is rebuilt by the agent from its persisted transcript on its next message.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.core import config
+
+
+def estimate_size(chat: Any) -> int:
+    """Approximate bytes held by a chat's history (text, function calls and responses)."""
+    get_history = getattr(chat, "get_history", None)
+    if get_history is None:
+        return 0
+    size = 0
+    for content in get_history(curated=False):
+        for part in content.parts or []:
+            if part.text:
+                size += len(part.text.encode("utf-8"))
+            if part.function_call:
+                size += len(json.dumps(part.function_call.args or {}, default=str))
+            if part.function_response:
+                size += len(json.dumps(part.function_response.response or {}, default=str))
+    return size
+
+
+class SessionCache:
+    """LRU + idle-TTL cache of chat sessions with memory accounting. Thread-safe."""
+
+    def __init__(self, max_sessions: int, idle_ttl_s: float, max_bytes: int):
+        self.max_sessions = max_sessions
+        self.idle_ttl_s = idle_ttl_s
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evicted_lru": 0, "evicted_idle": 0, "evicted_memory": 0}
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return session_id in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, session_id: str) -> Optional[Any]:
+        """Return the session's chat (marking it recently used), or None if it is not cached."""
+        with self._lock:
+            self._evict_idle(time.monotonic())
+            entry = self._entries.get(session_id)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            entry["last_used"] = time.monotonic()
+            self._entries.move_to_end(session_id)
+            return entry["chat"]
+
+    def peek(self, session_id: str) -> Optional[Any]:
+        """Return the session's chat without touching its recency."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            return entry["chat"] if entry else None
+
+    def setdefault(self, session_id: str, chat: Any) -> Any:
+        """Cache `chat` unless the session is already cached; return the cached chat."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                entry = self._entries[session_id] = {"chat": chat, "bytes": estimate_size(chat), "last_used": time.monotonic()}
+                self._evict_over_limits(keep=session_id)
+            self._entries.move_to_end(session_id)
+            return entry["chat"]
+
+    def update_size(self, session_id: str):
+        """Re-measure a session after a turn grew its history."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return
+            entry["bytes"] = estimate_size(entry["chat"])
+            self._evict_over_limits(keep=session_id)
+
+    def replace(self, session_id: str, old: Any, new: Any) -> bool:
+        """Swap a session's chat for `new` if it is still `old` (keeps its recency)."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or entry["chat"] is not old:
+                return False
+            entry["chat"] = new
+            entry["bytes"] = estimate_size(new)
+            return True
+
+    def pop(self, session_id: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.pop(session_id, None)
+            return entry["chat"] if entry else None
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(entry["bytes"] for entry in self._entries.values())
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Cache statistics for diagnostics."""
+        with self._lock:
+            return {
+                **self.stats,
+                "sessions": len(self._entries),
+                "bytes": sum(entry["bytes"] for entry in self._entries.values()),
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _evict_idle(self, now: float):
+        if self.idle_ttl_s <= 0:
+            return
+        for session_id in [s for s, e in self._entries.items() if now - e["last_used"] > self.idle_ttl_s]:
+            del self._entries[session_id]
+            self.stats["evicted_idle"] += 1
+            print(f"[SESSIONS] Evicted idle session {session_id}")
+
+    def _evict_over_limits(self, keep: str):
+        """Evict least recently used sessions (never `keep`) until both limits hold."""
+        self._evict_idle(time.monotonic())
+        while len(self._entries) > max(1, self.max_sessions):
+            victim = next(s for s in self._entries if s != keep)
+            del self._entries[victim]
+            self.stats["evicted_lru"] += 1
+        if self.max_bytes > 0:
+            total = sum(entry["bytes"] for entry in self._entries.values())
+            for session_id in [s for s in self._entries if s != keep]:
+                if total <= self.max_bytes:
+                    break
+                total -= self._entries.pop(session_id)["bytes"]
+                self.stats["evicted_memory"] += 1
+
+
+def create_default() -> SessionCache:
+    return SessionCache(
+        max_sessions=config.AGENT_SESSION_CACHE_SIZE,
+        idle_ttl_s=config.AGENT_SESSION_IDLE_TTL_S,
+        max_bytes=int(config.AGENT_SESSION_CACHE_MAX_MB * 1024 * 1024),
+    )
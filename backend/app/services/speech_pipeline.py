@@ -0,0 +1,138 @@
+"""
+This module turns a streamed agent reply into a stream of speech chunks.
+
+Responsibilities:
+- Cut the text deltas produced by the LLM at sentence boundaries.
+- Start the TTS synthesis of each sentence as soon as it is complete, a few sentences
+  in parallel, so the first audio chunk is ready about one sentence into the reply.
+- Emit text deltas immediately and audio chunk URLs strictly in sentence order.
+"""
+import asyncio
+import re
+import uuid
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from app.core.constants import BASE_DIR
+from app.services import metrics_service
+
+# Sentence end: terminal punctuation (and closing quotes/brackets) followed by whitespace, or a line break
+_SENTENCE_END = re.compile(r'[.!?…]+["»”)\]]*\s+|\n+')
+# Fragments shorter than this ("Oh.", "1.") are merged into the next sentence
+MIN_SENTENCE_CHARS = 20
+# Sentences synthesized at the same time
+TTS_CONCURRENCY = 3
+
+AUDIO_DIR = BASE_DIR / "app" / "static" / "audio"
+
+
+class SentenceSplitter:
+    """Accumulate text deltas and hand out the sentences they complete."""
+
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, delta: str) -> List[str]:
+        self._buffer += delta
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            candidate = self._buffer[start:match.end()]
+            if len(candidate.strip()) < self.min_chars:
+                continue
+            sentences.append(candidate.strip())
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> Optional[str]:
+        rest, self._buffer = self._buffer.strip(), ""
+        return rest or None
+
+
+def _write_audio_file(filename: str, audio_bytes: bytes):
+    AUDIO_DIR.mkdir(parents=True, exist_ok=True)
+    with open(AUDIO_DIR / filename, "wb") as f:
+        f.write(audio_bytes)
+
+
+async def _synthesize(
+    text: str, filename: str, tts: Callable[[str], Awaitable[bytes]], semaphore: asyncio.Semaphore
+) -> Optional[str]:
+    """Synthesize one sentence and return its audio URL (None if TTS failed: the text is still shown)."""
+    async with semaphore:
+        try:
+            with metrics_service.timed("tts_synthesis"):
+                audio_bytes = await tts(text)
+            await asyncio.to_thread(_write_audio_file, filename, audio_bytes)
+        except Exception as e:
+            print(f"[SPEECH] TTS failed for chunk {filename}: {e}")
+            return None
+    return f"/audio/{filename}"
+
+
+async def speak_stream(
+    events: AsyncIterator[Dict], tts: Callable[[str], Awaitable[bytes]], clean: Callable[[str], str] = str.strip
+) -> AsyncIterator[Dict]:
+    """
+    Consume agent events ({"type": "delta"|"final", "text"}) and yield:
+    {"type": "text", "delta"} as soon as text arrives,
+    {"type": "audio", "index", "url", "text"} for each sentence, in order,
+    {"type": "done", "response"} once everything has been emitted.
+    """
+    out: asyncio.Queue = asyncio.Queue()
+    synthesis: asyncio.Queue = asyncio.Queue()
+    semaphore = asyncio.Semaphore(TTS_CONCURRENCY)
+    reply_id = uuid.uuid4().hex[:8]
+    started = 0
+
+    def start_sentence(sentence: str):
+        nonlocal started
+        text = clean(sentence)
+        if not text:
+            return
+        task = asyncio.create_task(_synthesize(text, f"resp_{reply_id}_{started}.mp3", tts, semaphore))
+        synthesis.put_nowait((started, text, task))
+        started += 1
+
+    async def emit_audio():
+        # Sentences are queued in order, so awaiting them one by one keeps the audio ordered
+        while (item := await synthesis.get()) is not None:
+            index, text, task = item
+            url = await task
+            if url:
+                await out.put({"type": "audio", "index": index, "url": url, "text": text})
+
+    async def produce():
+        emitter = asyncio.create_task(emit_audio())
+        splitter = SentenceSplitter()
+        response = ""
+        try:
+            async for event in events:
+                if event["type"] == "delta":
+                    await out.put({"type": "text", "delta": event["text"]})
+                    for sentence in splitter.feed(event["text"]):
+                        start_sentence(sentence)
+                elif event["type"] == "final":
+                    response = event["text"]
+            rest = splitter.flush()
+            if rest:
+                start_sentence(rest)
+            elif not started and response:
+                # Nothing was streamed (configuration or LLM error): speak the final text
+                start_sentence(response)
+            synthesis.put_nowait(None)
+            await emitter
+            await out.put({"type": "done", "response": response})
+        finally:
+            emitter.cancel()
+            await out.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (event := await out.get()) is not None:
+            yield event
+        # Surface an error raised while producing
+        await producer
+    finally:
+        producer.cancel()
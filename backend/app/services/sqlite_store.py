@@ -0,0 +1,362 @@
+"""
+This module implements the SQLite storage backend of json_store_service.
+
+Responsibilities:
+- Store each list collection in its own table, one row per record, in insertion order.
+- Index the fields the API filters on: id (primary key), care_receiver_id, status,
+  scheduled_at and created_at.
+- Store single-document collections (patient_context) as JSON documents.
+- Store conversations as one row per message, indexed by session.
+- Keep a version counter per collection so the in-memory cache can be validated cheaply.
+"""
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core import constants
+from app.services import segment_log
+
+INDEXED_FIELDS = ("care_receiver_id", "status", "scheduled_at", "created_at")
+
+_local = threading.local()
+_initialized: set = set()
+_init_lock = threading.Lock()
+
+
+def _db_path() -> Path:
+    return constants.SQLITE_DB_FILE
+
+
+def connect() -> sqlite3.Connection:
+    """Return this thread's connection to the store database."""
+    path = _db_path()
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(path, isolation_level=None, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        connections[path] = conn
+    return conn
+
+
+def _table(name: str) -> str:
+    if not name.isidentifier():
+        raise ValueError(f"Invalid collection name: {name}")
+    return name
+
+
+def _ensure_schema(conn: sqlite3.Connection, name: str, document: bool = False):
+    marker = (_db_path(), name, document)
+    if marker in _initialized:
+        return
+    with _init_lock:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS versions (collection TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents (name TEXT PRIMARY KEY, data TEXT NOT NULL)"
+        )
+        if document:
+            _initialized.add(marker)
+            return
+        table = _table(name)
+        conn.execute(
+            f"""CREATE TABLE IF NOT EXISTS {table} (
+                key TEXT PRIMARY KEY,
+                seq INTEGER NOT NULL,
+                care_receiver_id TEXT,
+                status TEXT,
+                scheduled_at TEXT,
+                created_at TEXT,
+                data TEXT NOT NULL
+            )"""
+        )
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_seq ON {table}(seq)")
+        for field in INDEXED_FIELDS:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{field} ON {table}({field})")
+        _initialized.add(marker)
+
+
+def _version(conn: sqlite3.Connection, name: str) -> int:
+    row = conn.execute("SELECT version FROM versions WHERE collection = ?", (name,)).fetchone()
+    return row[0] if row else 0
+
+
+def _bump_version(conn: sqlite3.Connection, name: str) -> int:
+    conn.execute(
+        "INSERT INTO versions (collection, version) VALUES (?, 1) "
+        "ON CONFLICT(collection) DO UPDATE SET version = version + 1",
+        (name,),
+    )
+    return _version(conn, name)
+
+
+def _row_values(record: Dict[str, Any]) -> Tuple:
+    return tuple(record.get(f) if isinstance(record, dict) else None for f in INDEXED_FIELDS)
+
+
+def _upsert(conn: sqlite3.Connection, table: str, key: str, record: Any, seq: Optional[int] = None):
+    if seq is None:
+        seq = conn.execute(f"SELECT COALESCE(MAX(seq), 0) + 1 FROM {table}").fetchone()[0]
+    conn.execute(
+        f"""INSERT INTO {table} (key, seq, care_receiver_id, status, scheduled_at, created_at, data)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                care_receiver_id = excluded.care_receiver_id,
+                status = excluded.status,
+                scheduled_at = excluded.scheduled_at,
+                created_at = excluded.created_at,
+                data = excluded.data""",
+        (key, seq, *_row_values(record), json.dumps(record, ensure_ascii=False)),
+    )
+
+
+def version(name: str) -> int:
+    """Current version of a collection or document; bumped by every write, from any process."""
+    conn = connect()
+    _ensure_schema(conn, name, document=True)
+    return _version(conn, name)
+
+
+def load(name: str) -> Tuple[int, List[Any]]:
+    """Return (version, records in insertion order) read in one consistent snapshot."""
+    conn = connect()
+    _ensure_schema(conn, name)
+    table = _table(name)
+    conn.execute("BEGIN")
+    try:
+        current = _version(conn, name)
+        rows = conn.execute(f"SELECT data FROM {table} ORDER BY seq").fetchall()
+    finally:
+        conn.execute("COMMIT")
+    return current, [json.loads(r[0]) for r in rows]
+
+
+def save(name: str, records: List[Any], key_field: str) -> Tuple[int, int]:
+    """
+    Replace a collection with `records`, touching only the rows that changed.
+    Returns (version before, version after).
+    """
+    conn = connect()
+    _ensure_schema(conn, name)
+    table = _table(name)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        before = _version(conn, name)
+        current = [json.loads(r[0]) for r in conn.execute(f"SELECT data FROM {table} ORDER BY seq")]
+        ops = segment_log.diff(current, records, key_field)
+        if ops is None:
+            # Reordered or unkeyed records: rewrite the table in the new order
+            conn.execute(f"DELETE FROM {table}")
+            for i, record in enumerate(records):
+                _upsert(conn, table, str(segment_log.record_key(record, key_field, i)), record, seq=i + 1)
+        else:
+            for op in ops:
+                if op["op"] == "put":
+                    _upsert(conn, table, op["key"], op["record"])
+                else:
+                    conn.execute(f"DELETE FROM {table} WHERE key = ?", (op["key"],))
+        after = _bump_version(conn, name) if ops != [] else before
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return before, after
+
+
+def append(name: str, key: str, record: Dict[str, Any]) -> Tuple[int, int]:
+    """Insert (or replace by key) one record. Returns (version before, version after)."""
+    conn = connect()
+    _ensure_schema(conn, name)
+    table = _table(name)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        before = _version(conn, name)
+        _upsert(conn, table, key, record)
+        after = _bump_version(conn, name)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return before, after
+
+
+def delete(name: str, key: str) -> Tuple[int, int]:
+    """Delete one record by key. Returns (version before, version after)."""
+    conn = connect()
+    _ensure_schema(conn, name)
+    table = _table(name)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        before = _version(conn, name)
+        deleted = conn.execute(f"DELETE FROM {table} WHERE key = ?", (key,)).rowcount
+        after = _bump_version(conn, name) if deleted else before
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return before, after
+
+
+def get(name: str, key: str) -> Optional[Dict[str, Any]]:
+    """Primary-key lookup."""
+    conn = connect()
+    _ensure_schema(conn, name)
+    row = conn.execute(f"SELECT data FROM {_table(name)} WHERE key = ?", (key,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def find(name: str, **filters: Any) -> List[Dict[str, Any]]:
+    """Records whose indexed fields equal the given values, in insertion order."""
+    conn = connect()
+    _ensure_schema(conn, name)
+    unknown = set(filters) - set(INDEXED_FIELDS)
+    if unknown:
+        raise ValueError(f"Not an indexed field: {', '.join(sorted(unknown))}")
+    where = " AND ".join(f"{field} = ?" for field in filters) or "1"
+    rows = conn.execute(
+        f"SELECT data FROM {_table(name)} WHERE {where} ORDER BY seq", tuple(filters.values())
+    ).fetchall()
+    return [json.loads(r[0]) for r in rows]
+
+
+def get_document(name: str) -> Tuple[int, Optional[Any]]:
+    conn = connect()
+    _ensure_schema(conn, name, document=True)
+    conn.execute("BEGIN")
+    try:
+        current = _version(conn, name)
+        row = conn.execute("SELECT data FROM documents WHERE name = ?", (name,)).fetchone()
+    finally:
+        conn.execute("COMMIT")
+    return current, json.loads(row[0]) if row else None
+
+
+def save_document(name: str, data: Any) -> int:
+    conn = connect()
+    _ensure_schema(conn, name, document=True)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "INSERT INTO documents (name, data) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET data = excluded.data",
+            (name, json.dumps(data, ensure_ascii=False)),
+        )
+        after = _bump_version(conn, name)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return after
+
+
+# --- Conversations: one row per message, indexed by session ---
+
+def _ensure_conversation_schema(conn: sqlite3.Connection):
+    marker = (_db_path(), "conversations", False)
+    if marker in _initialized:
+        return
+    with _init_lock:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversation_sessions (session_id TEXT PRIMARY KEY, timestamp TEXT)"
+        )
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS conversation_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                created_at TEXT,
+                data TEXT NOT NULL
+            )"""
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_conversation_messages_session ON conversation_messages(session_id, id)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_conversation_messages_created_at ON conversation_messages(created_at)"
+        )
+        _initialized.add(marker)
+
+
+def append_message(session_id: str, timestamp: str, message: Dict[str, Any]) -> int:
+    """Append one message to a session, creating the session on first message. Returns its position."""
+    conn = connect()
+    _ensure_conversation_schema(conn)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "INSERT OR IGNORE INTO conversation_sessions (session_id, timestamp) VALUES (?, ?)",
+            (session_id, timestamp),
+        )
+        position = conn.execute(
+            "SELECT COUNT(*) FROM conversation_messages WHERE session_id = ?", (session_id,)
+        ).fetchone()[0]
+        conn.execute(
+            "INSERT INTO conversation_messages (session_id, created_at, data) VALUES (?, ?, ?)",
+            (session_id, message.get("created_at"), json.dumps(message, ensure_ascii=False)),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return position
+
+
+def get_session(session_id: str) -> Optional[Dict[str, Any]]:
+    conn = connect()
+    _ensure_conversation_schema(conn)
+    row = conn.execute(
+        "SELECT timestamp FROM conversation_sessions WHERE session_id = ?", (session_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    messages = conn.execute(
+        "SELECT data FROM conversation_messages WHERE session_id = ? ORDER BY id", (session_id,)
+    ).fetchall()
+    return {"session_id": session_id, "timestamp": row[0], "messages": [json.loads(m[0]) for m in messages]}
+
+
+def message_counts() -> Dict[str, int]:
+    """session_id -> number of messages."""
+    conn = connect()
+    _ensure_conversation_schema(conn)
+    return dict(conn.execute(
+        "SELECT s.session_id, COUNT(m.id) FROM conversation_sessions s"
+        " LEFT JOIN conversation_messages m ON m.session_id = s.session_id GROUP BY s.session_id"
+    ))
+
+
+def list_sessions() -> Dict[str, str]:
+    """session_id -> session start timestamp."""
+    conn = connect()
+    _ensure_conversation_schema(conn)
+    return dict(conn.execute("SELECT session_id, timestamp FROM conversation_sessions ORDER BY rowid"))
+
+
+def replace_sessions(conversations: List[Dict[str, Any]]):
+    """Replace every stored conversation with the given ones."""
+    conn = connect()
+    _ensure_conversation_schema(conn)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DELETE FROM conversation_messages")
+        conn.execute("DELETE FROM conversation_sessions")
+        for conv in conversations:
+            session_id = conv["session_id"]
+            conn.execute(
+                "INSERT INTO conversation_sessions (session_id, timestamp) VALUES (?, ?)",
+                (session_id, conv.get("timestamp")),
+            )
+            conn.executemany(
+                "INSERT INTO conversation_messages (session_id, created_at, data) VALUES (?, ?, ?)",
+                [(session_id, m.get("created_at"), json.dumps(m, ensure_ascii=False)) for m in conv.get("messages", [])],
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
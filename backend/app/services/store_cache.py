@@ -0,0 +1,75 @@
+"""
+This module keeps the materialized store collections in memory between reads.
+
+Responsibilities:
+- Cache the parsed content of each store file, tagged with the on-disk version it was built from.
+- Treat an entry as stale as soon as one of its files changes on disk (inode, mtime or size),
+  so writes made by another process are picked up on the next read.
+- Hand out deep copies so callers can freely mutate what they read.
+"""
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+Version = Tuple[Optional[Tuple[int, int, int]], ...]
+
+_entries: Dict[Path, Tuple[Version, Any]] = {}
+_entries_lock = threading.Lock()
+
+stats = {"hits": 0, "misses": 0}
+
+
+def _stat(path: Path) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def file_version(*paths: Path) -> Version:
+    """On-disk version of a set of files. Capture it *before* reading them."""
+    return tuple(_stat(p) for p in paths)
+
+
+def get(key: Path, version: Version) -> Optional[Any]:
+    """Return the cached (uncopied) value if it was built from `version`, else None."""
+    with _entries_lock:
+        entry = _entries.get(key)
+        if entry is not None and entry[0] == version:
+            stats["hits"] += 1
+            return entry[1]
+        stats["misses"] += 1
+        return None
+
+
+def peek(key: Path) -> Optional[Any]:
+    """Return the cached value whatever its version (used while this process has unflushed writes)."""
+    with _entries_lock:
+        entry = _entries.get(key)
+        return entry[1] if entry is not None else None
+
+
+def put(key: Path, version: Version, value: Any):
+    with _entries_lock:
+        _entries[key] = (version, value)
+
+
+def invalidate(key: Path):
+    with _entries_lock:
+        _entries.pop(key, None)
+
+
+def clear():
+    with _entries_lock:
+        _entries.clear()
+
+
+def clone(value: Any) -> Any:
+    """Deep copy of JSON data (dicts, lists and scalars), much cheaper than copy.deepcopy."""
+    if isinstance(value, dict):
+        return {k: clone(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [clone(v) for v in value]
+    return value
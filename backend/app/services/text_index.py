@@ -0,0 +1,187 @@
+"""
+This module implements a small in-memory full-text search engine.
+
+Responsibilities:
+- Normalize text into search terms: lowercase, accents removed, French and English stopwords
+  dropped, and a light suffix-stripping stemmer shared by both languages.
+- Maintain an inverted index (term -> documents and term frequencies) updated incrementally
+  as documents are added or removed.
+- Rank documents with BM25, scoring all the postings of a query term at once with NumPy,
+  optionally restricted to a time range (documents may carry a timestamp).
+- Cut a snippet of a matching text around its first matching word.
+"""
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be been but by did do does for from had has have he her hers him his how i if in into
+is it its me my myself no not of on or our she so than that the their them then there these they this
+those to too us was we were what when where which who why will with you your
+au aux avec ce ces cet cette dans de des du elle elles en est et etaient etait ete eu il ils je la le les
+leur leurs lui ma mais me mes moi mon ne ni nos notre nous on ont ou par pas pour qu que qui sa se ses
+son sont sur ta te tes toi ton tu un une vos votre vous y
+""".split())
+
+# Suffix -> replacement, tried longest first. One list for both languages: indexing and queries go
+# through the same stemmer, so "dogs"/"dog" and "chiens"/"chien" meet even if the stems are not words.
+_SUFFIXES = sorted({
+    "issements": "", "issement": "", "ements": "", "ement": "", "ments": "", "ment": "",
+    "ations": "", "ation": "", "atrices": "", "atrice": "", "ateurs": "", "ateur": "",
+    "ances": "", "ance": "", "ences": "", "ence": "", "ismes": "", "isme": "", "istes": "", "iste": "",
+    "ables": "", "able": "", "euses": "", "euse": "", "eux": "", "aux": "al", "ives": "", "ive": "",
+    "ities": "", "ity": "", "ingly": "", "ings": "", "ing": "", "edly": "", "ness": "",
+    "ages": "", "age": "", "ies": "i", "ied": "i", "ers": "", "er": "", "ed": "", "es": "", "ly": "",
+    "s": "", "e": "", "y": "i",
+}.items(), key=lambda item: -len(item[0]))
+
+MIN_STEM = 3
+
+
+def _fold(text: str) -> str:
+    """Lowercase and strip accents (é -> e, ç -> c)."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def stem(word: str) -> str:
+    for suffix, replacement in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            return word[: len(word) - len(suffix)] + replacement
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Search terms of a text, in order (repeated terms are kept: they make the term frequency)."""
+    return [stem(w) for w in _TOKEN.findall(_fold(text or "")) if w not in STOPWORDS]
+
+
+class InvertedIndex:
+    """
+    BM25 index over documents identified by string ids. Not thread-safe: callers serialize access.
+    Removed documents leave an empty slot behind; rebuild the index to reclaim them.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._ids: List[Optional[str]] = []
+        self._slots: Dict[str, int] = {}
+        self._terms: List[Counter] = []
+        self._lengths = np.zeros(16, dtype=np.float64)
+        self._times = np.full(16, np.nan)
+        self._total_length = 0
+        self._postings: Dict[str, Dict[int, int]] = {}
+        # Postings of a term as (slots, term frequencies) arrays, built on first use after a change
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._slots
+
+    def add(self, doc_id: str, text: str, timestamp: float = math.nan):
+        """Index a document (replacing any previous version of it). `timestamp` is in epoch seconds."""
+        if doc_id in self._slots:
+            self.remove(doc_id)
+        terms = Counter(tokenize(text))
+        slot = len(self._ids)
+        if slot == len(self._lengths):
+            self._lengths = np.concatenate([self._lengths, np.zeros(len(self._lengths), dtype=np.float64)])
+            self._times = np.concatenate([self._times, np.full(len(self._times), np.nan)])
+        self._ids.append(doc_id)
+        self._terms.append(terms)
+        self._slots[doc_id] = slot
+        length = sum(terms.values())
+        self._lengths[slot] = length
+        self._times[slot] = timestamp
+        self._total_length += length
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[slot] = tf
+            self._arrays.pop(term, None)
+
+    def remove(self, doc_id: str) -> bool:
+        slot = self._slots.pop(doc_id, None)
+        if slot is None:
+            return False
+        for term in self._terms[slot]:
+            postings = self._postings[term]
+            del postings[slot]
+            if not postings:
+                del self._postings[term]
+            self._arrays.pop(term, None)
+        self._total_length -= int(self._lengths[slot])
+        self._ids[slot] = None
+        self._terms[slot] = Counter()
+        self._lengths[slot] = 0
+        return True
+
+    def _term_arrays(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            postings = self._postings.get(term)
+            if not postings:
+                return None
+            arrays = self._arrays[term] = (
+                np.fromiter(postings.keys(), dtype=np.int64, count=len(postings)),
+                np.fromiter(postings.values(), dtype=np.float64, count=len(postings)),
+            )
+        return arrays
+
+    def search(
+        self, query: str, limit: int = 5, since: Optional[float] = None, until: Optional[float] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Best matching (doc_id, score) pairs, highest score first. Documents sharing no term are left out,
+        and so are documents outside [since, until) (epoch seconds) when a bound is given.
+        """
+        count = len(self._slots)
+        if not count or limit <= 0:
+            return []
+        avg_length = max(self._total_length / count, 1.0)
+        scores = np.zeros(len(self._ids), dtype=np.float64)
+        for term in set(tokenize(query)):
+            arrays = self._term_arrays(term)
+            if arrays is None:
+                continue
+            slots, tf = arrays
+            df = len(slots)
+            idf = math.log(1.0 + (count - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * self._lengths[slots] / avg_length)
+            scores[slots] += idf * tf * (self.k1 + 1.0) / (tf + norm)
+
+        times = self._times[: len(self._ids)]
+        if since is not None:
+            scores[~(times >= since)] = 0.0
+        if until is not None:
+            scores[~(times < until)] = 0.0
+        hits = np.flatnonzero(scores)
+        if len(hits) > limit:
+            hits = hits[np.argpartition(-scores[hits], limit - 1)[:limit]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(self._ids[slot], float(scores[slot])) for slot in hits]
+
+
+def snippet(text: str, query: str, width: int = 24) -> str:
+    """About `width` words of `text` around the first word matching the query."""
+    words = (text or "").split()
+    terms = set(tokenize(query))
+    first = next((i for i, word in enumerate(words) if terms.intersection(tokenize(word))), 0)
+    start = max(0, min(first - width // 3, len(words) - width))
+    end = start + width
+    return ("… " if start else "") + " ".join(words[start:end]) + (" …" if end < len(words) else "")
+
+
+def build(documents: Iterable[Tuple[str, str]]) -> InvertedIndex:
+    """Index (doc_id, text) pairs in one go."""
+    index = InvertedIndex()
+    for doc_id, text in documents:
+        index.add(doc_id, text)
+    return index
@@ -0,0 +1,137 @@
+"""
+This module provides full-text search over the conversation transcripts.
+
+Responsibilities:
+- Keep one in-memory ranked index (see text_index) of every conversation message, keyed by
+  session and position, with its timestamp (the session's for legacy messages without one)
+  so searches can be restricted to a time range.
+- Index each message as soon as append_to_conversation stores it in this process.
+- Pick up messages written elsewhere (another worker, a transcript import) by comparing
+  the message count of each session, at most every SYNC_INTERVAL_S seconds.
+- Return ranked snippets for the caregiver API and the agent's search tool.
+"""
+import math
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from app.services import archive_service, json_store_service, text_index
+
+# Minimum time between two scans for messages written outside this process
+SYNC_INTERVAL_S = 10.0
+
+_lock = threading.Lock()
+_index = text_index.InvertedIndex()
+_messages: Dict[str, Dict[str, Any]] = {}
+_session_docs: Dict[str, Set[str]] = {}
+# Messages of each session read back from the store (appends notified in-process are not counted)
+_synced_counts: Dict[str, int] = {}
+_last_sync: Optional[float] = None
+
+
+def _doc_id(session_id: str, position: int) -> str:
+    # Identity of a message, whichever way it reaches the index (notification or scan)
+    return f"{session_id}|{position}"
+
+
+def _epoch(timestamp: Any) -> float:
+    parsed = archive_service.parse_timestamp(timestamp)
+    return parsed.timestamp() if parsed else math.nan
+
+
+def _add(session_id: str, position: int, message: Dict[str, Any], session_time: float = math.nan):
+    if not message.get("content"):
+        return
+    doc_id = _doc_id(session_id, position)
+    timestamp = _epoch(message.get("created_at"))
+    _messages[doc_id] = {"session_id": session_id, **message}
+    _session_docs.setdefault(session_id, set()).add(doc_id)
+    _index.add(doc_id, message["content"], timestamp=session_time if math.isnan(timestamp) else timestamp)
+
+
+def _drop_session(session_id: str):
+    for doc_id in _session_docs.pop(session_id, ()):
+        _index.remove(doc_id)
+        _messages.pop(doc_id, None)
+    _synced_counts.pop(session_id, None)
+
+
+def _on_append(session_id: str, message: Dict[str, Any], position: int):
+    with _lock:
+        if _last_sync is not None:
+            _add(session_id, position, message)
+
+
+def _sync(force: bool = False):
+    """Index the messages the store has and the index does not. Call with _lock held."""
+    global _last_sync
+    now = time.monotonic()
+    if not force and _last_sync is not None and now - _last_sync < SYNC_INTERVAL_S:
+        return
+    counts = json_store_service.conversation_message_counts()
+    for session_id in set(_synced_counts) - set(counts):
+        _drop_session(session_id)
+    for session_id, count in counts.items():
+        synced = _synced_counts.get(session_id, 0)
+        if count == synced:
+            continue
+        if count < synced:
+            # The session was rewritten: index it again from scratch
+            _drop_session(session_id)
+            synced = 0
+        conversation = json_store_service.get_conversation(session_id) or {"messages": []}
+        session_time = _epoch(conversation.get("timestamp"))
+        # Messages already indexed from a notification are replaced, not duplicated
+        for position in range(synced, len(conversation["messages"])):
+            _add(session_id, position, conversation["messages"][position], session_time)
+        _synced_counts[session_id] = len(conversation["messages"])
+    if _last_sync is None:
+        print(f"[TRANSCRIPTS] Indexed {len(_index)} messages from {len(counts)} session(s)")
+    _last_sync = now
+
+
+def search(
+    query: str, limit: int = 10, since: Optional[datetime] = None, until: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Best matching messages, highest score first, each as
+    {"session_id", "role", "created_at", "snippet", "score"}.
+    """
+    with _lock:
+        _sync()
+        hits = _index.search(
+            query, limit,
+            since=since.timestamp() if since else None,
+            until=until.timestamp() if until else None,
+        )
+        return [
+            {
+                "session_id": _messages[doc_id]["session_id"],
+                "role": _messages[doc_id].get("role"),
+                "created_at": _messages[doc_id].get("created_at"),
+                "snippet": text_index.snippet(_messages[doc_id]["content"], query),
+                "score": round(score, 4),
+            }
+            for doc_id, score in hits
+        ]
+
+
+def refresh():
+    """Scan the store for new messages now (instead of waiting for SYNC_INTERVAL_S)."""
+    with _lock:
+        _sync(force=True)
+
+
+def reset():
+    """Forget the index; it is rebuilt on the next search."""
+    global _index, _last_sync
+    with _lock:
+        _index = text_index.InvertedIndex()
+        _messages.clear()
+        _session_docs.clear()
+        _synced_counts.clear()
+        _last_sync = None
+
+
+json_store_service.add_conversation_listener(_on_append)
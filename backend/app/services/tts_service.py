@@ -6,6 +6,7 @@ from fastapi import HTTPException
 _ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY", "")
 _ELEVENLABS_VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID", "21m00Tcm4TlvDq8ikWAM")
 _ELEVENLABS_MODEL_ID = os.getenv("ELEVENLABS_MODEL_ID", "eleven_turbo_v2")
+_ELEVENLABS_API_URL = os.getenv("ELEVENLABS_API_URL", "https://api.elevenlabs.io").rstrip("/")
 _ELEVENLABS_TIMEOUT = 30.0
 
 async def generate_tts_audio(text: str) -> bytes:
@@ -22,7 +23,7 @@ async def generate_tts_audio(text: str) -> bytes:
     if len(text) > 5000:
         raise ValueError(f"'text' exceeds 5000-character ElevenLabs limit ({len(text)} chars).")
 
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{_ELEVENLABS_VOICE_ID}"
+    url = f"{_ELEVENLABS_API_URL}/v1/text-to-speech/{_ELEVENLABS_VOICE_ID}"
 
     try:
         async with httpx.AsyncClient(timeout=_ELEVENLABS_TIMEOUT) as client:
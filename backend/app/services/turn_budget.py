@@ -0,0 +1,84 @@
+"""
+This module bounds the time and work spent on one agent turn.
+
+Responsibilities:
+- Carry the deadline of the current turn in a context variable, so it follows the turn into
+  LLM round-trips, tool calls and the worker threads running blocking tools.
+- Give every blocking step the timeout it may use: its own cap, cut down to what is left of the turn.
+- Count tool rounds against AGENT_MAX_TOOL_ROUNDS.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from app.core import config
+
+
+class BudgetExceeded(Exception):
+    """Raised when a turn runs out of time or tool rounds."""
+
+
+class TurnBudget:
+    def __init__(self, deadline_s: float, max_tool_rounds: int):
+        self.deadline = time.monotonic() + deadline_s if deadline_s > 0 else None
+        self.max_tool_rounds = max_tool_rounds
+        self.tool_rounds = 0
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline (None when the turn has no deadline)."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def start_tool_round(self):
+        if self.max_tool_rounds and self.tool_rounds >= self.max_tool_rounds:
+            raise BudgetExceeded(f"tool round limit reached ({self.max_tool_rounds})")
+        self.tool_rounds += 1
+
+
+_current: contextvars.ContextVar[Optional[TurnBudget]] = contextvars.ContextVar("turn_budget", default=None)
+
+
+def new(deadline_s: Optional[float] = None, max_tool_rounds: Optional[int] = None) -> TurnBudget:
+    """Budget of a turn starting now (AGENT_TURN_DEADLINE_S / AGENT_MAX_TOOL_ROUNDS by default)."""
+    return TurnBudget(
+        config.AGENT_TURN_DEADLINE_S if deadline_s is None else deadline_s,
+        config.AGENT_MAX_TOOL_ROUNDS if max_tool_rounds is None else max_tool_rounds,
+    )
+
+
+@contextmanager
+def active(budget: TurnBudget) -> Iterator[TurnBudget]:
+    """
+    Make `budget` the current turn's budget within the block. Created when the request arrives
+    and activated where the turn runs, it also counts the time spent queued behind other turns.
+    """
+    token = _current.set(budget)
+    try:
+        yield budget
+    finally:
+        _current.reset(token)
+
+
+def current() -> Optional[TurnBudget]:
+    return _current.get()
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current turn, or None outside a turn / without deadline."""
+    budget = _current.get()
+    return budget.remaining() if budget else None
+
+
+def timeout(cap: Optional[float] = None) -> Optional[float]:
+    """
+    Timeout for one blocking step: `cap` cut down to what is left of the current turn.
+    Raises BudgetExceeded if the turn's deadline has already passed.
+    """
+    left = remaining()
+    if left is not None and left <= 0:
+        raise BudgetExceeded("turn deadline exceeded")
+    if left is None:
+        return cap
+    return left if cap is None else min(cap, left)
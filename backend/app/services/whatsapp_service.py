@@ -7,6 +7,9 @@ Responsibilities:
 """
 import httpx
 from app.core.config import WAPICLOUD_URL, WAPICLOUD_TOKEN
+from app.services import turn_budget
+
+_WHAPI_TIMEOUT_S = 10.0
 
 
 def _normalize_phone(phone: str) -> str:
@@ -42,7 +45,8 @@ def send_whatsapp_message(phone: str, message: str) -> bool:
     payload = {"to": to, "body": message}
 
     try:
-        with httpx.Client(timeout=10.0) as client:
+        # Within an agent turn, never wait past the turn's deadline
+        with httpx.Client(timeout=turn_budget.timeout(_WHAPI_TIMEOUT_S)) as client:
             resp = client.post(url, json=payload, headers=headers)
             if resp.status_code in (200, 201):
                 return True
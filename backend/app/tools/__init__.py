@@ -4,20 +4,129 @@ Tool registry for the CareLoop agent.
 To add a new tool to the main agent:
   1. Create a .py file in this directory
   2. Decorate the tool function with @register_tool
+     (or @register_tool(writes=[...]) if it modifies a store collection or another shared resource,
+     and timeout=... if it needs a different time limit than AGENT_TOOL_TIMEOUT_S)
 
 Tools NOT decorated are excluded from the main agent (e.g. onboarding-only tools).
+
+Read-only tools whose result only depends on their arguments for a while can also be
+decorated with @memoize(ttl_s=...) (below @register_tool): repeated calls with the same
+arguments are then answered from memory until the entry expires.
 """
-from typing import Callable, List
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional
 
 _REGISTRY: List[Callable] = []
+_MEMOIZED: Dict[str, Callable] = {}
+
+
+def register_tool(fn: Optional[Callable] = None, *, writes: Iterable[str] = (), timeout: Optional[float] = None):
+    """
+    Decorator — registers a function as an agent tool.
+    `writes` names the store collections (or other shared resources, e.g. "whatsapp") the tool modifies:
+    calls made in the same agent turn run in parallel, except those writing a common resource,
+    which run one after another in the order the LLM issued them.
+    `timeout` (seconds) overrides AGENT_TOOL_TIMEOUT_S for this tool; it is always cut down
+    to what is left of the turn's deadline.
+    """
+    def decorator(f: Callable) -> Callable:
+        f.tool_writes = frozenset(writes)
+        f.tool_timeout = timeout
+        _REGISTRY.append(f)
+        return f
+    return decorator(fn) if fn is not None else decorator
+
+
+def tool_writes(fn: Callable) -> FrozenSet[str]:
+    """Resources written by a tool (empty for read-only tools)."""
+    return getattr(fn, "tool_writes", frozenset())
 
 
-def register_tool(fn: Callable) -> Callable:
-    """Decorator — registers a function as an agent tool."""
-    _REGISTRY.append(fn)
-    return fn
+def tool_timeout(fn: Callable) -> Optional[float]:
+    """Time limit declared by a tool (None: use AGENT_TOOL_TIMEOUT_S)."""
+    return getattr(fn, "tool_timeout", None)
 
 
 def get_registered_tools() -> List[Callable]:
     """Return all tools registered for the main agent."""
     return list(_REGISTRY)
+
+
+def _cacheable(result: Any) -> bool:
+    """Failures are not memoized: the next call tries again."""
+    return not (isinstance(result, dict) and (result.get("error") or result.get("status") == "error"))
+
+
+def _copy(value: Any) -> Any:
+    """Deep copy of a JSON-like result, so callers cannot alter the cached one."""
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+def memoize(ttl_s: float, max_entries: int = 128, cache_if: Callable[[Any], bool] = _cacheable):
+    """
+    Decorator — memoizes a synchronous, read-only tool.
+    Results are keyed by the call's arguments (defaults applied), kept for `ttl_s` seconds,
+    and the least recently used entries are evicted beyond `max_entries`.
+    Results rejected by `cache_if` (errors by default) are not kept.
+    The wrapper keeps the tool's name, docstring and signature, which the LLM declaration is built from.
+    """
+    def decorator(fn: Callable) -> Callable:
+        signature = inspect.signature(fn)
+        entries: "OrderedDict[str, tuple]" = OrderedDict()
+        lock = threading.Lock()
+        stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = json.dumps(bound.arguments, sort_keys=True, default=str)
+            now = time.monotonic()
+            with lock:
+                entry = entries.get(key)
+                if entry is not None and entry[0] > now:
+                    entries.move_to_end(key)
+                    stats["hits"] += 1
+                    return _copy(entry[1])
+                if entry is not None:
+                    del entries[key]
+                    stats["expired"] += 1
+                stats["misses"] += 1
+
+            result = fn(*args, **kwargs)
+            if cache_if(result):
+                with lock:
+                    entries[key] = (time.monotonic() + ttl_s, _copy(result))
+                    entries.move_to_end(key)
+                    while len(entries) > max_entries:
+                        entries.popitem(last=False)
+                        stats["evicted"] += 1
+            return result
+
+        def cache_info() -> Dict[str, Any]:
+            with lock:
+                return {"ttl_s": ttl_s, "max_entries": max_entries, "entries": len(entries), **stats}
+
+        def cache_clear():
+            with lock:
+                entries.clear()
+
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+        _MEMOIZED[fn.__name__] = wrapper
+        return wrapper
+    return decorator
+
+
+def memo_stats() -> Dict[str, Dict[str, Any]]:
+    """Hit/miss/eviction counters of every memoized tool."""
+    return {name: fn.cache_info() for name, fn in _MEMOIZED.items()}
@@ -8,9 +8,11 @@ Responsibilities:
 from typing import Dict, Any
 from datetime import datetime
 import locale
-from app.tools import register_tool
+from app.tools import memoize, register_tool
 
 @register_tool
+# Answers are to the minute: reusing one for a few seconds is harmless
+@memoize(ttl_s=5)
 def get_temporal_context() -> Dict[str, Any]:
     """
     Returns the current date, time, and day of the week.
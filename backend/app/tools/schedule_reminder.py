@@ -11,7 +11,7 @@ from datetime import datetime
 from app.services import json_store_service
 from app.tools import register_tool
 
-@register_tool
+@register_tool(writes=["calendar_items"])
 def schedule_reminder(title: str, time: str, repeat: str = "daily") -> Dict[str, Any]:
     """
     Add a new reminder to the JSON database from text parameters.
@@ -27,9 +27,6 @@ def schedule_reminder(title: str, time: str, repeat: str = "daily") -> Dict[str,
         "created_at": datetime.utcnow().isoformat() + "Z"
     }
 
-    with json_store_service.lock:
-        items = json_store_service.get_calendar_items()
-        items.append(new_item)
-        json_store_service.save_calendar_items(items)
+    json_store_service.append_calendar_item(new_item)
 
     return {"status": "success", "reminder": new_item}
@@ -0,0 +1,34 @@
+"""
+Tool definition to search past conversations with the patient.
+
+Responsibilities:
+- Let the LLM recall what was said in earlier sessions (by the patient or by itself),
+  through the same transcript index as the caregiver search API.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any
+from app.services import transcript_search_service
+from app.tools import register_tool
+
+@register_tool
+def search_past_conversations(keywords: str, days_back: int = 30) -> Dict[str, Any]:
+    """
+    Search earlier conversations with the patient for what was said about a topic
+    (e.g. "granddaughter wedding", "knee pain", "garden roses").
+    Use this when the patient refers to something discussed before, or to follow up on it.
+
+    Args:
+        keywords: Words to look for in past messages.
+        days_back: How many days back to search (default 30).
+    """
+    since = datetime.now(timezone.utc) - timedelta(days=max(1, days_back))
+    hits = transcript_search_service.search(keywords, limit=5, since=since)
+    if not hits:
+        return {"status": "not_found", "message": "Nothing about this was found in recent conversations."}
+    return {
+        "status": "success",
+        "excerpts": [
+            {"when": h["created_at"], "speaker": "patient" if h["role"] == "user" else "assistant", "text": h["snippet"]}
+            for h in hits
+        ],
+    }
@@ -2,12 +2,18 @@
 Tool definition to query family history to reassure the patient.
 
 Responsibilities:
-- Provide the LLM with safe access to the pre-filled life history of the patient.
+- Provide the LLM with safe access to the life history of the patient: the memories written
+  by caregivers (ranked full-text search, see family_memory_service), or a built-in demo
+  set while the patient has none.
 """
 from typing import Dict, Any
+from app.services import family_memory_service, text_index
 from app.tools import register_tool
 
-# Mock database - en production on utiliserait json_store_service avec family_history.json
+# Single-patient setup: the agent's care receiver (as in schedule_reminder)
+CARE_RECEIVER_ID = "default"
+
+# Demo memories, used until caregivers have written some for the patient
 FAMILY_MEMORY_DB = {
     "animals": "When I was young, I had a wonderful dog named Buddy. He followed me everywhere.",
     "children": "My daughter is called Sarah, she comes to visit most weekends. My son is called Paul, he lives nearby.",
@@ -15,18 +21,24 @@ FAMILY_MEMORY_DB = {
     "job": "I was a primary school teacher my whole career. I loved teaching mathematics to the children.",
     "home": "I have lived in this house for over 20 years. I especially love tending to the rose bushes in the garden."
 }
+_DEMO_INDEX = text_index.build((key, f"{key} {text}") for key, text in FAMILY_MEMORY_DB.items())
 
 @register_tool
 def search_family_history(keyword: str) -> Dict[str, Any]:
     """
-    Search for a memory or personal detail about the patient's past (e.g. keywords: animals, children, marriage, job, home).
+    Search for a memory or personal detail about the patient's past (e.g. keywords: animals, children, marriage, job, home,
+    or any words such as "dog", "wedding", "school", "garden").
     Use this to reassure the patient if they have a memory gap or feel anxious about their past.
     """
-    keyword = keyword.lower()
-    for key, memory_text in FAMILY_MEMORY_DB.items():
-        if key in keyword or keyword in key:
-            return {"status": "success", "memory": memory_text}
-            
+    if family_memory_service.has_memories(CARE_RECEIVER_ID):
+        hits = family_memory_service.search_memories(CARE_RECEIVER_ID, keyword, limit=3)
+        memories = [h["text"] if not h.get("title") else f"{h['title']}: {h['text']}" for h in hits]
+    else:
+        memories = [FAMILY_MEMORY_DB[key] for key, _ in _DEMO_INDEX.search(keyword, limit=1)]
+
+    if memories:
+        return {"status": "success", "memory": memories[0], "other_memories": memories[1:]}
+
     return {
         "status": "not_found", 
         "message": "Je n'ai pas trouvé d'information précise à ce sujet dans mon dossier mémoire, mais voulez-vous m'en parler ?"
@@ -32,7 +32,7 @@ def _fuzzy_match_recipient(recipient_name: str, caregivers: list) -> Optional[Di
     return None
 
 
-@register_tool
+@register_tool(writes=["whatsapp"], timeout=12)
 def send_whatsapp_message(recipient_name: str, message_content: str) -> Dict[str, Any]:
     """
     Send a WhatsApp message to the specified contact.
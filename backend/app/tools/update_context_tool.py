@@ -20,7 +20,7 @@ def update_patient_context(
     Sauvegarde ou met à jour les informations de base du patient dans le dossier médical (patient_context.json).
     Appelle cet outil dès que tu as obtenu une nouvelle information qualifiée de la part du patient.
     """
-    with json_store_service.lock:
+    with json_store_service.transaction(write=["patient_context"]):
         context = json_store_service.get_patient_context()
         
         if name is not None:
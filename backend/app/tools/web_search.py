@@ -6,9 +6,14 @@ Responsibilities:
 """
 import logging
 from duckduckgo_search import DDGS
-from app.tools import register_tool
+from app.services import turn_budget
+from app.tools import memoize, register_tool
 
-@register_tool
+# DuckDuckGo gets this long per request, or less if the agent turn is about to run out of time
+_SEARCH_TIMEOUT_S = 6
+
+@register_tool(timeout=_SEARCH_TIMEOUT_S + 1)
+@memoize(ttl_s=15 * 60, cache_if=lambda result: not result.startswith("The search failed"))
 def search_web(query: str, max_results: int = 3) -> str:
     """
     Search the internet for positive news, sports results, or context on a discussion topic
@@ -19,7 +24,8 @@ def search_web(query: str, max_results: int = 3) -> str:
         max_results: The maximum number of results to retrieve.
     """
     try:
-        results = list(DDGS().text(query, max_results=max_results))
+        timeout = max(1, int(turn_budget.timeout(_SEARCH_TIMEOUT_S)))
+        results = list(DDGS(timeout=timeout).text(query, max_results=max_results))
 
         if not results:
             return "No results found for this search."
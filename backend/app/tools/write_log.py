@@ -11,7 +11,7 @@ from typing import Dict, Any, Optional
 from app.services import json_store_service
 from app.tools import register_tool
 
-@register_tool
+@register_tool(writes=["health_logs"])
 def write_health_log(mood: str, medication_taken: bool, notes: Optional[str] = "", category: str = "GENERAL") -> Dict[str, Any]:
     """
     Save the patient's mood and perceived health status to their daily health log.
@@ -27,9 +27,6 @@ def write_health_log(mood: str, medication_taken: bool, notes: Optional[str] = "
         "category": category
     }
 
-    with json_store_service.lock:
-        logs = json_store_service.get_health_logs()
-        logs.append(new_log)
-        json_store_service.save_health_logs(logs)
+    json_store_service.append_health_log(new_log)
 
     return {"status": "success", "log": new_log}
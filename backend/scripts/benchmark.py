@@ -0,0 +1,349 @@
+"""
+Load and latency benchmark of the backend API, run offline against local stand-ins.
+
+Responsibilities:
+- Drive the kiosk and dashboard endpoints (chat messages, device next-actions, reminders CRUD,
+  care events, speech-to-text) in-process, with a configurable number of concurrent clients.
+- Replace the external providers with local stand-ins: the scripted LLM stub (llm_stub) for
+  Gemini, and a local HTTP server answering like ElevenLabs and Whisper after a fixed latency.
+- Work on a copy of app/data in a temporary directory, so the real data is never touched.
+- Report p50/p95/p99 latency and throughput per operation, save them as a baseline, and compare
+  later runs against it (exit code 1 when an operation regressed beyond the tolerance).
+
+Usage (from backend/):
+    python scripts/benchmark.py --save-baseline          # record the reference numbers
+    python scripts/benchmark.py                          # compare against them
+    python scripts/benchmark.py -c 32 -n 500 --scenarios reminders,events
+"""
+import argparse
+import asyncio
+import json
+import math
+import platform
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from unittest import mock
+
+# Add the project root to PYTHONPATH so we can run this directly
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request, Response
+
+from app.core import constants
+
+DEFAULT_BASELINE = project_root / "benchmarks" / "baseline.json"
+
+CHAT_PROMPTS = [
+    "Hello, how are you today?",
+    "What day is it today?",
+    "Do you remember my daughter?",
+    "I feel a bit tired this afternoon.",
+]
+
+
+# --- Local stand-ins for ElevenLabs and Whisper ---
+
+def _standin_app(tts_latency_s: float, stt_latency_s: float) -> FastAPI:
+    standins = FastAPI()
+
+    @standins.post("/v1/text-to-speech/{voice_id}")
+    async def text_to_speech(voice_id: str, request: Request):
+        payload = await request.json()
+        await asyncio.sleep(tts_latency_s)
+        # Roughly the size of an MP3 of the text (~1 KB per 10 characters)
+        return Response(content=b"\xff\xfb" * (50 * len(payload.get("text", ""))), media_type="audio/mpeg")
+
+    @standins.post("/v1/audio/transcriptions")
+    async def transcribe(request: Request):
+        await request.body()
+        await asyncio.sleep(stt_latency_s)
+        return {"text": "What day is it today?"}
+
+    return standins
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def _standin_server(tts_latency_s: float, stt_latency_s: float) -> Iterator[str]:
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(
+        _standin_app(tts_latency_s, stt_latency_s), host="127.0.0.1", port=port, log_level="warning",
+    ))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("The stand-in server failed to start")
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+
+@contextmanager
+def local_environment(llm_latency_s: float, tts_latency_s: float, stt_latency_s: float) -> Iterator[Path]:
+    """
+    Point the backend at a temporary copy of app/data and at the local stand-ins, and restore
+    everything on exit. Yields the temporary directory.
+    """
+    from app.api import chat, voice
+    from app.services import agent_service, llm_service, llm_stub, session_cache, speech_pipeline, store_cache, tts_service
+
+    with ExitStack() as stack:
+        tmp = Path(stack.enter_context(tempfile.TemporaryDirectory(prefix="careloop-bench-")))
+        data_dir = tmp / "data"
+        shutil.copytree(constants.DATA_DIR, data_dir, ignore=shutil.ignore_patterns(".locks", "*.db*"))
+        # Same redirection as the tests' data_dir fixture
+        for name in dir(constants):
+            if name.endswith("_FILE") or (name.endswith("_DIR") and name not in ("BASE_DIR", "DATA_DIR")):
+                stack.enter_context(mock.patch.object(constants, name, data_dir / getattr(constants, name).name))
+        stack.enter_context(mock.patch.object(constants, "DATA_DIR", data_dir))
+        store_cache.clear()
+        stack.callback(store_cache.clear)
+
+        url = stack.enter_context(_standin_server(tts_latency_s, stt_latency_s))
+        patches = [
+            (llm_service, "client", llm_stub.StubClient(latency_s=llm_latency_s)),
+            (agent_service, "_active_chats", session_cache.create_default()),
+            (tts_service, "_ELEVENLABS_API_KEY", "benchmark"),
+            (tts_service, "_ELEVENLABS_API_URL", url),
+            (voice, "_OPENAI_API_KEY", "benchmark"),
+            (voice, "_OPENAI_API_URL", url),
+            (voice, "_ELEVENLABS_API_KEY", "benchmark"),
+            (voice, "_ELEVENLABS_API_URL", url),
+            # Synthesized replies go to the temporary directory, not app/static/audio
+            (chat, "BASE_DIR", tmp),
+            (speech_pipeline, "AUDIO_DIR", tmp / "app" / "static" / "audio"),
+        ]
+        for target, attribute, value in patches:
+            stack.enter_context(mock.patch.object(target, attribute, value))
+        yield tmp
+
+
+# --- Scenarios: one iteration each, timing its requests through `timed` ---
+
+Timed = Callable[..., Any]
+
+
+async def _chat_message(client: httpx.AsyncClient, timed: Timed, i: int):
+    # The kiosk has a single session: turns are serialized by its actor, and refused past the queue limit
+    response = await timed("chat_message", client.post("/api/chat/message", json={"message": CHAT_PROMPTS[i % len(CHAT_PROMPTS)]}),
+                           ok=lambda r: not r.json()["response"].startswith("Agent busy"))
+    return response
+
+
+async def _device_next_actions(client: httpx.AsyncClient, timed: Timed, i: int):
+    await timed("device_next_actions", client.get("/api/chat/device/next-actions"))
+
+
+async def _reminders(client: httpx.AsyncClient, timed: Timed, i: int):
+    created = await timed("reminder_create", client.post("/api/reminders", json={
+        "care_receiver_id": "bench", "type": "medication", "title": f"Pills {i}",
+        "message_text": "Take your pills", "scheduled_at": "2030-01-01T09:00:00Z",
+    }))
+    await timed("reminder_list", client.get("/api/reminders", params={"care_receiver_id": "bench"}))
+    if created.status_code != 200:
+        return
+    item_id = created.json()["id"]
+    await timed("reminder_update", client.patch(f"/api/reminders/{item_id}", json={"title": f"Pills {i} (updated)"}))
+    await timed("reminder_delete", client.delete(f"/api/reminders/{item_id}"))
+
+
+async def _health_events(client: httpx.AsyncClient, timed: Timed, i: int):
+    await timed("health_events", client.get("/api/health/events", params={"limit": 50}))
+
+
+async def _speech_to_text(client: httpx.AsyncClient, timed: Timed, i: int):
+    files = {"audio": ("clip.webm", b"\x1a\x45\xdf\xa3" * 4096, "audio/webm")}
+    await timed("stt_transcribe", client.post("/api/stt/transcribe", files=files))
+
+
+SCENARIOS: Dict[str, Callable] = {
+    "chat": _chat_message,
+    "device": _device_next_actions,
+    "reminders": _reminders,
+    "events": _health_events,
+    "stt": _speech_to_text,
+}
+
+
+# --- Measurement ---
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0..100) of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(samples: Dict[str, List[float]], errors: Dict[str, int], elapsed: Dict[str, float]) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for op, latencies in samples.items():
+        if not latencies:
+            continue
+        results[op] = {
+            "count": len(latencies),
+            "errors": errors.get(op, 0),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+            "throughput_rps": round(len(latencies) / elapsed[op], 2) if elapsed.get(op) else 0.0,
+        }
+    return results
+
+
+async def run_scenario(name: str, requests: int, concurrency: int) -> Dict[str, Dict[str, float]]:
+    """Run `requests` iterations of a scenario with `concurrency` clients and summarize its operations."""
+    from app.main import app
+
+    scenario = SCENARIOS[name]
+    samples: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+
+    async def timed(op: str, request, ok: Callable[[httpx.Response], bool] = lambda r: True) -> httpx.Response:
+        start = time.perf_counter()
+        response = await request
+        samples.setdefault(op, []).append(time.perf_counter() - start)
+        if response.status_code >= 400 or not ok(response):
+            errors[op] = errors.get(op, 0) + 1
+        return response
+
+    counter = iter(range(requests))
+
+    async def client_loop(client: httpx.AsyncClient):
+        for i in counter:
+            await scenario(client, timed, i)
+
+    # No lifespan: the scheduler stays off, only the requests are measured
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+    return summarize(samples, errors, {op: wall for op in samples})
+
+
+def run(
+    scenarios: List[str], requests: int, concurrency: int,
+    llm_latency_s: float, tts_latency_s: float, stt_latency_s: float,
+) -> Dict[str, Any]:
+    """Run the scenarios one after the other and return the report (meta + results per operation)."""
+    results: Dict[str, Dict[str, float]] = {}
+    with local_environment(llm_latency_s, tts_latency_s, stt_latency_s):
+        for name in scenarios:
+            print(f"[BENCH] {name}: {requests} iteration(s), {concurrency} concurrent client(s)...")
+            results.update(asyncio.run(run_scenario(name, requests, concurrency)))
+    return {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "scenarios": scenarios,
+            "requests": requests,
+            "concurrency": concurrency,
+            "llm_latency_ms": llm_latency_s * 1000,
+            "tts_latency_ms": tts_latency_s * 1000,
+            "stt_latency_ms": stt_latency_s * 1000,
+        },
+        "results": results,
+    }
+
+
+# --- Baseline ---
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions of `report` against `baseline`: p95/p99 slower, or throughput lower, by more than `tolerance`."""
+    regressions = []
+    for op, now in report["results"].items():
+        before = baseline["results"].get(op)
+        if before is None:
+            continue
+        for key in ("p95_ms", "p99_ms"):
+            if before[key] > 0 and now[key] > before[key] * (1 + tolerance):
+                regressions.append(f"{op}: {key} {before[key]} -> {now[key]}")
+        if before["throughput_rps"] > 0 and now["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{op}: throughput_rps {before['throughput_rps']} -> {now['throughput_rps']}")
+        if now["errors"] > before["errors"]:
+            regressions.append(f"{op}: errors {before['errors']} -> {now['errors']}")
+    return regressions
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    header = f"{'operation':<22}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}"
+    print(header)
+    print("-" * len(header))
+    for op, r in report["results"].items():
+        line = f"{op:<22}{r['count']:>7}{r['errors']:>8}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['throughput_rps']:>10}"
+        before = (baseline or {}).get("results", {}).get(op)
+        if before and before["p95_ms"] > 0:
+            line += f"   p95 {(r['p95_ms'] / before['p95_ms'] - 1) * 100:+.0f}%"
+        print(line)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="concurrent clients (default 8)")
+    parser.add_argument("-n", "--requests", type=int, default=100, help="iterations per scenario (default 100)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma-separated, among {', '.join(SCENARIOS)}")
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="stub LLM latency per round-trip")
+    parser.add_argument("--tts-latency-ms", type=float, default=200, help="ElevenLabs stand-in latency")
+    parser.add_argument("--stt-latency-ms", type=float, default=150, help="Whisper stand-in latency")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="baseline file (JSON)")
+    parser.add_argument("--save-baseline", action="store_true", help="save this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression ratio (default 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    report = run(
+        scenarios, args.requests, args.concurrency,
+        args.llm_latency_ms / 1000, args.tts_latency_ms / 1000, args.stt_latency_ms / 1000,
+    )
+    baseline = None
+    if not args.save_baseline and args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    print_report(report, baseline)
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if baseline is None:
+        print(f"No baseline at {args.baseline} (run with --save-baseline to create one)")
+        return 0
+
+    settings = ("requests", "concurrency", "llm_latency_ms", "tts_latency_ms", "stt_latency_ms")
+    if any(report["meta"][k] != baseline["meta"].get(k) for k in settings):
+        print("Warning: the baseline was recorded with different settings; the comparison is indicative only")
+    regressions = compare(report, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    print("Regressions found" if regressions else f"No regression beyond {args.tolerance:.0%} of the baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
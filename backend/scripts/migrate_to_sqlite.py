@@ -0,0 +1,29 @@
+"""
+Migration script from the JSON data files to the SQLite store.
+
+Responsibilities:
+- Import every collection of app/data (JSON snapshot + pending append-only log) into app/data/careloop.db.
+- Import the patient context document.
+Run it once, then start the backend with STORE_BACKEND=sqlite.
+"""
+import sys
+from pathlib import Path
+
+# Add the project root to PYTHONPATH so we can run this directly
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+from app.core import constants
+from app.services.json_store_service import migrate_json_to_sqlite
+
+
+def run_migration():
+    print(f"Importing {constants.DATA_DIR} into {constants.SQLITE_DB_FILE}...")
+    imported = migrate_json_to_sqlite()
+    for name, count in imported.items():
+        print(f" - {name}: {count} record(s)")
+    print("Migration complete. Set STORE_BACKEND=sqlite to use the database.")
+
+
+if __name__ == "__main__":
+    run_migration()
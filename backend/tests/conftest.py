@@ -0,0 +1,20 @@
+import pytest
+from app.core import config, constants
+from app.services import store_cache
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Point every store file to a temporary data directory."""
+    for name in dir(constants):
+        if name.endswith("_FILE") or (name.endswith("_DIR") and name not in ("BASE_DIR", "DATA_DIR")):
+            monkeypatch.setattr(constants, name, tmp_path / getattr(constants, name).name)
+    monkeypatch.setattr(constants, "DATA_DIR", tmp_path)
+    store_cache.clear()
+    return tmp_path
+
+
+@pytest.fixture
+def sqlite_backend(data_dir, monkeypatch):
+    monkeypatch.setattr(config, "STORE_BACKEND", "sqlite")
+    return data_dir
@@ -0,0 +1,517 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+from app.services import agent_service, json_store_service, session_actors, session_cache
+
+
+class FakeChat:
+    """Stands in for the Gemini async chat: one tool round, then a final answer."""
+
+    async def send_message(self, message):
+        await asyncio.sleep(0.2)
+        if isinstance(message, str):
+            return SimpleNamespace(function_calls=[SimpleNamespace(name="slow_tool", args={})], text=None)
+        return SimpleNamespace(function_calls=None, text="**Done**")
+
+
+def test_concurrent_turns_do_not_block_each_other(data_dir, monkeypatch):
+    def slow_tool():
+        time.sleep(0.2)  # a blocking tool must run off the event loop
+        return {"ok": True}
+
+    monkeypatch.setitem(agent_service.TOOL_MAP, "slow_tool", slow_tool)
+    chats = session_cache.SessionCache(max_sessions=10, idle_ttl_s=0, max_bytes=0)
+    chats.setdefault("s1", FakeChat())
+    chats.setdefault("s2", FakeChat())
+    monkeypatch.setattr(agent_service, "_active_chats", chats)
+
+    async def both():
+        return await asyncio.gather(
+            agent_service.process_user_message("s1", "hello"),
+            agent_service.process_user_message("s2", "bonjour"),
+        )
+
+    start = time.perf_counter()
+    assert asyncio.run(both()) == ["Done", "Done"]
+    # Each turn takes ~0.6s (two LLM calls + one tool); serialized turns would take ~1.2s
+    assert time.perf_counter() - start < 1.0
+    assert [m["role"] for m in json_store_service.get_conversation("s1")["messages"]] == ["user", "assistant"]
+
+
+def test_tool_calls_run_concurrently_except_conflicting_writes(monkeypatch):
+    order = []
+
+    def slow_read(n):
+        time.sleep(0.2)
+        return {"n": n}
+
+    def slow_write(n):
+        order.append(("start", n))
+        time.sleep(0.1)
+        order.append(("end", n))
+        return {"n": n}
+
+    slow_write.tool_writes = frozenset({"calendar_items"})
+    monkeypatch.setitem(agent_service.TOOL_MAP, "slow_read", slow_read)
+    monkeypatch.setitem(agent_service.TOOL_MAP, "slow_write", slow_write)
+
+    calls = [("slow_write", {"n": 1}), ("slow_read", {"n": 2}), ("slow_read", {"n": 3}), ("slow_write", {"n": 4})]
+    start = time.perf_counter()
+    results = asyncio.run(agent_service.run_tool_calls(calls))
+    assert time.perf_counter() - start < 0.35
+    assert results == [{"n": 1}, {"n": 2}, {"n": 3}, {"n": 4}]
+    assert order == [("start", 1), ("end", 1), ("start", 4), ("end", 4)]
+
+
+def test_environment_context_is_rebuilt_only_when_a_source_changes(data_dir):
+    from app.services import environment_context
+
+    json_store_service.save_caregivers([{"id": "cg-1", "name": "Sarah", "relation": "daughter"}])
+    first = environment_context.build()
+    rebuilds = environment_context.stats["rebuilds"]
+    assert environment_context.build().split("\n", 3)[3] == first.split("\n", 3)[3]
+    assert environment_context.stats["rebuilds"] == rebuilds
+
+    json_store_service.append_calendar_item({"id": "ci-1", "title": "Pills", "scheduled_at": "08:00", "status": "scheduled"})
+    assert "Pills scheduled at 08:00" in environment_context.build()
+    assert environment_context.stats["rebuilds"] == rebuilds + 1
+    assert "Sarah (daughter)" in first
+
+
+def test_session_cache_evicts_and_sessions_are_rehydrated(data_dir, monkeypatch):
+    from google.genai import types
+
+    class HistoryChat:
+        def __init__(self, history):
+            self.history = history
+
+        def get_history(self, curated=False):
+            return self.history
+
+    def chat_of(size):
+        return HistoryChat([types.Content(role="user", parts=[types.Part(text="x" * size)])])
+
+    cache = session_cache.SessionCache(max_sessions=2, idle_ttl_s=0, max_bytes=1000)
+    cache.setdefault("a", chat_of(100))
+    cache.setdefault("b", chat_of(100))
+    cache.get("a")
+    cache.setdefault("c", chat_of(100))
+    assert "b" not in cache and "a" in cache
+    cache.setdefault("d", chat_of(950))
+    assert len(cache) == 1 and cache.total_bytes() == 950
+    assert cache.stats["evicted_lru"] == 2 and cache.stats["evicted_memory"] == 1
+
+    # An evicted session is rebuilt with its persisted transcript
+    json_store_service.append_to_conversation("s1", "user", "My cat is called Felix")
+    json_store_service.append_to_conversation("s1", "assistant", "What a lovely name!")
+    created = {}
+    monkeypatch.setattr(agent_service, "_active_chats", session_cache.SessionCache(2, 0, 0))
+    monkeypatch.setattr(agent_service, "create_async_chat", lambda system, history: created.setdefault("history", history))
+    asyncio.run(agent_service._get_or_create_chat("s1"))
+    assert [(c.role, c.parts[0].text) for c in created["history"]] == [
+        ("user", "My cat is called Felix"), ("model", "What a lovely name!"),
+    ]
+    assert [h.content for h in agent_service.get_session_history("missing")] == []
+
+
+def test_history_is_windowed_summarized_and_stripped(monkeypatch):
+    from google.genai import types
+    from app.core import config
+    from app.services import history_manager
+
+    def turn(i):
+        return [
+            types.Content(role="user", parts=[types.Part(text=f"\n[REAL-TIME ENVIRONMENTAL CONTEXT]\nCurrent local time: x\n[END OF ENVIRONMENTAL CONTEXT]\n\nquestion {i}")]),
+            types.Content(role="model", parts=[types.Part(text=f"answer {i}")]),
+        ]
+
+    async def summarize(previous, dialogue):
+        return f"{previous}|{dialogue.count('Patient:')} turns"
+
+    monkeypatch.setattr(config, "AGENT_HISTORY_TURNS", 2)
+    monkeypatch.setattr(config, "AGENT_HISTORY_TOKEN_BUDGET", 0)
+    history = [c for i in range(5) for c in turn(i)]
+    compacted, changed = asyncio.run(history_manager.compact(history, summarize))
+    assert changed
+    texts = [c.parts[0].text for c in compacted]
+    assert texts[0] == f"{history_manager.SUMMARY_MARKER}\n|3 turns"
+    assert texts[2:] == ["question 3", "answer 3", "question 4", "answer 4"]
+
+    # The summary rolls over, and the token budget folds turns beyond the window
+    monkeypatch.setattr(config, "AGENT_HISTORY_TOKEN_BUDGET", 10)
+    compacted, _ = asyncio.run(history_manager.compact(compacted + turn(5), summarize))
+    assert compacted[0].parts[0].text.endswith("|3 turns|2 turns")
+    assert [c.parts[0].text for c in compacted[2:]] == ["question 5", "answer 5"]
+    assert asyncio.run(history_manager.compact(compacted, summarize)) == (compacted, False)
+
+
+class FakeStreamingChat:
+    """Streams a reply in small deltas, after one tool round."""
+
+    async def send_message_stream(self, message):
+        async def chunks():
+            if isinstance(message, str):
+                yield SimpleNamespace(function_calls=[SimpleNamespace(name="noop_tool", args={})], text=None)
+                return
+            for delta in ["Bonjour Marie, il fait ", "beau aujourd'hui. Voulez-vous ", "sortir **un peu** ? ", "Je peux appeler Paul."]:
+                await asyncio.sleep(0.05)
+                yield SimpleNamespace(function_calls=None, text=delta)
+        return chunks()
+
+
+def test_streamed_reply_is_spoken_sentence_by_sentence_in_order(data_dir, monkeypatch, tmp_path):
+    from app.services import speech_pipeline
+
+    monkeypatch.setitem(agent_service.TOOL_MAP, "noop_tool", lambda: {"ok": True})
+    chats = session_cache.SessionCache(max_sessions=10, idle_ttl_s=0, max_bytes=0)
+    chats.setdefault("s1", FakeStreamingChat())
+    monkeypatch.setattr(agent_service, "_active_chats", chats)
+    monkeypatch.setattr(speech_pipeline, "AUDIO_DIR", tmp_path)
+
+    async def fake_tts(text):
+        # The first sentence is the slowest to synthesize: audio must still come out in order
+        await asyncio.sleep(0.3 if text.startswith("Bonjour") else 0.01)
+        return text.encode()
+
+    async def run():
+        events = []
+        stream = agent_service.stream_user_message("s1", "salut")
+        async for event in speech_pipeline.speak_stream(stream, fake_tts, clean=agent_service.clean_for_speech):
+            events.append(event)
+        return events
+
+    events = asyncio.run(run())
+    audio = [e for e in events if e["type"] == "audio"]
+    assert [e["text"] for e in audio] == [
+        "Bonjour Marie, il fait beau aujourd'hui.",
+        "Voulez-vous sortir un peu ?",
+        "Je peux appeler Paul.",
+    ]
+    assert [e["index"] for e in audio] == [0, 1, 2]
+    assert (tmp_path / audio[0]["url"].rsplit("/", 1)[1]).read_bytes() == audio[0]["text"].encode()
+    # Text deltas are streamed before the (slow) first audio chunk is ready
+    assert events[0]["type"] == "text"
+    assert events[-1] == {"type": "done", "response": "Bonjour Marie, il fait beau aujourd'hui. Voulez-vous sortir un peu ? Je peux appeler Paul."}
+    assert json_store_service.get_conversation("s1")["messages"][-1]["content"] == events[-1]["response"]
+
+
+def test_turns_of_one_session_are_serialized_by_its_actor(data_dir, monkeypatch):
+    class ExclusiveChat:
+        active = False
+
+        async def send_message(self, message):
+            assert not self.active, "two turns used the same chat at once"
+            self.active = True
+            await asyncio.sleep(0.1)
+            self.active = False
+            return SimpleNamespace(function_calls=None, text=f"echo {message.rsplit(' ', 1)[-1]}")
+
+    chats = session_cache.SessionCache(max_sessions=10, idle_ttl_s=0, max_bytes=0)
+    chats.setdefault("s1", ExclusiveChat())
+    chats.setdefault("s2", ExclusiveChat())
+    monkeypatch.setattr(agent_service, "_active_chats", chats)
+    monkeypatch.setattr(agent_service, "_actors", session_actors.SessionActors(queue_limit=2))
+    monkeypatch.setattr(agent_service.environment_context, "build", lambda: "")
+
+    async def run():
+        other = asyncio.create_task(agent_service.process_user_message("s2", "other"))
+        replies = await asyncio.gather(*(agent_service.process_user_message("s1", f"msg {i}") for i in range(4)))
+        return replies, await other, agent_service.session_queue_stats()
+
+    replies, other, stats = asyncio.run(run())
+    # Arrival order is kept; the fourth turn exceeds the queue limit (one running + two waiting)
+    assert replies[:3] == ["echo 0", "echo 1", "echo 2"]
+    assert replies[3].startswith("Agent busy")
+    assert other == "echo other"
+    s1 = stats["sessions"]["s1"]
+    assert (s1["turns"], s1["rejected"]) == (3, 1)
+    assert s1["max_wait_seconds"] >= 0.15
+
+
+def test_turn_budgets_fall_back_to_a_short_reply(data_dir, monkeypatch):
+    from app.core import config
+
+    class ToolHungryChat:
+        """Asks for the same tool forever."""
+        async def send_message(self, message):
+            return SimpleNamespace(function_calls=[SimpleNamespace(name="hung_tool", args={})], text=None)
+
+    hung = []
+
+    def hung_tool():
+        hung.append(1)
+        time.sleep(0.5)
+        return {"ok": True}
+
+    monkeypatch.setitem(agent_service.TOOL_MAP, "hung_tool", hung_tool)
+    monkeypatch.setattr(agent_service.environment_context, "build", lambda: "")
+    monkeypatch.setattr(config, "AGENT_TOOL_TIMEOUT_S", 0.05)
+
+    def run(session_id):
+        chats = session_cache.SessionCache(max_sessions=10, idle_ttl_s=0, max_bytes=0)
+        chats.setdefault(session_id, ToolHungryChat())
+        monkeypatch.setattr(agent_service, "_active_chats", chats)
+
+        async def timed():
+            # Timed inside the loop: asyncio.run waits for the abandoned tool threads on exit
+            start = time.perf_counter()
+            reply = await agent_service.process_user_message(session_id, "hello")
+            return reply, time.perf_counter() - start
+
+        return (*asyncio.run(timed()), chats)
+
+    # Tool round cap: each hung call is abandoned after its timeout, then the rounds run out
+    monkeypatch.setattr(config, "AGENT_MAX_TOOL_ROUNDS", 3)
+    monkeypatch.setattr(config, "AGENT_TURN_DEADLINE_S", 10)
+    reply, elapsed, chats = run("rounds")
+    assert reply == agent_service.FALLBACK_REPLY
+    assert len(hung) == 3 and elapsed < 0.5
+    # The chat, left mid tool exchange, is dropped: the next turn rebuilds it from the transcript
+    assert "rounds" not in chats
+    assert json_store_service.get_conversation("rounds")["messages"][-1]["content"] == agent_service.FALLBACK_REPLY
+
+    # Turn deadline: it cuts the tool call's own (longer) timeout short
+    monkeypatch.setattr(config, "AGENT_MAX_TOOL_ROUNDS", 0)
+    monkeypatch.setattr(config, "AGENT_TOOL_TIMEOUT_S", 5)
+    monkeypatch.setattr(config, "AGENT_TURN_DEADLINE_S", 0.3)
+    reply, elapsed, _ = run("deadline")
+    assert reply == agent_service.FALLBACK_REPLY
+    assert elapsed < 0.5
+
+
+def test_memoized_tool_answers_repeated_calls_from_memory(monkeypatch):
+    from app import tools
+
+    calls = []
+
+    @tools.memoize(ttl_s=60, max_entries=2)
+    def lookup(city: str, days: int = 1) -> dict:
+        calls.append(city)
+        return {"status": "error"} if city == "nowhere" else {"city": city, "days": days, "items": []}
+
+    first = lookup("Paris")
+    first["items"].append("mutated by the caller")
+    assert lookup(city="Paris", days=1) == {"city": "Paris", "days": 1, "items": []}
+    assert calls == ["Paris"]
+
+    # Failures are retried; beyond max_entries the least recently used entry goes
+    lookup("nowhere"), lookup("nowhere")
+    lookup("Lyon"), lookup("Nice")
+    lookup("Paris")
+    assert calls == ["Paris", "nowhere", "nowhere", "Lyon", "Nice", "Paris"]
+
+    # Expired entries are recomputed
+    now = time.monotonic()
+    monkeypatch.setattr(tools.time, "monotonic", lambda: now + 61)
+    lookup("Paris")
+    assert calls[-1] == "Paris" and len(calls) == 7
+
+    info = tools.memo_stats()["lookup"]
+    assert (info["hits"], info["misses"], info["evicted"], info["expired"]) == (1, 7, 2, 1)
+
+
+def test_turn_stages_and_tokens_are_exported_as_metrics(data_dir, monkeypatch):
+    from app.services import metrics_service
+
+    class MeteredChat(FakeChat):
+        async def send_message(self, message):
+            response = await super().send_message(message)
+            response.usage_metadata = SimpleNamespace(prompt_token_count=100, candidates_token_count=7, total_token_count=107)
+            return response
+
+    monkeypatch.setitem(agent_service.TOOL_MAP, "slow_tool", lambda: {"ok": True})
+    chats = session_cache.SessionCache(max_sessions=10, idle_ttl_s=0, max_bytes=0)
+    chats.setdefault("s1", MeteredChat())
+    monkeypatch.setattr(agent_service, "_active_chats", chats)
+
+    stages = ("turn", "env_context", "llm_initial", "tool_round", "llm_followup", "markdown_strip", "transcript_write")
+    before = {s: metrics_service.STAGE_SECONDS.snapshot(stage=s)["count"] for s in stages}
+    tokens = metrics_service.LLM_TOKENS.value(stage="llm_followup", kind="prompt")
+    ok = metrics_service.TURNS.value(outcome="ok")
+
+    assert asyncio.run(agent_service.process_user_message("s1", "hello")) == "Done"
+
+    observed = {s: metrics_service.STAGE_SECONDS.snapshot(stage=s)["count"] - before[s] for s in stages}
+    assert observed == {s: 2 if s == "transcript_write" else 1 for s in stages}
+    assert metrics_service.STAGE_SECONDS.snapshot(stage="llm_initial")["sum"] >= 0.2
+    assert metrics_service.LLM_TOKENS.value(stage="llm_followup", kind="prompt") == tokens + 100
+    assert metrics_service.TURNS.value(outcome="ok") == ok + 1
+    assert metrics_service.TOOL_SECONDS.snapshot(tool="slow_tool", outcome="ok")["count"] >= 1
+
+    text = metrics_service.render()
+    assert "# TYPE careloop_agent_stage_seconds histogram" in text
+    assert 'careloop_agent_stage_seconds_bucket{stage="llm_initial",le="+Inf"}' in text
+    assert 'careloop_llm_tokens_total{stage="llm_initial",kind="total"}' in text
+    assert "careloop_agent_sessions 1" in text
+
+
+def test_stub_llm_backend_drives_the_tool_loop_offline(data_dir, monkeypatch):
+    from app.services import llm_service, llm_stub
+
+    monkeypatch.setattr(llm_service, "client", llm_stub.StubClient(latency_s=0.01))
+    monkeypatch.setattr(agent_service, "_active_chats", session_cache.SessionCache(max_sessions=10, idle_ttl_s=0, max_bytes=0))
+
+    async def turns():
+        reply = await agent_service.process_user_message("s1", "I feel tired today")
+        events = [e async for e in agent_service.stream_user_message("s2", "Do you remember my daughter?")]
+        return reply, events
+
+    reply, events = asyncio.run(turns())
+    # Two scripted tool rounds ran for real: the health log was written
+    assert reply.startswith("I am sorry you feel that way.")
+    assert [log["notes"] for log in json_store_service.get_health_logs()] == ["Stub turn"]
+    assert len(agent_service._active_chats.peek("s1").get_history()) == 6
+
+    deltas = "".join(e["text"] for e in events if e["type"] == "delta")
+    assert len([e for e in events if e["type"] == "delta"]) > 1
+    assert deltas == events[-1]["text"] == llm_stub.DEFAULT_SCRIPT[1]["reply"]
+
+
+def test_reminder_phrases_are_pregenerated_and_fired_from_cache(data_dir, monkeypatch):
+    from datetime import datetime, timedelta, timezone
+    from app.services import reminder_phrases, scheduler_service
+
+    calls = []
+
+    def fake_llm(reminders, fallback=True):
+        calls.extend(r["title"] for r in reminders)
+        return [f"Time for your {r['title'].lower()}, {r['resident_name']}!" for r in reminders]
+
+    monkeypatch.setattr(reminder_phrases, "generate_reminder_phrases", fake_llm)
+    reminder_phrases.clear()
+    now = datetime.now(timezone.utc)
+
+    def item(item_id, title, minutes):
+        at = (now + timedelta(minutes=minutes)).isoformat().replace("+00:00", "Z")
+        return {"id": item_id, "care_receiver_id": "default", "type": "medication", "title": title,
+                "message_text": "[medication] Blue pill", "scheduled_at": at, "repeat_rule": "daily", "status": "scheduled"}
+
+    json_store_service.save_calendar_items([item("ci-1", "Pills", -1), item("ci-2", "Tea", 5), item("ci-3", "Walk", 120)])
+
+    # Only the items due within the look-ahead window are rendered
+    assert reminder_phrases.pregenerate(now) == 2
+    assert sorted(calls) == ["Pills", "Tea"]
+    assert reminder_phrases.pregenerate(now) == 0
+
+    # Firing is a cache lookup: no further LLM call, and tomorrow's occurrence shares the phrase
+    scheduler_service.check_due_calendar_items()
+    assert len(calls) == 2
+    assert [a["text_to_speak"] for a in json_store_service.get_device_actions()] == ["Time for your pills, Simone!"]
+    tomorrow = [i for i in json_store_service.get_calendar_items() if i["title"] == "Pills" and i["status"] == "scheduled"]
+    assert reminder_phrases.phrase_for(tomorrow[0], generate=False) == "Time for your pills, Simone!"
+    assert reminder_phrases.cache_stats()["hits"] >= 2
+
+
+def test_reminder_phrases_are_generated_in_batches_with_per_item_fallback(monkeypatch):
+    from app.services import llm_service
+
+    prompts = []
+
+    def generate_content(model, contents, config=None):
+        prompts.append(contents)
+        if contents.startswith("Generate exactly ONE"):
+            return SimpleNamespace(text="Single phrase.")
+        items = json.loads(contents.split("Items:\n", 1)[1])
+        # The answer skips the first item, garbles the second and adds an unknown id
+        entries = [{"id": item["id"], "text": f"Phrase {item['title']}."} for item in items[2:]]
+        entries += [{"id": items[1]["id"], "text": ""}, {"id": 99, "text": "Stray."}]
+        return SimpleNamespace(text="```json\n" + json.dumps(entries) + "\n```")
+
+    monkeypatch.setattr(llm_service, "client", SimpleNamespace(models=SimpleNamespace(generate_content=generate_content)))
+    monkeypatch.setattr(llm_service, "REMINDER_PHRASE_BATCH_SIZE", 25)
+    reminders = [
+        {"title": f"R{i}", "reminder_type": "medication", "message_text": "[medication] pill",
+         "resident_name": "Simone", "is_audio_invite": i % 10 == 0}
+        for i in range(60)
+    ]
+
+    phrases = llm_service.generate_reminder_phrases(reminders)
+
+    # 3 batch requests (25 + 25 + 10), then one request per item missing from each answer
+    assert len([p for p in prompts if p.startswith("Generate one warm sentence")]) == 3
+    assert len(prompts) == 3 + 3 * 2
+    assert phrases[2] == "Phrase R2." and phrases[59] == "Phrase R59."
+    assert [phrases[i] for i in (0, 1, 25, 26, 50, 51)] == ["Single phrase."] * 6
+
+    # A batch request that fails is retried item by item too
+    def failing_batch(model, contents, config=None):
+        if config is not None:
+            raise RuntimeError("429 Resource exhausted")
+        return SimpleNamespace(text="Single phrase.")
+
+    monkeypatch.setattr(llm_service, "client", SimpleNamespace(models=SimpleNamespace(generate_content=failing_batch)))
+    assert llm_service.generate_reminder_phrases(reminders[:3]) == ["Single phrase."] * 3
+
+
+def test_reminder_phrases_without_llm_use_the_shared_fallback(monkeypatch):
+    from app.services import llm_service
+
+    monkeypatch.setattr(llm_service, "client", None)
+    reminders = [
+        {"title": "Pills", "reminder_type": "reminder", "message_text": "", "resident_name": "Simone"},
+        {"title": "Tea", "reminder_type": "reminder", "message_text": "[music] book", "resident_name": "Simone",
+         "is_audio_invite": True},
+    ]
+    expected = [
+        llm_service.fallback_reminder_phrase(r["title"], r["message_text"], r["resident_name"], r.get("is_audio_invite", False))
+        for r in reminders
+    ]
+    assert expected[0] == "Hi Simone, don't forget: Pills." and "an audiobook" in expected[1]
+    assert [llm_service.generate_reminder_phrase(**r) for r in reminders] == expected
+    assert llm_service.generate_reminder_phrases(reminders) == expected
+    assert llm_service.generate_reminder_phrases(reminders, fallback=False) == [None, None]
+
+
+def test_chat_is_rebuilt_only_when_turns_are_folded(data_dir, monkeypatch):
+    from app.core import config
+    from app.services import history_manager, llm_service, llm_stub
+
+    monkeypatch.setattr(llm_service, "client", llm_stub.StubClient())
+    monkeypatch.setattr(agent_service, "_active_chats", session_cache.SessionCache(max_sessions=10, idle_ttl_s=0, max_bytes=0))
+    monkeypatch.setattr(config, "AGENT_HISTORY_TURNS", 2)
+    monkeypatch.setattr(config, "AGENT_HISTORY_TOKEN_BUDGET", 0)
+    created = []
+    create = agent_service.create_async_chat
+    monkeypatch.setattr(agent_service, "create_async_chat", lambda *args: created.append(args) or create(*args))
+
+    async def turn(message):
+        await agent_service.process_user_message("s1", message)
+        await asyncio.gather(*agent_service._compactions.values())
+        return agent_service._active_chats.peek("s1").get_history()
+
+    async def conversation():
+        first = await turn("Hello")
+        second = await turn("How are you?")
+        # Two turns fit the window: same chat, only the context block of each finished turn stripped
+        assert len(created) == 1 and second[:2] == first
+        assert [c.parts[0].text for c in second if c.role == "user"] == ["Hello", "How are you?"]
+        # The third turn folds the first one into the summary: the chat is rebuilt once
+        third = await turn("Tell me a story")
+        assert len(created) == 2
+        assert third[0].parts[0].text.startswith(history_manager.SUMMARY_MARKER)
+
+    asyncio.run(conversation())
+
+
+def test_stub_llm_backend_answers_reminder_batches(monkeypatch):
+    from app.services import llm_service, llm_stub
+
+    stub = llm_stub.StubClient()
+    calls = []
+    generate_content = stub.models.generate_content
+    monkeypatch.setattr(stub.models, "generate_content", lambda **kwargs: calls.append(kwargs) or generate_content(**kwargs))
+    monkeypatch.setattr(llm_service, "client", stub)
+    monkeypatch.setattr(llm_service, "REMINDER_PHRASE_BATCH_SIZE", 4)
+    reminders = [
+        {"title": f"R{i}", "reminder_type": "medication", "message_text": "[medication] pill",
+         "resident_name": "Simone", "is_audio_invite": i % 3 == 0}
+        for i in range(10)
+    ]
+
+    phrases = llm_service.generate_reminder_phrases(reminders, fallback=False)
+
+    # 4 + 4 + 2 reminders: one request per batch, no one-by-one retry
+    assert len(calls) == 3
+    assert phrases == [llm_stub.GENERATED_TEXT] * 10
@@ -0,0 +1,32 @@
+import copy
+import importlib.util
+from pathlib import Path
+
+from app.core import constants
+
+_spec = importlib.util.spec_from_file_location("benchmark", Path(__file__).resolve().parent.parent / "scripts" / "benchmark.py")
+benchmark = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(benchmark)
+
+
+def test_benchmark_measures_every_operation_and_flags_regressions():
+    data_dir = constants.DATA_DIR
+    report = benchmark.run(list(benchmark.SCENARIOS), requests=4, concurrency=2,
+                           llm_latency_s=0, tts_latency_s=0, stt_latency_s=0)
+
+    # The run used a copy of the data and the stand-ins: every request succeeded
+    assert constants.DATA_DIR == data_dir
+    assert set(report["results"]) == {
+        "chat_message", "device_next_actions", "reminder_create", "reminder_list",
+        "reminder_update", "reminder_delete", "health_events", "stt_transcribe",
+    }
+    for op, result in report["results"].items():
+        assert result["count"] == 4 and result["errors"] == 0, op
+        assert 0 < result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
+
+    assert benchmark.compare(report, report, tolerance=0.2) == []
+    slower = copy.deepcopy(report)
+    slower["results"]["health_events"]["p95_ms"] *= 2
+    assert benchmark.compare(slower, report, tolerance=0.2) == [
+        f"health_events: p95_ms {report['results']['health_events']['p95_ms']} -> {slower['results']['health_events']['p95_ms']}"
+    ]
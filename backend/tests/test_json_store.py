@@ -0,0 +1,447 @@
+import json
+import threading
+import time
+import pytest
+from app.core import config
+from app.services import archive_service, json_store_service, lock_manager, segment_log, sqlite_store, store_cache
+
+
+def test_append_only_writes_the_log(data_dir):
+    json_store_service.save_events([{"id": "ev-1", "type": "a"}])
+    json_store_service.compact_all()
+    json_store_service.append_event({"id": "ev-2", "type": "b"})
+
+    assert json.loads((data_dir / "events.json").read_text()) == [{"id": "ev-1", "type": "a"}]
+    lines = (data_dir / "events.log").read_text().splitlines()
+    assert [json.loads(l)["key"] for l in lines] == ["ev-2"]
+    assert [e["id"] for e in json_store_service.get_events()] == ["ev-1", "ev-2"]
+
+
+def test_save_logs_only_changed_records(data_dir):
+    json_store_service.save_calendar_items([{"id": "a", "status": "scheduled"}, {"id": "b", "status": "scheduled"}])
+    json_store_service.append_calendar_item({"id": "c", "status": "scheduled"})
+
+    items = json_store_service.get_calendar_items()
+    items[0]["status"] = "sent"
+    items = [i for i in items if i["id"] != "b"]
+    json_store_service.save_calendar_items(items)
+
+    ops = segment_log.read_ops(data_dir / "calendar_items.json")
+    assert [(o["op"], o["key"]) for o in ops][-2:] == [("put", "a"), ("del", "b")]
+    assert json_store_service.get_calendar_items() == [
+        {"id": "a", "status": "sent"},
+        {"id": "c", "status": "scheduled"},
+    ]
+
+
+def test_reordered_save_rewrites_snapshot(data_dir):
+    json_store_service.save_device_actions([{"id": "a"}])
+    json_store_service.append_device_action({"id": "b"})
+    json_store_service.save_device_actions([{"id": "b"}, {"id": "a"}])
+
+    assert not (data_dir / "device_actions.log").exists()
+    assert json_store_service.get_device_actions() == [{"id": "b"}, {"id": "a"}]
+
+
+def test_compaction_is_idempotent(data_dir):
+    for i in range(5):
+        json_store_service.append_calendar_item({"id": f"c-{i}", "status": "scheduled"})
+    before = json_store_service.get_calendar_items()
+    # Simulate a crash between the snapshot write and the log removal
+    json_store_service._write_json(data_dir / "calendar_items.json", before)
+    assert json_store_service.get_calendar_items() == before
+
+    json_store_service.compact_all()
+    assert not (data_dir / "calendar_items.log").exists()
+    assert json_store_service.get_calendar_items() == before
+    assert len(before) == 5
+
+
+def test_conversations_are_sharded_by_session(data_dir):
+    json_store_service._write_json(data_dir / "conversations.json", [
+        {"session_id": "old", "timestamp": "2024-01-01T00:00:00Z", "messages": [{"role": "user", "content": "hi"}]},
+    ])
+    json_store_service.append_to_conversation("s1", "user", "hello")
+    other_shard = data_dir / "conversations" / "old.jsonl"
+    mtime = other_shard.stat().st_mtime_ns
+    json_store_service.append_to_conversation("s1", "assistant", "bonjour")
+    json_store_service.append_to_conversation("s/2", "user", "salut")
+
+    assert other_shard.stat().st_mtime_ns == mtime
+    s1 = json_store_service.get_conversation("s1")
+    assert [m["content"] for m in s1["messages"]] == ["hello", "bonjour"]
+    assert json_store_service.get_conversation("old")["messages"] == [{"role": "user", "content": "hi"}]
+    assert json_store_service.get_conversation("missing") is None
+    assert [c["session_id"] for c in json_store_service.get_conversations()] == ["old", "s1", "s/2"]
+    assert len(list((data_dir / "conversations").glob("*.jsonl"))) == 3
+
+
+def test_conversation_appends_extend_the_cached_session_in_place(data_dir):
+    json_store_service.append_to_conversation("s1", "user", "hello")
+    shard = next((data_dir / "conversations").glob("s1*.jsonl"))
+    cached = store_cache.peek(shard)
+    for i in range(3):
+        json_store_service.append_to_conversation("s1", "assistant", f"reply {i}")
+    assert store_cache.peek(shard) is cached and len(cached) == 4
+    # Readers get copies
+    conversation = json_store_service.get_conversation("s1")
+    conversation["messages"].append({"role": "user", "content": "not stored"})
+    assert json_store_service.conversation_message_counts() == {"s1": 4}
+    store_cache.clear()
+    assert [m["content"] for m in json_store_service.get_conversation("s1")["messages"]] == ["hello", "reply 0", "reply 1", "reply 2"]
+
+
+def test_torn_log_line_is_ignored(data_dir):
+    json_store_service.append_event({"id": "ev-1"})
+    with open(data_dir / "events.log", "a", encoding="utf-8") as f:
+        f.write('{"op": "put", "key": "ev-2", "rec')
+    assert json_store_service.get_events() == [{"id": "ev-1"}]
+
+
+def test_reads_are_cached_until_the_file_changes(data_dir):
+    json_store_service.save_caregivers([{"id": "cg_1", "name": "Sarah"}])
+    json_store_service.get_caregivers()
+    hits = store_cache.stats["hits"]
+    json_store_service.get_caregivers()
+    assert store_cache.stats["hits"] == hits + 1
+
+    # Another process rewrites the file: the next read must see it
+    (data_dir / "caregivers.log").unlink()
+    (data_dir / "caregivers.json").write_text(json.dumps([{"id": "cg_2", "name": "Paul"}]))
+    assert json_store_service.get_caregivers() == [{"id": "cg_2", "name": "Paul"}]
+
+
+def test_callers_cannot_corrupt_the_cache(data_dir):
+    json_store_service.append_to_conversation("s1", "user", "hello")
+    conversations = json_store_service.get_conversations()
+    conversations[0]["messages"].append({"role": "user", "content": "not saved"})
+    context = json_store_service.get_patient_context()
+    context["name"] = "not saved"
+
+    assert len(json_store_service.get_conversations()[0]["messages"]) == 1
+    assert "name" not in json_store_service.get_patient_context()
+
+
+def test_collections_are_locked_separately(data_dir):
+    started, release = threading.Event(), threading.Event()
+
+    def slow_conversation_write():
+        with json_store_service.transaction(write=["conversations"]):
+            started.set()
+            release.wait(5)
+
+    writer = threading.Thread(target=slow_conversation_write)
+    writer.start()
+    started.wait(5)
+    # A kiosk ack only needs device_actions and events: it must not wait on conversations
+    with json_store_service.transaction(write=["device_actions", "events"]):
+        json_store_service.append_event({"id": "ev-1"})
+    release.set()
+    writer.join()
+    assert json_store_service.get_events() == [{"id": "ev-1"}]
+
+
+def test_writers_wait_for_readers_and_report_it(data_dir):
+    before = lock_manager.wait_stats()["events"]["contended"]
+    with json_store_service.transaction(read=["events"]):
+        writer = threading.Thread(target=json_store_service.append_event, args=({"id": "ev-1"},))
+        writer.start()
+        time.sleep(0.05)
+        assert json_store_service.get_events() == []
+    writer.join()
+    assert json_store_service.get_events() == [{"id": "ev-1"}]
+    assert lock_manager.wait_stats()["events"]["contended"] == before + 1
+
+
+def test_lock_order_is_enforced(data_dir):
+    with json_store_service.transaction(write=["events"]):
+        with pytest.raises(RuntimeError):
+            json_store_service.get_patient_context()
+    with json_store_service.transaction(read=["patient_context"], write=["events"]):
+        json_store_service.get_patient_context()
+
+
+def test_sqlite_backend_same_surface(sqlite_backend):
+    json_store_service.save_calendar_items([
+        {"id": "a", "care_receiver_id": "cr-1", "status": "scheduled"},
+        {"id": "b", "care_receiver_id": "cr-2", "status": "scheduled"},
+    ])
+    json_store_service.append_calendar_item({"id": "c", "care_receiver_id": "cr-1", "status": "sent"})
+    items = json_store_service.get_calendar_items()
+    items[0]["status"] = "sent"
+    json_store_service.save_calendar_items(items)
+
+    assert [i["id"] for i in json_store_service.get_calendar_items()] == ["a", "b", "c"]
+    assert json_store_service.get_by_id("calendar_items", "a")["status"] == "sent"
+    assert [i["id"] for i in json_store_service.find("calendar_items", care_receiver_id="cr-1", status="sent")] == ["a", "c"]
+    assert not (sqlite_backend / "calendar_items.json").exists()
+
+    json_store_service.save_patient_context({"name": "Simone"})
+    assert json_store_service.get_patient_context() == {"name": "Simone"}
+
+
+def test_migrate_json_to_sqlite(data_dir, monkeypatch):
+    json_store_service.save_events([{"id": "ev-1", "care_receiver_id": "cr-1"}])
+    json_store_service.append_event({"id": "ev-2", "care_receiver_id": "cr-2"})
+    json_store_service.save_patient_context({"name": "Simone"})
+    json_store_service.append_to_conversation("s1", "user", "hello")
+
+    imported = json_store_service.migrate_json_to_sqlite()
+    assert imported["events"] == 2
+    assert imported["conversations"] == 1
+
+    monkeypatch.setattr(config, "STORE_BACKEND", "sqlite")
+    assert [e["id"] for e in json_store_service.get_events()] == ["ev-1", "ev-2"]
+    assert json_store_service.find("events", care_receiver_id="cr-2") == [{"id": "ev-2", "care_receiver_id": "cr-2"}]
+    assert json_store_service.get_patient_context() == {"name": "Simone"}
+    json_store_service.append_to_conversation("s1", "assistant", "bonjour")
+    assert [m["content"] for m in json_store_service.get_conversation("s1")["messages"]] == ["hello", "bonjour"]
+
+
+def test_corrupt_snapshot_is_kept_aside(data_dir):
+    (data_dir / "calendar_items.json").write_text('[{"id": "a", "title": "Pil')
+    assert json_store_service.get_calendar_items() == []
+    quarantined = list(data_dir.glob("calendar_items.json.corrupt-*"))
+    assert len(quarantined) == 1
+    assert quarantined[0].read_text() == '[{"id": "a", "title": "Pil'
+
+
+def test_snapshot_writes_are_atomic(data_dir, monkeypatch):
+    json_store_service.save_patient_context({"name": "Simone"})
+
+    def crash(*args, **kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr(json_store_service.json, "dump", crash)
+    with pytest.raises(OSError):
+        json_store_service.save_patient_context({"name": "Paul"})
+
+    assert json.loads((data_dir / "patient_context.json").read_text()) == {"name": "Simone"}
+    assert not list(data_dir.glob(".*.tmp"))
+
+
+def test_group_commit_merges_concurrent_appends(data_dir, monkeypatch):
+    monkeypatch.setattr(config, "STORE_GROUP_COMMIT_MS", 20)
+    batches_before = segment_log._committer._formed
+
+    threads = [
+        threading.Thread(target=json_store_service.append_event, args=({"id": f"ev-{i}"},))
+        for i in range(20)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert segment_log._committer._formed - batches_before < 20
+    assert len(segment_log.read_ops(data_dir / "events.json")) == 20
+    store_cache.clear()
+    assert sorted(e["id"] for e in json_store_service.get_events()) == sorted(f"ev-{i}" for i in range(20))
+
+
+def test_single_record_crud_by_id(data_dir):
+    json_store_service.save_calendar_items([
+        {"id": "a", "care_receiver_id": "cr-1", "status": "scheduled"},
+        {"id": "b", "care_receiver_id": "cr-2", "status": "scheduled"},
+    ])
+    json_store_service.append_calendar_item({"id": "c", "care_receiver_id": "cr-1", "status": "scheduled"})
+    assert [i["id"] for i in json_store_service.find("calendar_items", care_receiver_id="cr-1")] == ["a", "c"]
+
+    assert json_store_service.update_by_id("calendar_items", "a", {"status": "sent", "id": "z"})["id"] == "a"
+    assert json_store_service.delete_by_id("calendar_items", "c")
+    assert not json_store_service.delete_by_id("calendar_items", "missing")
+    assert json_store_service.update_by_id("calendar_items", "missing", {"status": "sent"}) is None
+    json_store_service.append_calendar_item({"id": "d", "care_receiver_id": "cr-1", "status": "scheduled"})
+
+    ops = segment_log.read_ops(data_dir / "calendar_items.json")
+    assert [(o["op"], o["key"]) for o in ops][-3:] == [("put", "a"), ("del", "c"), ("put", "d")]
+    assert json_store_service.get_by_id("calendar_items", "a")["status"] == "sent"
+    assert [i["id"] for i in json_store_service.find("calendar_items", care_receiver_id="cr-1")] == ["a", "d"]
+    store_cache.clear()
+    assert [i["id"] for i in json_store_service.find("calendar_items", care_receiver_id="cr-1")] == ["a", "d"]
+
+
+def test_single_record_writes_patch_the_cache_in_place(data_dir):
+    # A write must not copy the cached collection or its index: its cost is independent of the size
+    json_store_service.save_calendar_items([
+        {"id": f"it-{i}", "care_receiver_id": f"cr-{i % 3}", "status": "scheduled"} for i in range(5000)
+    ])
+    json_store_service.compact_all()
+    path = data_dir / "calendar_items.json"
+    assert len(json_store_service.find("calendar_items", care_receiver_id="cr-1")) == 1667
+    state, index = store_cache.peek(path), store_cache.peek((path, "care_receiver_id"))[1]
+
+    json_store_service.update_by_id("calendar_items", "it-1", {"status": "sent"})
+    json_store_service.delete_by_id("calendar_items", "it-4")
+    json_store_service.append_calendar_item({"id": "new", "care_receiver_id": "cr-1", "status": "scheduled"})
+
+    assert store_cache.peek(path) is state
+    assert store_cache.peek((path, "care_receiver_id")) == (state, index)
+    ids = [i["id"] for i in json_store_service.find("calendar_items", care_receiver_id="cr-1")]
+    assert ids[:2] == ["it-1", "it-7"] and ids[-1] == "new" and len(ids) == 1667
+    assert json_store_service.get_by_id("calendar_items", "it-1")["status"] == "sent"
+    store_cache.clear()
+    assert [i["id"] for i in json_store_service.find("calendar_items", care_receiver_id="cr-1")] == ids
+
+
+def test_old_events_and_sent_items_are_archived_by_month(data_dir, monkeypatch):
+    monkeypatch.setattr(config, "STORE_HOT_DAYS", 30)
+    monkeypatch.setattr(config, "STORE_ARCHIVE_RETENTION_MONTHS", 2)
+    json_store_service.save_events([
+        {"id": "ev-old", "care_receiver_id": "cr-1", "created_at": "2024-03-05T10:00:00Z"},
+        {"id": "ev-older", "care_receiver_id": "cr-1", "created_at": "2024-01-20T10:00:00Z"},
+        {"id": "ev-new", "care_receiver_id": "cr-1", "created_at": "2024-04-20T10:00:00Z"},
+    ])
+    json_store_service.save_calendar_items([
+        {"id": "ci-sent", "status": "sent", "scheduled_at": "2024-03-01T08:00:00Z"},
+        {"id": "ci-late", "status": "scheduled", "scheduled_at": "2024-03-01T08:00:00Z"},
+    ])
+    now = archive_service.parse_timestamp("2024-04-25T00:00:00Z")
+
+    assert archive_service.archive_collection("events", now) == 2
+    assert archive_service.archive_collection("calendar_items", now) == 1
+    assert sorted(p.name for p in (data_dir / "archive").iterdir()) == [
+        "calendar_items-2024-03.jsonl", "events-2024-01.jsonl", "events-2024-03.jsonl",
+    ]
+    assert [e["id"] for e in json_store_service.get_events()] == ["ev-new"]
+    assert [i["id"] for i in json_store_service.get_calendar_items()] == ["ci-late"]
+
+    assert archive_service.purge_partitions(now) == ["events-2024-01.jsonl"]
+    archived = archive_service.read_archive("events", since=archive_service.parse_timestamp("2024-03-01T00:00:00Z"))
+    assert [e["id"] for e in archived] == ["ev-old"]
+    assert [e["id"] for e in archive_service.query_events("cr-1", include_archive=True)] == ["ev-old", "ev-new"]
+
+
+_WORKER = """
+import sys
+from pathlib import Path
+from app.core import config, constants
+from app.services import json_store_service
+
+data_dir, worker, count, group_commit = Path(sys.argv[1]), sys.argv[2], int(sys.argv[3]), float(sys.argv[4])
+for name in dir(constants):
+    if name.endswith("_FILE") or (name.endswith("_DIR") and name not in ("BASE_DIR", "DATA_DIR")):
+        setattr(constants, name, data_dir / getattr(constants, name).name)
+config.STORE_GROUP_COMMIT_MS = group_commit
+for i in range(count):
+    json_store_service.append_event({"id": f"ev-{worker}-{i}"})
+    with json_store_service.transaction(write=["device_actions"]):
+        actions = json_store_service.get_device_actions()
+        actions[0]["count"] += 1
+        json_store_service.save_device_actions(actions)
+"""
+
+
+@pytest.mark.parametrize("group_commit_ms", [0, 5])
+def test_concurrent_processes_lose_no_records(data_dir, group_commit_ms):
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    json_store_service.save_device_actions([{"id": "counter", "count": 0}])
+    workers, count = 4, 40
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-c", _WORKER, str(data_dir), str(w), str(count), str(group_commit_ms)],
+            cwd=Path(__file__).resolve().parent.parent,
+        )
+        for w in range(workers)
+    ]
+    assert all(p.wait(timeout=120) == 0 for p in procs)
+
+    store_cache.clear()
+    assert len(json_store_service.get_events()) == workers * count
+    assert json_store_service.get_device_actions() == [{"id": "counter", "count": workers * count}]
+
+
+def test_family_memories_are_ranked_and_indexed_incrementally(data_dir):
+    from app.services import family_memory_service as memories
+
+    memories.add_memory("cr-1", "We had a dog called Buddy, he followed me everywhere.", title="Buddy")
+    wedding = memories.add_memory("cr-1", "Notre mariage au village en 1970, un des plus beaux jours.", tags=["mariage"])
+    memories.add_memory("cr-1", "I taught mathematics at the primary school for thirty years.")
+    memories.add_memory("cr-2", "Another patient's dogs.")
+    for i in range(300):
+        memories.add_memory("cr-1", f"Filler anecdote number {i} about the weather and the garden.")
+
+    # Stemming meets plural/singular forms in both languages; memories of other receivers stay out
+    assert [m["title"] for m in memories.search_memories("cr-1", "dogs", limit=3)] == ["Buddy"]
+    assert memories.search_memories("cr-1", "mariages")[0]["id"] == wedding["id"]
+    assert memories.search_memories("cr-1", "mathematics school")[0]["text"].startswith("I taught")
+
+    # Added through the service: indexed without a rebuild
+    rebuilt = memories._indexes
+    memories.add_memory("cr-1", "Sarah's first bicycle ride in the park.")
+    assert memories.search_memories("cr-1", "bicycle")[0]["text"].startswith("Sarah")
+    assert memories._indexes is rebuilt and memories._indexes["cr-1"] is rebuilt["cr-1"]
+
+    assert memories.delete_memory("cr-1", wedding["id"])
+    assert not memories.delete_memory("cr-2", wedding["id"])
+    assert all(m["id"] != wedding["id"] for m in memories.search_memories("cr-1", "mariage"))
+
+    # Written behind the service's back (e.g. by another worker): picked up on the next lookup
+    json_store_service.append_family_memory({"id": "mem-ext", "care_receiver_id": "cr-1", "text": "A trip to Venice by train."})
+    assert memories.search_memories("cr-1", "venice")[0]["id"] == "mem-ext"
+
+    start = time.perf_counter()
+    for _ in range(100):
+        memories.search_memories("cr-1", "garden weather dog")
+    assert (time.perf_counter() - start) / 100 < 0.005
+
+
+def test_transcript_search_is_ranked_and_follows_appends(data_dir, monkeypatch):
+    from datetime import datetime, timezone
+    from app.services import transcript_search_service as transcripts
+
+    transcripts.reset()
+    json_store_service.save_conversations([{
+        "session_id": "old", "timestamp": "2026-01-05T10:00:00Z",
+        "messages": [
+            {"role": "user", "content": "My knee hurts when I climb the stairs.", "created_at": "2026-01-05T10:00:00Z"},
+            {"role": "assistant", "content": "I am sorry about your knee.", "created_at": "2026-01-05T10:00:05Z"},
+        ],
+    }])
+    assert [h["session_id"] for h in transcripts.search("knees")] == ["old", "old"]
+
+    # Indexed as soon as it is appended in this process
+    json_store_service.append_to_conversation("new", "user", "Sarah is getting married in June, at the old church by the river.")
+    hit = transcripts.search("wedding married")[0]
+    assert hit["session_id"] == "new" and hit["role"] == "user" and "married" in hit["snippet"]
+
+    # Time range
+    assert transcripts.search("knee", until=datetime(2026, 1, 5, 10, 0, 1, tzinfo=timezone.utc))[0]["role"] == "user"
+    assert transcripts.search("knee", since=datetime(2026, 2, 1, tzinfo=timezone.utc)) == []
+
+    # Written without notification (another worker): found by the next scan, without duplicates
+    json_store_service._conversation_listeners.remove(transcripts._on_append)
+    try:
+        json_store_service.append_to_conversation("new", "user", "The knee is better today.")
+    finally:
+        json_store_service._conversation_listeners.append(transcripts._on_append)
+    transcripts.refresh()
+    assert len(transcripts.search("knee")) == 3
+    assert len(transcripts.search("married")) == 1
+
+
+def test_transcript_search_indexes_legacy_messages_by_position(data_dir):
+    from datetime import datetime, timezone
+    from app.services import transcript_search_service as transcripts
+
+    # Legacy transcript: no created_at on the messages, only the session timestamp
+    (data_dir / "conversations.json").write_text(json.dumps([{
+        "session_id": "legacy", "timestamp": "2026-03-01T09:00:00Z",
+        "messages": [
+            {"role": "user", "content": "I planted tulips in the garden."},
+            {"role": "assistant", "content": "Tulips are lovely."},
+            {"role": "user", "content": "The garden needs water."},
+        ],
+    }]))
+    transcripts.reset()
+    hits = transcripts.search("garden", since=datetime(2026, 2, 1, tzinfo=timezone.utc))
+    assert sorted(h["snippet"] for h in hits) == ["I planted tulips in the garden.", "The garden needs water."]
+    assert transcripts.search("garden", since=datetime(2026, 4, 1, tzinfo=timezone.utc)) == []
+
+    # A notified append lands at its own position, next to the scanned messages
+    json_store_service.append_to_conversation("legacy", "user", "Watered the garden today.")
+    assert len(transcripts.search("garden")) == 3
+    transcripts.refresh()
+    assert len(transcripts.search("garden")) == 3